@@ -26,8 +26,11 @@ def create_app():
 
     # --- modelleri yükle & DB oluştur/patch ---
     with app.app_context():
-        # MODELLER: (User, AuditEvent, Coupon, CouponRedemption)
-        from .models import User, AuditEvent, Coupon, CouponRedemption  # noqa
+        # MODELLER: (User, AuditEvent, UserLedger, MetricsHourly, Coupon, CouponRedemption, RenderJob, AppSetting, UploadSession)
+        from .models import (  # noqa
+            User, AuditEvent, UserLedger, MetricsHourly, Coupon, CouponRedemption, RenderJob, AppSetting,
+            UploadSession,
+        )
         db.create_all()
 
         # ---- SQLite kolon yamaları (varsa eksikleri ekle) ----
@@ -54,17 +57,83 @@ def create_app():
             rows_audit = db.session.execute(text("PRAGMA table_info(audit_event)")).fetchall()
             existing_audit_cols = {row[1] for row in rows_audit}
             add_audit_cols = {
-                'meta': "TEXT",
+                'meta':     "TEXT",
+                'tokens':   "INTEGER",
+                'files':    "INTEGER",
+                'tier':     "INTEGER",
+                'order_id': "VARCHAR(128)",
+                'txn_id':   "VARCHAR(128)",
             }
             for col, ddl in add_audit_cols.items():
                 if col not in existing_audit_cols:
                     db.session.execute(text(f"ALTER TABLE audit_event ADD COLUMN {col} {ddl}"))
+            if 'tokens' not in existing_audit_cols:
+                # tipli kolonlar yeni eklendi: eski satırları meta'dan bir kez doldur
+                from .services.audit import backfill_columns
+                n = backfill_columns(db.session)
+                app.logger.info(f"[DB PATCH] audit_event tipli kolonları dolduruldu: {n} satır")
+            audit_indexes = {
+                'ix_audit_event_order_id':      "order_id",
+                'ix_audit_event_txn_id':        "txn_id",
+                'ix_audit_event_user_event':    "user_id, event, created_at",
+                'ix_audit_event_event_created': "event, created_at",
+            }
+            for name, cols in audit_indexes.items():
+                db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON audit_event ({cols})"))
+
+            # RENDER_JOB tablosu
+            rows_job = db.session.execute(text("PRAGMA table_info(render_job)")).fetchall()
+            existing_job_cols = {row[1] for row in rows_job}
+            add_job_cols = {
+                'encoding':         "VARCHAR(32)",
+                'tokens':           "INTEGER",
+                'sizes':            "TEXT",
+                'quality':          "VARCHAR(16)",
+                'lease_owner':      "VARCHAR(64)",
+                'lease_expires_at': "DATETIME",
+                'attempts':         "INTEGER NOT NULL DEFAULT 0",
+            }
+            for col, ddl in add_job_cols.items():
+                if col not in existing_job_cols:
+                    db.session.execute(text(f"ALTER TABLE render_job ADD COLUMN {col} {ddl}"))
+
+            # METRICS_HOURLY tablosu
+            rows_metrics = db.session.execute(text("PRAGMA table_info(metrics_hourly)")).fetchall()
+            existing_metrics_cols = {row[1] for row in rows_metrics}
+            add_metrics_cols = {
+                'user_sketch': "BLOB",
+            }
+            for col, ddl in add_metrics_cols.items():
+                if col not in existing_metrics_cols:
+                    db.session.execute(text(f"ALTER TABLE metrics_hourly ADD COLUMN {col} {ddl}"))
+            # eskiz kolonu yeni eklendiyse mevcut kovalar eskizsiz: aşağıda yeniden hesaplanır
+            sketches_missing = 'user_sketch' not in existing_metrics_cols and bool(
+                db.session.execute(text("SELECT 1 FROM metrics_hourly LIMIT 1")).first())
 
             db.session.commit()
         except Exception as e:
             db.session.rollback()
+            sketches_missing = False
             app.logger.error(f"[DB PATCH] Hata: {e}")
 
+        # ---- audit_event flush kancaları (tipli kolonlar, sonra user_ledger / metrics_hourly;
+        #      kayıt sırası önemli) + ilk kurulumda özetlerin geçmişten doldurulması ----
+        from .services import audit  # noqa
+        from .services import ledger, rollups
+        try:
+            ledger.backfill_if_empty(app)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"[LEDGER] Doldurma hatası: {e}")
+        try:
+            if sketches_missing:
+                n = rollups.rebuild_rollups()
+                app.logger.info(f"[ROLLUP] {n} saatlik kova eskizlerle yeniden hesaplandı")
+            rollups.backfill_if_empty(app)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"[ROLLUP] Doldurma hatası: {e}")
+
     # --- yetkisiz -> login / XHR:401 ---
     @login_manager.unauthorized_handler
     def _unauthorized():
@@ -110,6 +179,9 @@ def create_app():
     app.register_blueprint(payments_bp)
     app.register_blueprint(profile_bp)
 
+    # Arka plan temizleyici burada başlatılmaz (CLI'lar ve işçiler de create_app çağırır);
+    # web giriş noktası (run.py) packs.start_sweeper'ı çağırır.
+
     return app
 
 
@@ -0,0 +1,270 @@
+# app/batch.py
+"""
+Toplu (çevrimdışı) render — katalog doldurma gibi büyük işler için:
+
+    python -m app.batch GIRDI CIKTI [--sizes 5x7,8x10] [--orientation auto] [--workers 8]
+
+GIRDI ağacı özyinelemeli taranır; her görsel CIKTI/<göreli klasör>/<ad>/ altına web yoluyla
+aynı ölçü ve etiketlerle ("<etiket> <ad>.jpg") yazılır. Bitmiş her görsel CIKTI altındaki
+manifest'e eklenir; yeniden çalıştırıldığında kaynağı (boyut + mtime, --hash ile SHA-256)
+ve ayarları değişmemiş, çıktıları yerinde olan görseller atlanır (yarıda kesilen iş kaldığı
+yerden sürer). Hatalar errors dosyasına JSON satırı olarak yazılır. Varsayılanlar config.py'den.
+"""
+import argparse, json, os, sys, time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from PIL import Image
+
+import config
+from .services.cache import sha256_file
+from .services.imaging import (
+    BAND_MIN_PIXELS, BAND_ROWS, DRAFT_MARGIN, EXECUTORS, IZINLI_UZANTILAR, QUALITY_TIERS, REDUCING_GAP,
+    RenderSettings, available_encodings, encoder_signature, iter_render_jobs, output_paths, resolve_encoding,
+    resolve_quality, select_sizes,
+)
+
+MANIFEST_NAME = ".render-manifest.jsonl"
+ERRORS_NAME = "errors.jsonl"
+
+
+def scan_tree(root: Path, skip: Path | None = None) -> list[Path]:
+    """root altındaki tüm görseller (sıralı); skip (örn. çıktı klasörü) atlanır."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if skip is not None:
+            dirnames[:] = [d for d in dirnames if Path(dirpath, d).resolve() != skip]
+        dirnames.sort()
+        found.extend(Path(dirpath, f) for f in sorted(filenames) if f.lower().endswith(IZINLI_UZANTILAR))
+    return found
+
+
+def detect_orientation(path: Path) -> str:
+    """Başlıktan (decode yok): eni boyundan büyükse landscape."""
+    with Image.open(path) as im:
+        w, h = im.size
+    return "landscape" if w > h else "portrait"
+
+
+class Manifest:
+    """
+    Ekleme-yalnız JSON satırları: {src, size, mtime_ns, sha256, sig, outputs}. Aynı kaynağın
+    son satırı geçerlidir; her görsel bitince yazılıp flush edilir (kesintide kayıp olmaz).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        if path.is_file():
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                        self.records[rec["src"]] = rec
+                    except (ValueError, KeyError):
+                        continue    # yarım kalmış son satır
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def fresh(self, rel: str, src: Path, st: os.stat_result, sig: str, root: Path, use_hash: bool) -> bool:
+        rec = self.records.get(rel)
+        if not rec or rec.get("sig") != sig:
+            return False
+        if not all((root / o).is_file() for o in rec.get("outputs", [])):
+            return False
+        if rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+            return True
+        # mtime değişmiş (kopyalama/geri yükleme): içerik aynıysa yine atlanır, yeni mtime yazılır
+        if use_hash and rec.get("sha256") and rec.get("size") == st.st_size and sha256_file(src) == rec["sha256"]:
+            self._append(dict(rec, mtime_ns=st.st_mtime_ns))
+            return True
+        return False
+
+    def record(self, rel: str, src: Path, sig: str, outputs: list[str], use_hash: bool):
+        st = src.stat()
+        rec = {"src": rel, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+               "sha256": sha256_file(src) if use_hash else None, "sig": sig, "outputs": outputs,
+               "at": datetime.utcnow().isoformat(timespec="seconds")}
+        self._append(rec)
+
+    def _append(self, rec: dict):
+        self.records[rec["src"]] = rec
+        self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+class Progress:
+    """interval saniyede bir: biten/toplam görsel, görsel/sn, çıktı MPx/sn, tahmini kalan süre."""
+
+    def __init__(self, total: int, interval: float = 5.0, stream=sys.stderr):
+        self.total, self.interval, self.stream = total, interval, stream
+        self.images = self.outputs = self.errors = 0
+        self.out_px = 0
+        self.started = self._last = time.monotonic()
+
+    def output(self):
+        self.outputs += 1
+        self.report()
+
+    def image(self, out_px: int):
+        self.images += 1
+        self.out_px += out_px
+        self.report()
+
+    def error(self):
+        self.errors += 1
+
+    def summary(self) -> dict:
+        secs = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "images": self.images,
+            "total": self.total,
+            "outputs": self.outputs,
+            "errors": self.errors,
+            "seconds": round(secs, 1),
+            "images_per_sec": round(self.images / secs, 2),
+            "mpx_per_sec": round(self.out_px / secs / 1e6, 1),
+        }
+
+    def report(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        s = self.summary()
+        rate = s["images_per_sec"]
+        eta = (self.total - self.images) / rate if rate else 0
+        pct = 100.0 * self.images / self.total if self.total else 100.0
+        print(f"[{pct:5.1f}%] {self.images}/{self.total} görsel, {self.outputs} çıktı, "
+              f"{rate} görsel/sn, {s['mpx_per_sec']} MPx/sn, kalan ~{int(eta // 60)}:{int(eta % 60):02d}, "
+              f"hata {self.errors}", file=self.stream, flush=True)
+
+
+def _settings_signature(settings: RenderSettings, sizes, labels, scale: int) -> str:
+    """Çıktıyı etkileyen her şey: değişirse manifest kaydı geçersiz sayılır."""
+    plan = ",".join(f"{label}={w}x{h}" for label, (w, h) in zip(labels, sizes))
+    return f"{encoder_signature(settings)}|scale{scale}|{plan}"
+
+
+def run_batch(src_root, out_root, *, selection=None, orientation: str = "auto", scale: int = 5,
+              executor: str = "thread", workers: int | None = None, encoding: str = "print-max",
+              quality: str = "best", use_hash: bool = False, force: bool = False,
+              manifest_path=None, errors_path=None, interval: float = 5.0, render_opts: dict | None = None) -> dict:
+    """Ağacı render eder; özet sözlük döner (bkz. Progress.summary, + skipped)."""
+    src_root, out_root = Path(src_root).resolve(), Path(out_root).resolve()
+    out_root.mkdir(parents=True, exist_ok=True)
+    # Verilmeyen ayarlar iter_render_jobs'un varsayılanlarıyla doldurulur: manifest imzası
+    # çıktıların gerçekten üretildiği ayarları anlatsın
+    render_opts = dict(dict(cascade=True, draft_margin=DRAFT_MARGIN, reducing_gap=REDUCING_GAP,
+                            band_rows=BAND_ROWS, band_min_pixels=BAND_MIN_PIXELS), **(render_opts or {}))
+    settings = RenderSettings(render_opts["cascade"], render_opts["draft_margin"], render_opts["reducing_gap"],
+                              render_opts["band_rows"], render_opts["band_min_pixels"], encoding, quality)
+    manifest = Manifest(Path(manifest_path) if manifest_path else out_root / MANIFEST_NAME)
+    errors_fh = open(Path(errors_path) if errors_path else out_root / ERRORS_NAME, "w", encoding="utf-8")
+
+    def _error(rel: str, e):
+        progress.error()
+        errors_fh.write(json.dumps({"src": rel, "error": str(e) or type(e).__name__,
+                                    "at": datetime.utcnow().isoformat(timespec="seconds")}, ensure_ascii=False) + "\n")
+        errors_fh.flush()
+
+    # 1) Tara, yönlendirmeye göre grupla, güncel olanları atla
+    sources = scan_tree(src_root, skip=out_root)
+    progress = Progress(len(sources), interval)
+    groups: dict[str, list] = {}
+    skipped = 0
+    plans = {o: select_sizes(o, selection) for o in ("portrait", "landscape")}
+    stems = Counter((src.parent, src.stem) for src in sources)
+    sigs = {o: _settings_signature(settings, *plans[o], scale) for o in plans}
+    for src in sources:
+        rel = src.relative_to(src_root).as_posix()
+        try:
+            orient = detect_orientation(src) if orientation == "auto" else orientation
+            if not force and manifest.fresh(rel, src, src.stat(), sigs[orient], out_root, use_hash):
+                skipped += 1
+                continue
+        except Exception as e:
+            _error(rel, e)
+            continue
+        # Aynı klasörde aynı adlı farklı uzantılar (a.jpg / a.png) çakışmasın
+        base = src.stem if stems[(src.parent, src.stem)] == 1 else src.name
+        alt = out_root / src.relative_to(src_root).parent / base
+        groups.setdefault(orient, []).append((rel, str(src), str(alt), base))
+    progress.total = sum(len(g) for g in groups.values())
+
+    # 2) Render: bir görselin tüm ölçüleri çıkınca manifest'e yazılır
+    try:
+        for orient, jobs in groups.items():
+            sizes, labels = plans[orient]
+            n = len(sizes)
+            out_px = sum(w * h for w, h in sizes) * scale * scale
+            by_alt = {alt: (rel, src, base) for rel, src, alt, base in jobs}
+            done: dict[str, int] = {}
+            for path in iter_render_jobs(jobs, sizes, scale, executor=executor, workers=workers, labels=labels,
+                                         on_error=_error, encoding=encoding, quality=quality, **render_opts):
+                progress.output()
+                alt = os.path.dirname(path)
+                done[alt] = done.get(alt, 0) + 1
+                if done[alt] != n:
+                    continue
+                rel, src, base = by_alt[alt]
+                outputs = [Path(p).relative_to(out_root).as_posix()
+                           for p in output_paths(alt, base, n, labels, encoding)]
+                try:
+                    manifest.record(rel, Path(src), sigs[orient], outputs, use_hash)
+                except OSError as e:
+                    _error(rel, e)
+                progress.image(out_px)
+    finally:
+        manifest.close()
+        errors_fh.close()
+        progress.report(force=True)
+    return dict(progress.summary(), skipped=skipped)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.batch", description="Toplu (özyinelemeli) render")
+    parser.add_argument("src", help="girdi klasörü (alt klasörler dahil)")
+    parser.add_argument("out", help="çıktı klasörü (manifest ve errors dosyası da burada)")
+    parser.add_argument("--sizes", default="", help="virgüllü ölçü etiketleri / <en>x<boy> inç (boş => 8'li tablo)")
+    parser.add_argument("--orientation", choices=("auto", "portrait", "landscape"), default="auto")
+    parser.add_argument("--scale", type=int, default=5)
+    parser.add_argument("--executor", choices=EXECUTORS, default=config.IMAGING_EXECUTOR)
+    parser.add_argument("--workers", type=int, default=config.IMAGING_WORKERS, help="0 => CPU sayısı")
+    parser.add_argument("--encoding", choices=available_encodings(),
+                        default=resolve_encoding(config.IMAGING_ENCODING_PROFILE))
+    parser.add_argument("--quality", choices=list(QUALITY_TIERS), default=resolve_quality(config.IMAGING_QUALITY))
+    parser.add_argument("--hash", action="store_true", help="manifest'e SHA-256 yaz; mtime değişse de içerik aynıysa atla")
+    parser.add_argument("--force", action="store_true", help="manifest'i yok say, hepsini yeniden üret")
+    parser.add_argument("--manifest", help=f"manifest yolu (varsayılan: <out>/{MANIFEST_NAME})")
+    parser.add_argument("--errors", help=f"hata raporu yolu (varsayılan: <out>/{ERRORS_NAME})")
+    parser.add_argument("--progress-interval", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    try:
+        select_sizes("portrait", args.sizes)
+    except ValueError as e:
+        parser.error(str(e))
+    summary = run_batch(
+        args.src, args.out,
+        selection=args.sizes, orientation=args.orientation, scale=max(1, min(args.scale, 5)),
+        executor=args.executor, workers=args.workers, encoding=args.encoding, quality=args.quality,
+        use_hash=args.hash, force=args.force, manifest_path=args.manifest, errors_path=args.errors,
+        interval=args.progress_interval,
+        render_opts=dict(
+            cascade=config.IMAGING_CASCADE,
+            draft_margin=config.IMAGING_DRAFT_MARGIN or None,
+            reducing_gap=config.IMAGING_REDUCING_GAP or None,
+            band_rows=config.IMAGING_BAND_ROWS or None,
+            band_min_pixels=config.IMAGING_BAND_MIN_PIXELS,
+        ),
+    )
+    print(json.dumps(summary, ensure_ascii=False))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
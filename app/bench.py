@@ -0,0 +1,334 @@
+# app/bench.py
+"""
+Görsel işleme mikro-benchmark'ı (çevrimdışı, yalnız Pillow + stdlib):
+
+    python -m app.bench run [--out sonuc.json] [--scales 1-5] [--orientations portrait,landscape]
+                            [--sources photo-jpeg,scan-png,noise-jpeg] [--source GERCEK.jpg ...] [--repeat 3]
+    python -m app.bench compare ONCEKI.json SONRAKI.json [--threshold 10] [--min-seconds 0.02]
+
+Her kaynak 8'li plandan (ya da --sizes) her yön ve scale için render edilir; aşama süreleri
+(decode / resize / encode imaging timer kancasıyla, pack = stream_zip), piksel/sn, çıktı
+baytı ve tepe bellek (RSS: VmHWM / ru_maxrss, Python yığını: tracemalloc) kaydedilir.
+Her durum ayrı (spawn) süreçte çalışır; tepe RSS diğer durumlardan etkilenmez. Sentetik
+kaynaklar sabit tohumla üretilir (koşular arası aynı baytlar). compare, iki koşunun ortak
+durumlarında eşiği aşan artışları listeler ve varsa 1 ile çıkar.
+"""
+import argparse, json, os, platform, random, resource, sys, tempfile, time, tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+import PIL
+from PIL import Image, ImageFilter
+
+import config
+from .services.imaging import (
+    EXECUTORS, QUALITY_TIERS, RenderSettings, available_encodings, encoder_signature, iter_render_jobs,
+    resolve_encoding, resolve_quality, select_sizes,
+)
+from .services.packing import stream_zip_from_folder
+from .services.timing import StageTimer
+
+STAGES = ("decode", "resize", "encode", "pack")
+# compare: süre metriklerinde bunun altındaki taban değerler gürültü sayılır (sn)
+MIN_SECONDS = 0.02
+
+
+def _noise(size: tuple[int, int], seed: int, mode: str = "RGB") -> Image.Image:
+    bands = 3 if mode == "RGB" else 1
+    return Image.frombytes(mode, size, random.Random(seed).randbytes(size[0] * size[1] * bands))
+
+
+def _photo(size: tuple[int, int]) -> Image.Image:
+    """Fotoğraf benzeri: yumuşak geçişler + ayrıntı + hafif sensör gürültüsü."""
+    detail = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 80)
+    grad_x = Image.linear_gradient("L").resize(size, Image.Resampling.BILINEAR)
+    grad_y = Image.linear_gradient("L").rotate(90).resize(size, Image.Resampling.BILINEAR)
+    im = Image.merge("RGB", (detail, grad_x, grad_y)).filter(ImageFilter.GaussianBlur(1.5))
+    return Image.blend(im, _noise(size, 7), 0.08)
+
+
+def _scan(size: tuple[int, int]) -> Image.Image:
+    """Taranmış baskı benzeri: geniş düz alanlar + keskin kenarlar."""
+    im = Image.new("RGB", size, (246, 242, 232))
+    tile = Image.effect_mandelbrot((size[0] // 2, size[1] // 2), (-0.75, 0.05, -0.7, 0.1), 120).convert("RGB")
+    im.paste(tile, (size[0] // 4, size[1] // 4))
+    return Image.blend(im, _noise(size, 11), 0.03)
+
+
+# Sentetik kaynaklar: ad -> (üretici, boyut, biçim, save() parametreleri)
+SYNTHETIC = {
+    "photo-jpeg": (_photo, (4000, 3000), "JPEG", {"quality": 92}),          # 12 MP kamera çıktısı
+    "scan-png": (_scan, (2480, 3508), "PNG", {"compress_level": 6}),       # A4 @ 300 dpi tarama
+    "noise-jpeg": (lambda s: _noise(s, 3), (1600, 1200), "JPEG", {"quality": 90}),  # encode için en kötü durum
+}
+
+
+def make_sources(names, folder: Path) -> dict[str, Path]:
+    """Sentetik kaynakları folder'a yazar: {ad: yol}."""
+    out = {}
+    for name in names:
+        gen, size, fmt, opts = SYNTHETIC[name]
+        path = folder / f"{name}.{'png' if fmt == 'PNG' else 'jpg'}"
+        gen(size).save(path, fmt, **opts)
+        out[name] = path
+    return out
+
+
+def _rss_reset():
+    # Linux: tepe RSS işaretini (VmHWM) sıfırla; durum başına tepe ölçülsün
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(src: str, orientation: str, scale: int, selection: str, render_opts: dict) -> dict:
+    """Tek durum: render + paket; ölçümler (süreler sn, baytlar, tepe bellek KB)."""
+    sizes, labels = select_sizes(orientation, selection or None)
+    with Image.open(src) as im:
+        src_pixels = im.size[0] * im.size[1]
+    out_pixels = sum(w * scale * h * scale for w, h in sizes)
+    timer = StageTimer(labels, scale)
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        _rss_reset()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        base = Path(src).stem
+        paths = list(iter_render_jobs([(Path(src).name, src, os.path.join(tmp, base), base)], sizes, scale,
+                                      labels=labels, on_error=_raise, timer=timer, **render_opts))
+        render_wall = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        zip_bytes = sum(len(chunk) for chunk in stream_zip_from_folder(tmp, paths))
+        timer("pack", time.perf_counter() - t1)
+        py_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        output_bytes = sum(os.path.getsize(p) for p in paths)
+
+    secs = {stage: timer.totals.get(stage, 0.0) for stage in STAGES}
+    return {
+        "outputs": len(paths),
+        "src_pixels": src_pixels,
+        "out_pixels": out_pixels,
+        "wall_seconds": render_wall + secs["pack"],
+        "stages": {stage: {"seconds": secs[stage],
+                           "pixels_per_sec": int((src_pixels if stage == "decode" else out_pixels) / secs[stage])
+                           if secs[stage] else None}
+                   for stage in STAGES},
+        "sizes_ms": timer.as_dict()["sizes_ms"],
+        "output_bytes": output_bytes,
+        "zip_bytes": zip_bytes,
+        "peak_rss_kb": _peak_rss_kb(),
+        "py_peak_kb": py_peak // 1024,
+    }
+
+
+def _raise(name, e):
+    raise RuntimeError(f"{name}: {e}") from e
+
+
+def _best(runs: list[dict]) -> dict:
+    """Tekrarlar: süre metriklerinde en küçük (gürültü hep ekler), bellekte en büyük."""
+    best = json.loads(json.dumps(min(runs, key=lambda r: r["wall_seconds"])))
+    for stage in STAGES:
+        secs = min(r["stages"][stage]["seconds"] for r in runs)
+        pixels = best["src_pixels"] if stage == "decode" else best["out_pixels"]
+        best["stages"][stage] = {"seconds": secs, "pixels_per_sec": int(pixels / secs) if secs else None}
+    best["peak_rss_kb"] = max(r["peak_rss_kb"] for r in runs)
+    best["py_peak_kb"] = max(r["py_peak_kb"] for r in runs)
+    best["repeat"] = len(runs)
+    return best
+
+
+def run_suite(sources: dict[str, Path], orientations, scales, *, selection: str = "", repeat: int = 1,
+              isolate: bool = True, render_opts: dict | None = None, log=print) -> dict:
+    render_opts = dict(render_opts or {})
+    settings = RenderSettings(**{k: render_opts[k] for k in RenderSettings._fields if k in render_opts})
+    ctx = get_context("spawn")
+    cases = {}
+    for name, src in sources.items():
+        for orientation in orientations:
+            for scale in scales:
+                case_id = f"{name}/{orientation}/x{scale}"
+                runs = []
+                for _ in range(max(1, repeat)):
+                    if isolate:
+                        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                            runs.append(pool.submit(run_case, str(src), orientation, scale, selection,
+                                                    render_opts).result())
+                    else:
+                        runs.append(run_case(str(src), orientation, scale, selection, render_opts))
+                row = dict(_best(runs), source=name, orientation=orientation, scale=scale)
+                cases[case_id] = row
+                log(f"{case_id:32s} {row['wall_seconds']:7.2f}s  "
+                    + "  ".join(f"{s}={row['stages'][s]['seconds']:.2f}" for s in STAGES)
+                    + f"  out={row['output_bytes'] / 1e6:.1f}MB  rss={row['peak_rss_kb'] / 1024:.0f}MB")
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "encoder": encoder_signature(settings),
+            "executor": render_opts.get("executor"),
+            "workers": render_opts.get("workers"),
+            "selection": selection,
+            "repeat": repeat,
+        },
+        "cases": cases,
+    }
+
+
+def _metrics(row: dict) -> dict[str, float]:
+    m = {"wall_seconds": row["wall_seconds"]}
+    for stage in STAGES:
+        m[f"{stage}_seconds"] = row["stages"][stage]["seconds"]
+    m.update(output_bytes=row["output_bytes"], zip_bytes=row["zip_bytes"], peak_rss_kb=row["peak_rss_kb"])
+    return m
+
+
+def compare(base: dict, new: dict, threshold: float = 10.0, min_seconds: float = MIN_SECONDS) -> dict:
+    """
+    Ortak durumların metrik oranları. Artış threshold yüzdesini aşarsa regresyon, aynı oranda
+    düşüş iyileşme sayılır; tabanı min_seconds'tan kısa süre metrikleri atlanır.
+    """
+    regressions, improvements = [], []
+    common = sorted(set(base["cases"]) & set(new["cases"]))
+    for case_id in common:
+        a, b = _metrics(base["cases"][case_id]), _metrics(new["cases"][case_id])
+        for metric, old in a.items():
+            cur = b.get(metric)
+            if cur is None or not old or (metric.endswith("_seconds") and old < min_seconds):
+                continue
+            change = (cur - old) / old * 100
+            row = {"case": case_id, "metric": metric, "base": old, "new": cur, "change_pct": round(change, 1)}
+            if change > threshold:
+                regressions.append(row)
+            elif change < -threshold:
+                improvements.append(row)
+    env = [k for k in ("pillow", "python", "cpu_count", "encoder", "executor", "workers")
+           if base["meta"].get(k) != new["meta"].get(k)]
+    return {
+        "compared": len(common),
+        "only_base": sorted(set(base["cases"]) - set(new["cases"])),
+        "only_new": sorted(set(new["cases"]) - set(base["cases"])),
+        "environment_changed": env,
+        "regressions": regressions,
+        "improvements": improvements,
+    }
+
+
+def _parse_scales(text: str) -> list[int]:
+    scales = set()
+    for part in text.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            scales.update(range(int(lo), int(hi) + 1))
+        elif part:
+            scales.add(int(part))
+    if not scales or min(scales) < 1 or max(scales) > 5:
+        raise ValueError("scale 1-5 aralığında olmalı")
+    return sorted(scales)
+
+
+def _cmd_run(args) -> int:
+    try:
+        scales = _parse_scales(args.scales)
+        select_sizes("portrait", args.sizes or None)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    names = [n.strip() for n in args.sources.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SYNTHETIC]
+    if unknown:
+        print(f"bilinmeyen sentetik kaynak: {', '.join(unknown)} (seçenekler: {', '.join(SYNTHETIC)})", file=sys.stderr)
+        return 2
+    render_opts = dict(
+        executor=args.executor, workers=args.workers,
+        cascade=config.IMAGING_CASCADE,
+        draft_margin=config.IMAGING_DRAFT_MARGIN or None,
+        reducing_gap=config.IMAGING_REDUCING_GAP or None,
+        band_rows=config.IMAGING_BAND_ROWS or None,
+        band_min_pixels=config.IMAGING_BAND_MIN_PIXELS,
+        encoding=args.encoding, quality=args.quality,
+    )
+    with tempfile.TemporaryDirectory(prefix="bench-src-") as tmp:
+        sources = make_sources(names, Path(tmp))
+        for path in args.source or []:
+            sources[Path(path).name] = Path(path)
+        result = run_suite(sources, [o.strip() for o in args.orientations.split(",") if o.strip()], scales,
+                           selection=args.sizes, repeat=args.repeat, isolate=not args.no_isolate,
+                           render_opts=render_opts, log=lambda line: print(line, file=sys.stderr))
+    text = json.dumps(result, ensure_ascii=False, indent=1)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+def _cmd_compare(args) -> int:
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))
+    report = compare(base, new, args.threshold, args.min_seconds)
+    if report["environment_changed"]:
+        print(f"UYARI: ortam farklı ({', '.join(report['environment_changed'])}); sonuçlar doğrudan kıyaslanamayabilir")
+    for title, rows in (("REGRESYON", report["regressions"]), ("İYİLEŞME", report["improvements"])):
+        for r in rows:
+            print(f"{title:9s} {r['case']:32s} {r['metric']:16s} {r['base']:>14.4g} -> {r['new']:<14.4g} "
+                  f"{r['change_pct']:+.1f}%")
+    print(f"{report['compared']} durum karşılaştırıldı; {len(report['regressions'])} regresyon, "
+          f"{len(report['improvements'])} iyileşme (eşik %{args.threshold:g})")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    return 1 if report["regressions"] else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.bench", description="Görsel işleme benchmark'ı")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    run = sub.add_parser("run", help="benchmark'ı çalıştır")
+    run.add_argument("--out", help="sonuç JSON yolu (boş => stdout)")
+    run.add_argument("--scales", default="1-5", help="örn. 1-5 ya da 1,3,5")
+    run.add_argument("--orientations", default="portrait,landscape")
+    run.add_argument("--sources", default=",".join(SYNTHETIC), help="sentetik kaynaklar (virgüllü)")
+    run.add_argument("--source", action="append", help="gerçek görsel (tekrarlanabilir)")
+    run.add_argument("--sizes", default="", help="virgüllü ölçü etiketleri (boş => 8'li tablo)")
+    run.add_argument("--repeat", type=int, default=1, help="durum başına tekrar (en iyi süre alınır)")
+    run.add_argument("--executor", choices=EXECUTORS, default="serial",
+                     help="serial => aşama süreleri duvar saatine eşit (varsayılan)")
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--encoding", choices=available_encodings(),
+                     default=resolve_encoding(config.IMAGING_ENCODING_PROFILE))
+    run.add_argument("--quality", choices=list(QUALITY_TIERS), default=resolve_quality(config.IMAGING_QUALITY))
+    run.add_argument("--no-isolate", action="store_true", help="durumları aynı süreçte çalıştır (RSS birikimli olur)")
+
+    cmp_ = sub.add_parser("compare", help="iki sonucu karşılaştır (regresyonda çıkış kodu 1)")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--threshold", type=float, default=10.0, help="yüzde")
+    cmp_.add_argument("--min-seconds", type=float, default=MIN_SECONDS)
+    cmp_.add_argument("--json", help="raporu JSON olarak da yaz")
+
+    args = parser.parse_args(argv)
+    return _cmd_run(args) if args.cmd == "run" else _cmd_compare(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
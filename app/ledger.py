@@ -0,0 +1,42 @@
+# app/ledger.py
+"""
+Kullanıcı toplamları (user_ledger) bakımı:
+
+    python -m app.ledger rebuild [--user ID ...]   audit_event'ten yeniden hesapla
+    python -m app.ledger check [--fix]             farkları listele (--fix => farklı kullanıcıları yeniden hesapla)
+
+check farklılık bulursa 1 ile çıkar (zamanlanmış kontrol için).
+"""
+import argparse, json
+
+from . import create_app
+from .services.ledger import check_ledger, rebuild_ledger
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.ledger", description="user_ledger bakımı")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rb = sub.add_parser("rebuild", help="audit_event'ten yeniden hesapla")
+    rb.add_argument("--user", type=int, action="append", help="yalnız bu kullanıcı(lar)")
+    ck = sub.add_parser("check", help="ledger ile audit_event toplamlarını karşılaştır")
+    ck.add_argument("--fix", action="store_true", help="farklı kullanıcıları yeniden hesapla")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.cmd == "rebuild":
+            n = rebuild_ledger(args.user)
+            print(f"{n} kullanıcı yeniden hesaplandı")
+            return 0
+        diffs = check_ledger()
+        for d in diffs:
+            print(json.dumps(d, ensure_ascii=False))
+        if diffs and args.fix:
+            n = rebuild_ledger({d["user_id"] for d in diffs})
+            print(f"{n} kullanıcı düzeltildi")
+        print(f"{len({d['user_id'] for d in diffs})} kullanıcıda fark")
+        return 1 if diffs and not args.fix else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -71,9 +71,117 @@ class AuditEvent(db.Model):
     meta       = db.Column(db.Text, nullable=True)                     # JSON string
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
+    # meta'daki sık okunan alanların tipli kopyaları (flush öncesi doldurulur; bkz. services/audit)
+    tokens     = db.Column(db.Integer, nullable=True)
+    files      = db.Column(db.Integer, nullable=True)
+    tier       = db.Column(db.Integer, nullable=True)
+    order_id   = db.Column(db.String(128), nullable=True, index=True)
+    txn_id     = db.Column(db.String(128), nullable=True, index=True)
+
+    __table_args__ = (
+        db.Index("ix_audit_event_user_event", "user_id", "event", "created_at"),   # kullanıcı geçmişi / toplamlar
+        db.Index("ix_audit_event_event_created", "event", "created_at"),           # analitik aralık taramaları
+    )
+
     def __repr__(self) -> str:
         return f"<AuditEvent {self.event} uid={self.user_id} at={self.created_at}>"
 
+# -------------------------------------------------
+# METRICS HOURLY (audit_event'ten türeyen saatlik analitik özetleri)
+# -------------------------------------------------
+class MetricsHourly(db.Model):
+    __tablename__ = "metrics_hourly"
+
+    hour   = db.Column(db.Integer, primary_key=True)                  # UTC epoch saati (unix saniye // 3600)
+    event  = db.Column(db.String(40), primary_key=True)
+    count  = db.Column(db.Integer, nullable=False, default=0)
+    files  = db.Column(db.Integer, nullable=False, default=0)         # SUM(audit_event.files)
+    tokens = db.Column(db.Integer, nullable=False, default=0)         # SUM(audit_event.tokens), negatifler 0
+    user_sketch = db.Column(db.LargeBinary, nullable=True)            # tekil user_id HyperLogLog eskizi (services/hll)
+
+    def __repr__(self) -> str:
+        return f"<MetricsHourly {self.hour} {self.event} n={self.count}>"
+
+# -------------------------------------------------
+# USER LEDGER (audit_event'ten türeyen kullanıcı başı toplamlar)
+# -------------------------------------------------
+class UserLedger(db.Model):
+    __tablename__ = "user_ledger"
+
+    user_id       = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    spent         = db.Column(db.Integer, default=0, nullable=False)   # token_spent meta.tokens toplamı
+    purchased     = db.Column(db.Integer, default=0, nullable=False)   # token_purchase meta.tokens toplamı
+    daily_claims  = db.Column(db.Integer, default=0, nullable=False)   # daily_claim sayısı
+    reward        = db.Column(db.Integer, default=0, nullable=False)   # reward_claim meta.tokens toplamı
+    tiers_claimed = db.Column(db.Integer, default=0, nullable=False)   # tier_claim meta.tier bit maskesi (1 << tier)
+    updated_at    = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<UserLedger uid={self.user_id} spent={self.spent} purchased={self.purchased}>"
+
+# -------------------------------------------------
+# RENDER JOB (asenkron yükleme işleri)
+# -------------------------------------------------
+class RenderJob(db.Model):
+    __tablename__ = "render_job"
+
+    id          = db.Column(db.String(32), primary_key=True)            # uuid4 hex (istemciye verilen job id)
+    user_id     = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    status      = db.Column(db.String(16), default="queued", nullable=False, index=True)  # queued | running | streaming | done | failed | expired
+    orientation = db.Column(db.String(16), default="portrait", nullable=False)
+    scale       = db.Column(db.Integer, default=5, nullable=False)
+    files       = db.Column(db.Integer, default=0, nullable=False)
+    tokens      = db.Column(db.Integer, nullable=True)                  # düşülecek token (None => files)
+    sizes       = db.Column(db.Text, nullable=True)                     # JSON: [[etiket, w, h], ...] (None => 8'li tablo)
+    progress    = db.Column(db.Text, nullable=True)                     # JSON: {"<basename>": üretilen_çıktı_sayısı}
+    error       = db.Column(db.Text, nullable=True)
+    result_name = db.Column(db.String(255), nullable=True)              # indirme dosya adı (örn. pack.zip)
+    encoding    = db.Column(db.String(32), nullable=True)               # çıktı kodlama profili (None => varsayılan)
+    quality     = db.Column(db.String(16), nullable=True)               # istenen kalite kademesi (None => varsayılan)
+    lease_owner = db.Column(db.String(64), nullable=True)               # işi üstlenen işçi (host:pid/...)
+    lease_expires_at = db.Column(db.DateTime, nullable=True, index=True)  # heartbeat ile uzar; geçerse iş geri alınır
+    attempts    = db.Column(db.Integer, default=0, nullable=False)      # kaç kez üstlenildi
+    created_at  = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    started_at  = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<RenderJob {self.id} uid={self.user_id} {self.status}>"
+
+# -------------------------------------------------
+# UPLOAD SESSION (parçalı, kaldığı yerden devam eden yükleme)
+# -------------------------------------------------
+class UploadSession(db.Model):
+    __tablename__ = "upload_session"
+
+    id          = db.Column(db.String(32), primary_key=True)            # uuid4 hex
+    user_id     = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    filename    = db.Column(db.String(255), nullable=False)             # secure_filename uygulanmış
+    size        = db.Column(db.BigInteger, nullable=False)              # beklenen toplam bayt
+    received    = db.Column(db.BigInteger, default=0, nullable=False)   # diske yazılan bayt (= sıradaki offset)
+    sha256      = db.Column(db.String(64), nullable=True)               # istemcinin bildirdiği (opsiyonel)
+    digest      = db.Column(db.String(64), nullable=True)               # finalize'da hesaplanan
+    status      = db.Column(db.String(16), default="open", nullable=False, index=True)  # open | done | used
+    created_at  = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    updated_at  = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<UploadSession {self.id} uid={self.user_id} {self.received}/{self.size} {self.status}>"
+
+# -------------------------------------------------
+# APP SETTING (admin panelinden değiştirilebilen ayarlar)
+# -------------------------------------------------
+class AppSetting(db.Model):
+    __tablename__ = "app_setting"
+
+    key        = db.Column(db.String(64), primary_key=True)
+    value      = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_by = db.Column(db.Integer, nullable=True)  # admin user_id (opsiyonel)
+
+    def __repr__(self) -> str:
+        return f"<AppSetting {self.key}={self.value!r}>"
+
 # -------------------------------------------------
 # COUPONS
 # -------------------------------------------------
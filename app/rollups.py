@@ -0,0 +1,46 @@
+# app/rollups.py
+"""
+Saatlik analitik kovaları (metrics_hourly) bakımı:
+
+    python -m app.rollups rebuild [--since YYYY-MM-DD]   audit_event'ten yeniden hesapla
+    python -m app.rollups check [--since YYYY-MM-DD]     farkları listele
+
+check farklılık bulursa 1 ile çıkar.
+"""
+import argparse, json
+from datetime import datetime
+
+from . import create_app
+from .services.rollups import check_rollups, rebuild_rollups
+
+
+def _date(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"YYYY-MM-DD bekleniyor: {value!r}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.rollups", description="metrics_hourly bakımı")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name, help_ in (("rebuild", "audit_event'ten yeniden hesapla"), ("check", "kovaları audit_event ile karşılaştır")):
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("--since", type=_date, help="yalnız bu UTC tarihten itibaren (varsayılan: tüm geçmiş)")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.cmd == "rebuild":
+            n = rebuild_rollups(args.since)
+            print(f"{n} saatlik kova yazıldı")
+            return 0
+        diffs = check_rollups(args.since)
+        for d in diffs:
+            print(json.dumps(d, ensure_ascii=False))
+        print(f"{len(diffs)} kovada fark")
+        return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
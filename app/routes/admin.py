@@ -1,11 +1,14 @@
 # app/routes/admin.py
 from datetime import datetime, timedelta
-import json, random
+import json, math, random
 from flask import Blueprint, current_app, render_template, jsonify, request, abort, redirect, url_for, flash
 from flask_login import login_required, current_user
 from sqlalchemy import text
 from .. import db
 from ..models import User, AuditEvent  # kullanıcı ve log modeli
+from ..services.ledger import get_ledger
+from ..services.hll import HyperLogLog
+from ..services.rollups import DISTINCT_GROUPS, distinct_users, group_key, hour_of
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -50,47 +53,20 @@ def users_page():
         where = "(LOWER(u.email) LIKE LOWER(:q))"
         params['q'] = f"%{q}%"
 
-    # harcanan & satın alınan & günlük ödül & reward kolonlarını topluyoruz
+    # harcanan & satın alınan & günlük ödül & reward kolonları: user_ledger (audit_event yazımıyla
+    # aynı transaction'da güncellenen özet tablo; bkz. services/ledger)
     sql = f"""
-    WITH
-    spent AS (
-        SELECT user_id, SUM(CAST(json_extract(meta,'$.tokens') AS INTEGER)) AS spent
-        FROM audit_event
-        WHERE event='token_spent'
-        GROUP BY user_id
-    ),
-    purchased AS (
-        SELECT user_id, SUM(CAST(json_extract(meta,'$.tokens') AS INTEGER)) AS purchased
-        FROM audit_event
-        WHERE event='token_purchase'
-        GROUP BY user_id
-    ),
-    claims AS (
-        SELECT user_id, COUNT(*) AS claims
-        FROM audit_event
-        WHERE event='daily_claim'
-        GROUP BY user_id
-    ),
-    rewards AS (
-        SELECT user_id, SUM(CAST(json_extract(meta,'$.tokens') AS INTEGER)) AS reward
-        FROM audit_event
-        WHERE event='reward_claim'
-        GROUP BY user_id
-    )
     SELECT
         u.id, u.email, u.tokens,
-        COALESCE(s.spent,0)     AS spent,
-        COALESCE(p.purchased,0) AS purchased,
-        COALESCE(c.claims,0)    AS claims,
-        COALESCE(r.reward,0)    AS reward,
-        u.is_banned             AS is_banned,
-        u.is_trusted            AS is_trusted,
-        u.created_at            AS created
+        COALESCE(l.spent,0)        AS spent,
+        COALESCE(l.purchased,0)    AS purchased,
+        COALESCE(l.daily_claims,0) AS claims,
+        COALESCE(l.reward,0)       AS reward,
+        u.is_banned                AS is_banned,
+        u.is_trusted               AS is_trusted,
+        u.created_at               AS created
     FROM user u
-    LEFT JOIN spent     s ON s.user_id = u.id
-    LEFT JOIN purchased p ON p.user_id = u.id
-    LEFT JOIN claims    c ON c.user_id = u.id
-    LEFT JOIN rewards   r ON r.user_id = u.id
+    LEFT JOIN user_ledger l ON l.user_id = u.id
     WHERE {where}
     """
 
@@ -150,30 +126,10 @@ def users_page():
 def user_detail(user_id: int):
     u = User.query.get_or_404(user_id)
 
-    # özet rakamlar
-    spent = db.session.execute(
-        text("""SELECT COALESCE(SUM(CAST(json_extract(meta,'$.tokens') AS INTEGER)),0)
-                FROM audit_event WHERE user_id=:uid AND event='token_spent'"""),
-        {'uid': user_id}
-    ).scalar() or 0
-
-    purchased = db.session.execute(
-        text("""SELECT COALESCE(SUM(CAST(json_extract(meta,'$.tokens') AS INTEGER)),0)
-                FROM audit_event WHERE user_id=:uid AND event='token_purchase'"""),
-        {'uid': user_id}
-    ).scalar() or 0
-
-    claim_count = db.session.execute(
-        text("""SELECT COUNT(*) FROM audit_event
-                WHERE user_id=:uid AND event='daily_claim'"""),
-        {'uid': user_id}
-    ).scalar() or 0
-
-    reward_sum = db.session.execute(
-        text("""SELECT COALESCE(SUM(CAST(json_extract(meta,'$.tokens') AS INTEGER)),0)
-                FROM audit_event WHERE user_id=:uid AND event='reward_claim'"""),
-        {'uid': user_id}
-    ).scalar() or 0
+    # özet rakamlar (user_ledger)
+    ledger = get_ledger(user_id)
+    spent, purchased = ledger.spent, ledger.purchased
+    claim_count, reward_sum = ledger.daily_claims, ledger.reward
 
     # ŞÜPHELİ?
     free = 3 + int(claim_count) + int(reward_sum)
@@ -195,12 +151,12 @@ def user_detail(user_id: int):
             pass
         orders.append({
             'created': ev.created_at,
-            'qty':     m.get('tokens') or m.get('qty') or 0,
+            'qty':     ev.tokens or m.get('qty') or 0,
             'amount':  m.get('amount'),
             'currency': m.get('currency'),
             'provider': m.get('provider') or m.get('gateway') or '-',
-            'order_no': m.get('order_id') or m.get('order') or m.get('payment_id') or '-',
-            'txn_id':   m.get('txn_id') or m.get('transaction_id') or '-',
+            'order_no': ev.order_id or m.get('order') or m.get('payment_id') or '-',
+            'txn_id':   ev.txn_id or m.get('transaction_id') or '-',
         })
 
     # İşlem geçmişi
@@ -213,23 +169,22 @@ def user_detail(user_id: int):
 
     activities = []
     for ev in ev_q.all():
-        try:
-            m = json.loads(ev.meta or '{}')
-        except Exception:
-            m = {}
-
         detail = '—'
-        if ev.event == 'upload' and m.get('files') is not None:
-            detail = f"{m.get('files')} dosya"
-        elif ev.event == 'token_spent' and m.get('tokens') is not None:
-            detail = f"-{m.get('tokens')} token"
-        elif ev.event == 'token_purchase' and m.get('tokens') is not None:
-            cur = m.get('currency') or ''
-            detail = f"+{m.get('tokens')} token {cur}".strip()
+        if ev.event == 'upload' and ev.files is not None:
+            detail = f"{ev.files} dosya"
+        elif ev.event == 'token_spent' and ev.tokens is not None:
+            detail = f"-{ev.tokens} token"
+        elif ev.event == 'token_purchase' and ev.tokens is not None:
+            # para birimi tipli kolon değil; yalnız bu satırda meta'ya bakılır
+            try:
+                cur = json.loads(ev.meta or '{}').get('currency') or ''
+            except Exception:
+                cur = ''
+            detail = f"+{ev.tokens} token {cur}".strip()
         elif ev.event == 'daily_claim':
-            detail = f"Günlük ödül +{m.get('tokens', 1)}"
+            detail = f"Günlük ödül +{ev.tokens if ev.tokens is not None else 1}"
         elif ev.event == 'reward_claim':
-            detail = f"Ödül +{m.get('tokens', 0)}"
+            detail = f"Ödül +{ev.tokens or 0}"
 
         activities.append({
             'created': ev.created_at,
@@ -260,21 +215,26 @@ def analytics_page():
 @admin_bp.get('/api/metrics')
 @login_required
 def api_metrics():
+    """
+    Grafik serileri metrics_hourly kovalarından (UTC saat x event) okunur: sorgu maliyeti
+    aralıktaki kova sayısıyla orantılı, olay sayısından bağımsız. Yerel gün/saat dönüşümü
+    SQLite 'localtime' ile kova başına yapılır; aralık başı saate yuvarlanır.
+    """
     rng = (request.args.get('range') or '30d').lower().strip()
 
     if rng == '5y':
         now_local = datetime.now()
         start_year = now_local.year - 4
         years = [str(y) for y in range(start_year, now_local.year + 1)]
-        start_utc = datetime(year=start_year, month=1, day=1).strftime('%Y-%m-%d %H:%M:%S')
+        start_hour = hour_of(datetime(year=start_year, month=1, day=1))
 
         q = db.session.execute(text("""
-            SELECT strftime('%Y', datetime(created_at, 'localtime')) AS yyyy, event, COUNT(*) AS cnt
-            FROM audit_event
-            WHERE datetime(created_at) >= datetime(:start)
+            SELECT strftime('%Y', hour * 3600, 'unixepoch', 'localtime') AS yyyy, event, SUM(count) AS cnt
+            FROM metrics_hourly
+            WHERE hour >= :h AND event IN ('register','login','upload')
             GROUP BY yyyy, event
             ORDER BY yyyy
-        """), {'start': start_utc}).fetchall()
+        """), {'h': start_hour}).fetchall()
 
         series = {'register': {y:0 for y in years},
                   'login':    {y:0 for y in years},
@@ -296,38 +256,29 @@ def api_metrics():
         days = 30
     days = max(1, min(1825, days))
 
-    start_utc = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    start_utc = datetime.utcnow() - timedelta(days=days)
+    params = {'h': hour_of(start_utc)}
 
     q1 = db.session.execute(text("""
-        SELECT strftime('%Y-%m-%d', datetime(created_at, 'localtime')) AS day,
-               event, COUNT(*) AS cnt
-        FROM audit_event
-        WHERE datetime(created_at) >= datetime(:start)
+        SELECT strftime('%Y-%m-%d', hour * 3600, 'unixepoch', 'localtime') AS day,
+               event, SUM(count) AS cnt, SUM(files) AS files, SUM(tokens) AS tokens
+        FROM metrics_hourly
+        WHERE hour >= :h AND event IN ('register','login','upload','token_purchase')
         GROUP BY day, event
         ORDER BY day
-    """), {'start': start_utc}).fetchall()
+    """), params).fetchall()
 
     q2 = db.session.execute(text("""
-        SELECT CAST(strftime('%H', datetime(created_at, 'localtime')) AS INTEGER) AS hh,
-               event, COUNT(*) AS cnt
-        FROM audit_event
-        WHERE datetime(created_at) >= datetime(:start)
+        SELECT CAST(strftime('%H', hour * 3600, 'unixepoch', 'localtime') AS INTEGER) AS hh,
+               event, SUM(count) AS cnt
+        FROM metrics_hourly
+        WHERE hour >= :h AND event IN ('register','login','upload')
         GROUP BY hh, event
         ORDER BY hh
-    """), {'start': start_utc}).fetchall()
-
-    q_upload_meta = db.session.execute(text("""
-        SELECT strftime('%Y-%m-%d', datetime(created_at, 'localtime')) AS day, meta
-        FROM audit_event
-        WHERE event='upload' AND datetime(created_at) >= datetime(:start)
-    """), {'start': start_utc}).fetchall()
+    """), params).fetchall()
 
-    q_purchase = db.session.execute(text("""
-        SELECT strftime('%Y-%m-%d', datetime(created_at, 'localtime')) AS day,
-               user_id, meta
-        FROM audit_event
-        WHERE event='token_purchase' AND datetime(created_at) >= datetime(:start)
-    """), {'start': start_utc}).fetchall()
+    # Tekil alıcı sayısı kovalardan toplanamaz: saatlik HyperLogLog eskizleri güne göre birleştirilir
+    buyers = distinct_users('token_purchase', params['h'], hour_of(datetime.utcnow()) + 1, 'day')
 
     now_local = datetime.now()
     start_local = now_local - timedelta(days=days)
@@ -336,17 +287,17 @@ def api_metrics():
     series = {'register': {d:0 for d in days_list},
               'login':    {d:0 for d in days_list},
               'upload':   {d:0 for d in days_list}}
-    for day, ev, cnt in q1:
-        if ev in series and day in series[ev]:
-            series[ev][day] = int(cnt or 0)
-
     files_total = {d:0 for d in days_list}
-    for day, meta_txt in q_upload_meta:
-        try:
-            m = json.loads(meta_txt or '{}')
-            files_total[day] = files_total.get(day, 0) + int(m.get('files', 0))
-        except Exception:
-            pass
+    tokens_sold = {d:0 for d in days_list}
+    for day, ev, cnt, files, tokens in q1:
+        if day not in files_total:
+            continue
+        if ev in series:
+            series[ev][day] = int(cnt or 0)
+        if ev == 'upload':
+            files_total[day] = int(files or 0)
+        elif ev == 'token_purchase':
+            tokens_sold[day] = int(tokens or 0)
 
     hours = list(range(24))
     hourly = {'register':[0]*24, 'login':[0]*24, 'upload':[0]*24}
@@ -354,20 +305,10 @@ def api_metrics():
         if ev in hourly and 0 <= hh < 24:
             hourly[ev][hh] = int(cnt or 0)
 
-    buyers_sets = {d:set() for d in days_list}
-    tokens_sold = {d:0 for d in days_list}
-    for day, user_id, meta_txt in q_purchase:
-        if day not in tokens_sold:
-            continue
-        try:
-            m = json.loads(meta_txt or '{}')
-            tokens = int(m.get('tokens', 0))
-        except Exception:
-            tokens = 0
-        tokens_sold[day] += max(0, tokens)
-        if user_id is not None:
-            buyers_sets[day].add(int(user_id))
-    token_buyers = {d: len(buyers_sets[d]) for d in days_list}
+    token_buyers = {d:0 for d in days_list}
+    for day, sketch in buyers.items():
+        if day in token_buyers:
+            token_buyers[day] = round(sketch.count())
 
     return jsonify({
         'mode': 'days',
@@ -382,6 +323,134 @@ def api_metrics():
     })
 
 
+# Tekil kullanıcılar (saatlik HLL sketch'lerinin birleşimi)
+@admin_bp.get('/api/metrics/distinct')
+@login_required
+def api_metrics_distinct():
+    """
+    Tekil kullanıcı sayısı (HyperLogLog tahmini), keyfi aralık ve gruplama:
+      /admin/api/metrics/distinct?event=login&start=2025-01-01&end=2025-03-31&group=day|week|month|total
+    start/end yerel tarih (dahil; varsayılan son 30 gün). Her grup için estimate ve ~%95 aralığı
+    (±2 standart hata; p=12 => ±%3.25) döner; küçük sayılarda tahmin neredeyse kesindir.
+    """
+    ev = (request.args.get('event') or 'login').strip()
+    group = (request.args.get('group') or 'day').strip().lower()
+    if group not in DISTINCT_GROUPS:
+        return jsonify(ok=False, error=f"group: {', '.join(DISTINCT_GROUPS)}"), 400
+    try:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else today
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify(ok=False, error="Tarih biçimi YYYY-MM-DD olmalı"), 400
+    if start > end or (end - start).days > 3660:
+        return jsonify(ok=False, error="Geçersiz aralık"), 400
+
+    # yerel gün sınırları -> UTC kova numaraları (naif datetime.timestamp() yerel saat kabul eder)
+    h0 = int(start.timestamp()) // 3600
+    h1 = int((end + timedelta(days=1)).timestamp()) // 3600
+    sketches = distinct_users(ev, h0, h1, group)
+    keys = sorted({group_key(h, group) for h in range(h0, h1, 24)} | set(sketches))
+
+    std_error = HyperLogLog().std_error
+    buckets = []
+    for key in keys:
+        estimate = sketches[key].count() if key in sketches else 0.0
+        margin = 2 * std_error * estimate
+        buckets.append({'key': key, 'estimate': round(estimate),
+                        'low': max(0, math.floor(estimate - margin)), 'high': math.ceil(estimate + margin)})
+    return jsonify(ok=True, event=ev, group=group,
+                   start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'),
+                   std_error=std_error, buckets=buckets)
+
+# ---------------------------------------------------------------------------
+# Görsel işleme bellek bütçesi (izleme)
+@admin_bp.get('/api/imaging-budget')
+@login_required
+def api_imaging_budget():
+    from ..services.admission import get_memory_budget
+    return jsonify(get_memory_budget(current_app._get_current_object()).snapshot())
+
+
+# Adil zamanlayıcı: kullanıcı sınıfı (free / paid) bazında kuyruk derinliği ve bekleme süreleri
+@admin_bp.get('/api/imaging-scheduler')
+@login_required
+def api_imaging_scheduler():
+    from ..services.scheduler import get_scheduler
+    sched = get_scheduler(current_app._get_current_object())
+    return jsonify(sched.snapshot() if sched else {'enabled': False})
+
+
+# Yükleme hattı aşama süreleri (p50/p95/p99; aşama, ölçü etiketi ve scale bazında):
+# Prometheus metin biçimi, ?format=json ile JSON
+@admin_bp.get('/api/metrics/prometheus')
+@login_required
+def api_stage_metrics():
+    from ..services.timing import get_stage_metrics
+    metrics = get_stage_metrics(current_app._get_current_object())
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.snapshot())
+    return current_app.response_class(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+# ---------------------------------------------------------------------------
+# Çıktı kodlama profili (varsayılan): GET => mevcut + seçenekler, POST profile=<ad>
+@admin_bp.get('/api/encoding-profile')
+@login_required
+def api_encoding_profile():
+    from ..services.imaging import ENCODING_PROFILES, available_encodings
+    from ..services.jobs import default_encoding
+    return jsonify(
+        default=default_encoding(current_app._get_current_object()),
+        profiles={name: {'format': ENCODING_PROFILES[name].format, 'ext': ENCODING_PROFILES[name].ext,
+                         'options': ENCODING_PROFILES[name].options}
+                  for name in available_encodings()},
+    )
+
+@admin_bp.post('/api/encoding-profile')
+@login_required
+def api_encoding_profile_set():
+    from ..services.imaging import available_encodings
+    from ..services.jobs import ENCODING_SETTING
+    from ..services.settings import set_setting
+    data = request.get_json(silent=True) or request.form
+    name = (data.get('profile') or '').strip().lower()
+    if name not in available_encodings():
+        return jsonify(ok=False, error='Geçersiz profil', profiles=available_encodings()), 400
+    ok, msg = set_setting(ENCODING_SETTING, name, user_id=current_user.id)
+    if not ok:
+        current_app.logger.error(f"[ADMIN] {msg}")
+        return jsonify(ok=False, error=msg), 500
+    return jsonify(ok=True, default=name)
+
+
+# ---------------------------------------------------------------------------
+# Kalite kademesi zorlama (yük altında): GET => durum, POST force=fast|standard|best|'' (kaldır)
+@admin_bp.get('/api/quality-tier')
+@login_required
+def api_quality_tier():
+    from ..services.imaging import QUALITY_TIERS
+    from ..services.jobs import forced_quality, quality_for
+    app = current_app._get_current_object()
+    return jsonify(forced=forced_quality(app), effective_default=quality_for(app), tiers=list(QUALITY_TIERS))
+
+@admin_bp.post('/api/quality-tier')
+@login_required
+def api_quality_tier_set():
+    from ..services.imaging import QUALITY_TIERS
+    from ..services.jobs import QUALITY_FORCE_SETTING
+    from ..services.settings import set_setting
+    data = request.get_json(silent=True) or request.form
+    name = (data.get('force') or '').strip().lower()
+    if name and name not in QUALITY_TIERS:
+        return jsonify(ok=False, error='Geçersiz kademe', tiers=list(QUALITY_TIERS)), 400
+    ok, msg = set_setting(QUALITY_FORCE_SETTING, name or None, user_id=current_user.id)
+    if not ok:
+        current_app.logger.error(f"[ADMIN] {msg}")
+        return jsonify(ok=False, error=msg), 500
+    return jsonify(ok=True, forced=name or None)
+
+
 # ---------------------------------------------------------------------------
 # Yönetim aksiyonları: ban / unban / trust / untrust
 @admin_bp.post('/user/<int:user_id>/ban')
@@ -454,10 +523,11 @@ def api_seed():
         for _ in range(l):
             items.append(AuditEvent(event='login', created_at=base - timedelta(hours=random.randint(0,23))))
         for _ in range(u):
+            files = random.randint(1, 8)
             items.append(AuditEvent(event='upload', created_at=base - timedelta(hours=random.randint(0,23)),
-                                    meta=json.dumps({'files': random.randint(1, 8)})))
+                                    files=files, meta=json.dumps({'files': files})))
     try:
-        db.session.bulk_save_objects(items)
+        db.session.add_all(items)   # bulk_save_objects flush kancalarını (ledger/rollup) atlar
         db.session.commit()
         return jsonify(ok=True, inserted=len(items))
     except Exception as e:
@@ -480,10 +550,11 @@ def api_seed_years():
             day = random.randint(1, 28)
             hour = random.randint(0, 23)
             ev = 'register' if i < r else ('login' if i < r + l else 'upload')
-            items.append(AuditEvent(event=ev, created_at=datetime(y, month, day, hour, 0, 0),
-                                    meta=json.dumps({'files': random.randint(1, 6)}) if ev=='upload' else None))
+            files = random.randint(1, 6) if ev == 'upload' else None
+            items.append(AuditEvent(event=ev, created_at=datetime(y, month, day, hour, 0, 0), files=files,
+                                    meta=json.dumps({'files': files}) if ev=='upload' else None))
     try:
-        db.session.bulk_save_objects(items)
+        db.session.add_all(items)   # bulk_save_objects flush kancalarını (ledger/rollup) atlar
         db.session.commit()
         return jsonify(ok=True, inserted=len(items))
     except Exception as e:
@@ -511,7 +582,7 @@ def api_seed_purchases():
                 )
             )
     try:
-        db.session.bulk_save_objects(items)
+        db.session.add_all(items)   # bulk_save_objects flush kancalarını (ledger/rollup) atlar
         db.session.commit()
         return jsonify(ok=True, inserted=len(items))
     except Exception as e:
@@ -1,12 +1,12 @@
 # app/routes/profile.py
 from datetime import datetime
 import json
-from sqlalchemy import func
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 
 from .. import db
 from ..models import AuditEvent
+from ..services.ledger import get_ledger, tiers_of
 
 profile_bp = Blueprint("profile", __name__, url_prefix="/profile")
 
@@ -15,59 +15,23 @@ TIER_THRESHOLDS = {1: 300, 2: 750, 3: 2000}
 TIER_REWARDS    = {1:  50, 2: 150, 3:  400}
 
 
-def _sum_meta_tokens(query):
-    """AuditEvent.meta içinden {'tokens': N} alanlarını toplayan yardımcı."""
-    total = 0
-    for (meta_txt,) in query:
-        try:
-            total += int(json.loads(meta_txt or "{}").get("tokens", 0))
-        except Exception:
-            pass
-    return total
-
-
 @profile_bp.get("/")
 @login_required
 def profile_page():
     u = current_user
 
-    # ── Günlük ödül sayaçları ────────────────────────────────────────────────────
-    daily_count = (
-        db.session.query(func.count(AuditEvent.id))
-        .filter_by(user_id=u.id, event="daily_claim")
-        .scalar()
-    ) or 0
+    # ── Sayaçlar / toplamlar: user_ledger (şablona düz sayı veriyoruz) ────────────
+    ledger = get_ledger(u.id)
+    daily_count = ledger.daily_claims
     today_claimed = bool(
         getattr(u, "last_daily_claim", None)
         and u.last_daily_claim.date() == datetime.utcnow().date()
     )
-
-    # ── Satın alınan / harcanan token toplamlari (şablona düz sayı veriyoruz) ───
-    purchased_total = _sum_meta_tokens(
-        db.session.query(AuditEvent.meta)
-        .filter_by(user_id=u.id, event="token_purchase")
-        .all()
-    )
-
-    # Not: Harcama log’unuzun ismi farklıysa burada güncelleyin (örn: 'token_spent')
-    tokens_spent_total = _sum_meta_tokens(
-        db.session.query(AuditEvent.meta)
-        .filter_by(user_id=u.id, event="token_spent")
-        .all()
-    )
+    purchased_total = ledger.purchased
+    tokens_spent_total = ledger.spent
 
     # ── Seviye/ödül durumları ──────────────────────────────────────────────────
-    claimed_set = set()
-    for (meta_txt,) in (
-        db.session.query(AuditEvent.meta)
-        .filter_by(user_id=u.id, event="tier_claim")
-        .all()
-    ):
-        try:
-            t = int(json.loads(meta_txt or "{}").get("tier", 0))
-            claimed_set.add(t)
-        except Exception:
-            pass
+    claimed_set = tiers_of(ledger)
 
     eligible = {
         1: purchased_total >= TIER_THRESHOLDS[1],
@@ -128,17 +92,9 @@ def claim_tier(tier: int):
     if tier not in (1, 2, 3):
         abort(404)
 
-    # Toplam satın alınan token
-    purchased_total = 0
-    for (meta_txt,) in (
-        db.session.query(AuditEvent.meta)
-        .filter_by(user_id=current_user.id, event="token_purchase")
-        .all()
-    ):
-        try:
-            purchased_total += int(json.loads(meta_txt or "{}").get("tokens", 0))
-        except Exception:
-            pass
+    # Toplam satın alınan token ve alınmış seviyeler (user_ledger)
+    ledger = get_ledger(current_user.id)
+    purchased_total = ledger.purchased
 
     # Yeterli mi?
     if purchased_total < TIER_THRESHOLDS[tier]:
@@ -146,20 +102,7 @@ def claim_tier(tier: int):
         return redirect(url_for("profile.profile_page"))
 
     # Daha önce alınmış mı?
-    already = False
-    for (meta_txt,) in (
-        db.session.query(AuditEvent.meta)
-        .filter_by(user_id=current_user.id, event="tier_claim")
-        .all()
-    ):
-        try:
-            if int(json.loads(meta_txt or "{}").get("tier", 0)) == tier:
-                already = True
-                break
-        except Exception:
-            pass
-
-    if already:
+    if tier in tiers_of(ledger):
         flash("Bu ödülü daha önce aldınız.", "warning")
         return redirect(url_for("profile.profile_page"))
 
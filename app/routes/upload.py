@@ -1,36 +1,54 @@
 # app/routes/upload.py
 from datetime import datetime
 from pathlib import Path
-import os, io, zipfile, shutil, json
+import base64, io, shutil, json
 
-from flask import Blueprint, current_app, request, send_file, Response
+from flask import Blueprint, current_app, g, request, Response, jsonify, send_file, abort, url_for
 from flask_login import login_required, current_user
+from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 from PIL import Image
+from sqlalchemy import update
 
 from .. import db
-from ..models import AuditEvent
+from ..models import RenderJob, UploadSession, User
+from ..services.imaging import (
+    BOYUTLAR_8LI_PORTRAIT, LABELS_8LI, render_folder, iter_render_streams, resolve_encoding,
+    select_sizes, preview_format, preview_size, render_previews,
+)
+from ..services.packing import stream_zip
+from ..services.billing import charge_upload, upload_price
+from ..services.preflight import SourceInfo, preflight, quote
+from ..services.jobs import (
+    render_kwargs, job_dirs, new_job_id, submit_render_job, job_status, admit, estimate_job_bytes, quality_for,
+    preview_dir,
+)
+from ..services.packs import PackTee, pack_expires_at, send_pack
+from ..services.previews import preview_edge, preview_file, read_index
+from ..services.scheduler import user_pool
+from ..services.timing import StageTimer, publish, timed_zip
+from ..services.uploads import (
+    create_session, write_chunk, finalize_session, discard_session, claim_sessions, mark_used, remove_parts,
+    part_path,
+)
 
 upload_bp = Blueprint("upload", __name__)
 
-# 8 temel ölçü (px) — portre (dikey)
-PORTRAIT_SIZES = [
-    (360, 504),    # 5x7"
-    (576, 720),    # 8x10"
-    (648, 864),    # 9x12"
-    (792, 1008),   # 11x14"
-    (1152, 1440),  # 16x20"
-    (1296, 1728),  # 18x24"
-    (1728, 2592),  # 24x36"
-    (1188, 1685),  # ISO A2
-]
-LABELS_8 = ["5x7", "8x10", "9x12", "11x14", "16x20", "18x24", "24x36", "ISO A2"]
-
-try:
-    RESAMPLE = Image.Resampling.LANCZOS
-except Exception:
-    RESAMPLE = Image.LANCZOS
+
+@upload_bp.after_request
+def _server_timing(resp):
+    """İstekte ölçülen aşamalar Server-Timing başlığına (akış yanıtında: gövde öncesi aşamalar)."""
+    timer = g.get("stage_timer")
+    if timer and current_app.config.get("TIMING_ENABLED", True) and "Server-Timing" not in resp.headers:
+        value = timer.server_timing()
+        if value:
+            resp.headers["Server-Timing"] = value
+    return resp
+
+# 8 temel ölçü (px) — portre (dikey); tek kaynak services/imaging
+PORTRAIT_SIZES = BOYUTLAR_8LI_PORTRAIT
+LABELS_8 = LABELS_8LI
 
 
 def _allowed(filename: str) -> bool:
@@ -43,62 +61,180 @@ def _sizes_for_orientation(orientation: str):
     return PORTRAIT_SIZES
 
 
+def _render_kwargs():
+    return render_kwargs(current_app._get_current_object())
+
+
 def _process_folder(src_dir: Path, out_dir: Path, sizes, scale: int):
     """
     src_dir içindeki her görsel için out_dir/<basename>/ altında 8'li çıktı üretir.
+    (görsel, ölçü) çiftleri IMAGING_EXECUTOR / IMAGING_WORKERS havuzunda paralel işlenir.
     """
-    out_dir.mkdir(parents=True, exist_ok=True)
-    produced_files = 0
+    return render_folder(src_dir, sizes, out_dir, scale, **_render_kwargs())
 
-    for name in os.listdir(src_dir):
-        if not _allowed(name):
-            continue
-        p = src_dir / name
-        try:
-            with Image.open(p) as im:
-                if im.mode not in ("RGB", "L"):
-                    im = im.convert("RGB")
 
-                base = Path(name).stem
-                sub = out_dir / base
-                sub.mkdir(exist_ok=True)
+def _stream_pack(sources, sizes, scale: int, render_kwargs: dict, logger, lease=None, on_close=None, tee=None,
+                 settle=None):
+    """
+    Bellek içi yol: kaynaklar yüklenen akıştan decode edilir, çıktılar tampona encode
+    edilip doğrudan ZIP akışına verilir (instance/uploads kullanılmaz). tee (PackTee)
+    verilirse ZIP parçaları aynı anda diske yazılır; yanıt tamamlanınca paket
+    /upload/jobs/<id>/download'dan tekrar indirilebilir. render_kwargs["timer"]
+    (StageTimer) verilirse render/zip süreleri de ölçülür.
+    settle() -> (ok, mesaj) tüm çıktılar üretilip paket yerine konduktan sonra, son ZIP
+    parçası (merkezi dizin) gönderilmeden önce çağrılır (token düşümü): render hatasında
+    token düşülmez, düşülemezse istemci geçerli bir ZIP almaz.
+    İstemci koparsa tee varken render yalnız diske sürer, paket tamamlanınca settle edilir;
+    indirme aynı adresten tamamlanır.
+    Bitince kaynak akışlarını kapatır ve bellek payını bırakır; on_close (parçalı yükleme
+    dosyalarının silinmesi, süre yayını) akışlar kapandıktan sonra çağrılır.
+    """
+    produced = 0
+
+    def _counted(entries):
+        nonlocal produced
+        for entry in entries:
+            produced += 1
+            yield entry
+
+    entries = _counted(iter_render_streams(sources, sizes, scale, **render_kwargs))
+    timer = render_kwargs.get("timer")
+    chunks = timed_zip(stream_zip, entries, timer) if timer else stream_zip(entries)
+    settled = False
+
+    def _complete():
+        nonlocal settled
+        if not produced:
+            raise RuntimeError("Hiçbir görsel işlenemedi")
+        if tee:
+            tee.finalize()
+        ok, msg = settle() if settle else (True, "")
+        if not ok:
+            raise RuntimeError(f"Token düşülemedi: {msg}")
+        settled = True
 
-                for idx, (w, h) in enumerate(sizes):
-                    out_w, out_h = int(w * scale), int(h * scale)
-                    out_im = im.resize((out_w, out_h), RESAMPLE)
-                    label = LABELS_8[idx] if idx < len(LABELS_8) else f"size{idx+1}"
-                    dst = sub / f"{label} {base}.jpg"
-                    out_im.save(dst, "JPEG", quality=100, dpi=(300, 300))
-                    produced_files += 1
-        except Exception as e:
-            current_app.logger.error(f"[UPLOAD] {name} işlenemedi: {e}")
+    try:
+        # Her parça bir adım geride gönderilir: son parça ancak settle'dan sonra çıkar
+        held = None
+        for chunk in chunks:
+            if tee:
+                tee.write(chunk)
+            if held is not None:
+                yield held
+            held = chunk
+        _complete()
+        yield held
+    except GeneratorExit:
+        # Sunucu close() çağırdı (istemci koptu): kalan parçalar yalnız pakete yazılır
+        if tee and not settled:
+            try:
+                for chunk in chunks:
+                    tee.write(chunk)
+                _complete()
+            except Exception:
+                logger.exception("[UPLOAD] İstemci koptuktan sonra paketleme hatası")
+        raise
+    except Exception:
+        logger.exception("[UPLOAD] İşleme/paketleme hatası")
+        raise
+    finally:
+        if tee and not settled:
+            tee.abort()
+        if lease:
+            lease.release()
+        for _, stream in sources:
+            stream.close()
+        if on_close:
+            on_close()
 
-    return produced_files
+
+def _plan_params(data, size_selection):
+    """
+    Form/JSON parametrelerinden render planı: (orientation, scale, sizes, labels, opts).
+    Geçersiz ölçü seçiminde ValueError.
+    """
+    orientation = (data.get("orientation") or "portrait").lower().strip()
+    try:
+        scale = max(1, min(int(data.get("scale", 5)), 5))
+    except Exception:
+        scale = 5
+    opts = _render_kwargs()
+    opts["encoding"] = resolve_encoding(data.get("encoding"), opts["encoding"])
+    opts["quality"] = quality_for(current_app, data.get("quality"))
+    sizes, labels = select_sizes(orientation, size_selection)
+    opts["labels"] = labels
+    return orientation, scale, sizes, labels, opts
+
+
+def _max_pixels() -> int:
+    return int(current_app.config.get("IMAGING_MAX_PIXELS", 100_000_000))
+
+
+def _wants_async() -> bool:
+    if (request.form.get("async") or "").strip().lower() in ("1", "true", "yes"):
+        return True
+    return "respond-async" in (request.headers.get("Prefer") or "").lower()
 
 
 @upload_bp.post("/upload")
 @login_required
 def upload():
     """
-    - Seçilen dosya sayısı kadar token gerekir (1 dosya = 1 token).
+    - sizes (form, opsiyonel, çoklu ya da virgüllü): yalnız bu ölçüler üretilir; LABELS_8
+      etiketleri ve "<en>x<boy>" inç özel ölçüler. Boşsa 8'li tablonun tamamı.
+    - Token: tam 8'li paket dosya başına 1 token; alt küme/özel ölçülerde seçilen alanla
+      orantılı (billing.upload_price), en az 1.
     - Yetersiz token -> 402 ve X-Required-Tokens / X-Tokens-Remaining header’ları.
     - Başarılı işlem:
-        * user.tokens -= file_count
-        * audit_event: upload (meta.files = file_count)
-        * audit_event: token_spent (meta.tokens = file_count, reason='upload')
-        * ZIP döner, X-Tokens-Remaining header’ı set edilir.
+        * user.tokens -= fiyat
+        * audit_event: upload (meta.files = file_count, alt kümede meta.sizes)
+        * audit_event: token_spent (meta.tokens = fiyat, reason='upload')
+        * ZIP akış olarak döner (çıktılar üretildikçe, geçici dosyasız), X-Tokens-Remaining header’ı set edilir.
+    Yanıt başlıkları render başlamadan gittiği için token düşme/log yazma render'dan önce yapılır.
+    - async=1 (form) ya da "Prefer: respond-async" => 202 + job id; render arka planda,
+      token düşme/log iş başarıyla bitince yazılır (bkz. /upload/jobs/<id>).
+    - encoding (form, opsiyonel): çıktı kodlama profili (print-max | print-standard | web |
+      web-webp); geçersiz/boşsa admin'in seçtiği varsayılan kullanılır.
+    - quality (form, opsiyonel): fast | standard | best; admin bir kademe zorladıysa o kullanılır.
+    - upload_ids (form, opsiyonel, çoklu): /upload/chunked ile tamamlanmış yüklemeler; dosyaları
+      diskten akışla okunur (files ile birlikte de verilebilir). Başarılı işlemde oturumlar
+      tüketilir, .part dosyaları render bitince silinir.
     """
-    files = request.files.getlist("files")
+    # Aşama süreleri: Server-Timing (after_request) + iş sonunda [TIMING] log ve metrikler
+    timer = g.stage_timer = StageTimer()
+    with timer.stage("parse"):
+        files = request.files.getlist("files")
+        upload_ids = [i.strip() for v in request.form.getlist("upload_ids") for i in v.split(",") if i.strip()]
+    try:
+        chunked = claim_sessions(current_user.id, upload_ids)
+    except ValueError as e:
+        return Response(str(e), status=404)
+    # Tamamlanmış parçalı yüklemeler, diskteki dosyaya açılmış FileStorage olarak aynı yoldan geçer.
+    # Her dönüş yolunda burada kapanırlar: senkron yolda akış _stream_pack'e devredilip yerine
+    # BytesIO konduğu için kapanan yalnız o olur.
+    chunk_files = []
+    try:
+        for s in chunked:
+            chunk_files.append(FileStorage(stream=open(part_path(current_app, s.id), "rb"),
+                                           filename=s.filename, name="files"))
+        return _accept_upload(timer, files + chunk_files, chunked)
+    finally:
+        for f in chunk_files:
+            f.close()
+
+
+def _accept_upload(timer: StageTimer, files, chunked):
+    """upload() gövdesi: doğrulama, token kontrolü, async iş kaydı ya da senkron akış yanıtı."""
     if not files:
         return Response("Dosya bulunamadı", status=400)
 
     # Form parametreleri
-    orientation = (request.form.get("orientation") or "portrait").lower().strip()
-    scale = request.form.get("scale", "5")
     try:
-        scale = max(1, min(int(scale), 5))
-    except Exception:
-        scale = 5
+        orientation, scale, sizes, labels, opts = _plan_params(request.form, request.form.getlist("sizes"))
+    except ValueError as e:
+        return Response(str(e), status=400)
+    custom_plan = labels != LABELS_8
+    timer.labels, timer.scale = labels, scale
 
     # Yüklenebilir dosyaları süz
     accepted = []
@@ -116,8 +252,15 @@ def upload():
     if file_count == 0:
         return Response("Yalnızca PNG/JPG kabul edilir", status=400)
 
+    # Pre-flight: yalnız başlıklar okunur; sınırı aşan / bozuk / sahte uzantılı dosya varsa
+    # istek piksel ayrılmadan (diske yazmadan, decode etmeden) reddedilir
+    with timer.stage("preflight"):
+        _, rejected = preflight([(name, f.stream) for f, name in accepted], _max_pixels())
+    if rejected:
+        return jsonify(ok=False, error="Bazı dosyalar işlenemez", rejected=rejected), 422
+
     # Gerekli token kontrolü
-    need = file_count  # 1 dosya = 1 token
+    need = upload_price(file_count, sizes)
     have = int(current_user.tokens or 0)
     if have < need:
         resp = Response("Yetersiz token", status=402)
@@ -125,90 +268,481 @@ def upload():
         resp.headers["X-Tokens-Remaining"] = str(have)
         return resp
 
-    # Çalışma klasörleri (instance/uploads & instance/outputs)
-    inst = Path(current_app.instance_path)
-    uploads_dir = inst / current_app.config.get("UPLOADS_DIRNAME", "uploads")
-    outputs_dir = inst / current_app.config.get("OUTPUTS_DIRNAME", "outputs")
-    uploads_dir.mkdir(parents=True, exist_ok=True)
-    outputs_dir.mkdir(parents=True, exist_ok=True)
-
-    job_id = datetime.utcnow().strftime("%Y%m%d-%H%M%S-%f")
-    job_in = uploads_dir / job_id
-    job_out = outputs_dir / job_id
-    job_in.mkdir(parents=True, exist_ok=True)
-    job_out.mkdir(parents=True, exist_ok=True)
+    # Dosya adı
+    if file_count == 1 and original_names:
+        base = Path(original_names[0]).stem
+        filename = f"{base}.zip"
+    else:
+        filename = "pack.zip"
 
-    # Orijinalleri kaydet
+    # Asenkron mod: orijinalleri kaydet, işi kaydet, job id ile hemen dön; token iş bitince düşülür
+    if _wants_async():
+        job_id = new_job_id()
+        job_in, _, _ = job_dirs(current_app, job_id)
+        job_in.mkdir(parents=True, exist_ok=True)
+        with timer.stage("save"):
+            for f, name in accepted:
+                f.save(job_in / name)
+        if chunked:
+            for f in files:
+                f.close()       # remove_parts'tan önce (Windows açık dosyayı silemez)
+            mark_used(chunked, commit=False)
+
+        job = RenderJob(
+            id=job_id,
+            user_id=current_user.id,
+            orientation="landscape" if orientation == "landscape" else "portrait",
+            scale=scale,
+            files=file_count,
+            tokens=need,
+            sizes=json.dumps([[l, w, h] for l, (w, h) in zip(labels, sizes)]) if custom_plan else None,
+            progress=json.dumps({Path(n).stem: 0 for n in original_names}),
+            result_name=filename,
+            encoding=opts["encoding"],
+            quality=opts["quality"],
+        )
+        try:
+            with timer.stage("commit"):
+                db.session.add(job)
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            shutil.rmtree(job_in, ignore_errors=True)
+            current_app.logger.exception("[UPLOAD] İş kaydı hatası")
+            return Response("Kayıt hatası", status=500)
+        remove_parts(current_app, [s.id for s in chunked])
+        publish(current_app, timer, "accept", job_id, files=file_count)
+        submit_render_job(current_app._get_current_object(), job_id)
+        return jsonify(
+            ok=True,
+            job_id=job_id,
+            status_url=url_for("upload.job_status_view", job_id=job_id),
+            download_url=url_for("upload.job_download", job_id=job_id),
+        ), 202
+
+    # Senkron mod: diske yazmadan yüklenen akışlardan çalış. Akışların sahipliği
+    # _stream_pack'e geçer (request.close() yanıt akarken onları kapatmasın).
+    sources = []
     for f, name in accepted:
-        (job_in / name).write_bytes(f.read())
+        sources.append((name, f.stream))
+        f.stream = io.BytesIO()
+
+    # Bellek kabulü: tepe piksel maliyeti başlıklardan, decode'dan önce
+    with timer.stage("admit"):
+        lease = admit(current_app, estimate_job_bytes(
+            current_app, [stream for _, stream in sources], sizes, scale, sequential=True))
+    if lease is None:
+        for _, stream in sources:
+            stream.close()
+        resp = Response("Sunucu yoğun, lütfen biraz sonra tekrar deneyin", status=503)
+        resp.headers["Retry-After"] = str(int(current_app.config.get("IMAGING_RETRY_AFTER", 15)))
+        return resp
+
+    app, sids, uid = current_app._get_current_object(), [s.id for s in chunked], current_user.id
+    if chunked:
+        mark_used(chunked)
+
+    # Paket saklama: yanıtla aynı baytlar diske de yazılır; yarıda kopan indirme yeniden
+    # render/token olmadan /upload/jobs/<id>/download'dan (Range ile) tamamlanabilir
+    tee = None
+    job_id = None
+    if current_app.config.get("PACK_RETAIN_SYNC", True):
+        job_id = new_job_id()
+        try:
+            db.session.add(RenderJob(
+                id=job_id,
+                user_id=current_user.id,
+                status="streaming",
+                orientation="landscape" if orientation == "landscape" else "portrait",
+                scale=scale,
+                files=file_count,
+                tokens=need,
+                sizes=json.dumps([[l, w, h] for l, (w, h) in zip(labels, sizes)]) if custom_plan else None,
+                result_name=filename,
+                encoding=opts["encoding"],
+                quality=opts["quality"],
+                started_at=datetime.utcnow(),
+            ))
+            db.session.commit()
+            _, _, zip_path = job_dirs(current_app, job_id)
+            tee = PackTee(current_app._get_current_object(), job_id, zip_path)
+        except Exception:
+            db.session.rollback()
+            job_id = None
+            current_app.logger.exception("[UPLOAD] Paket saklama başlatılamadı (yalnız akış)")
+
+    # Yanıt (akış)
+    render_opts = dict(opts,
+                       spill_bytes=int(current_app.config.get("IMAGING_SPILL_BYTES", 16 * 1024 * 1024)),
+                       spill_dir=Path(current_app.instance_path) / current_app.config.get("OUTPUTS_DIRNAME", "outputs"),
+                       pool=user_pool(current_app._get_current_object(), current_user.id),
+                       timer=timer)
+
+    def settle():
+        # Paket tamamlandı: token düş + audit log + (saklanıyorsa) iş done — tek transaction
+        with app.app_context(), timer.stage("commit"):
+            try:
+                ok, msg = charge_upload(db.session.get(User, uid), need, files=file_count, orientation=orientation,
+                                        scale=scale, sizes=labels if custom_plan else None, commit=False)
+                if ok and job_id:
+                    db.session.execute(
+                        update(RenderJob).where(RenderJob.id == job_id)
+                        .values(status="done", finished_at=datetime.utcnow())
+                        .execution_options(synchronize_session=False)
+                    )
+                if ok:
+                    db.session.commit()
+                else:
+                    db.session.rollback()
+                return ok, msg
+            except Exception as e:
+                db.session.rollback()
+                return False, f"DB hatası: {e}"
+            finally:
+                db.session.remove()
+
+    def on_close():
+        if sids:
+            remove_parts(app, sids)
+        publish(app, timer, "sync", job_id, files=file_count)
+
+    resp = Response(
+        _stream_pack(sources, sizes, scale, render_opts, current_app.logger, lease, on_close, tee, settle),
+        mimetype="application/zip",
+        direct_passthrough=True,
+    )
+    resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    # token paket tamamlanınca düşülür: başlık tamamlanma sonrası bakiyeyi bildirir
+    resp.headers["X-Tokens-Remaining"] = str(int(current_user.tokens or 0) - need)
+    if job_id:
+        resp.headers["X-Job-Id"] = job_id
+        resp.headers["X-Download-URL"] = url_for("upload.job_download", job_id=job_id)
+    return resp
+
+
+@upload_bp.post("/upload/quote")
+@login_required
+def upload_quote():
+    """
+    İşlemeden fiyat/maliyet teklifi. İki biçim:
+    - multipart: files (+ /upload ile aynı form alanları); yalnız başlıklar okunur, istemci
+      dosyaların yalnızca ilk birkaç KB'ını da gönderebilir.
+    - JSON: {"images": [{"width", "height", "mode"}], "orientation", "scale", "sizes", ...}
+      (zamanlayıcı gibi dosyası elinde olmayan çağıranlar için).
+    Dönen: tokens, tokens_remaining, affordable, output_bytes, render_seconds, peak_bytes,
+    images (kabul edilenler), rejected (sınırı aşan / okunamayanlar).
+    """
+    data = request.get_json(silent=True)
+    if data is not None and not isinstance(data, dict):
+        return jsonify(ok=False, error="JSON gövdesi nesne olmalı"), 400
+    if data is not None and not isinstance(data.get("images") or [], list):
+        return jsonify(ok=False, error="images liste olmalı"), 400
+    try:
+        if data is not None:
+            orientation, scale, sizes, labels, opts = _plan_params(data, data.get("sizes"))
+        else:
+            orientation, scale, sizes, labels, opts = _plan_params(request.form, request.form.getlist("sizes"))
+    except ValueError as e:
+        return jsonify(ok=False, error=str(e)), 400
+
+    max_pixels = _max_pixels()
+    if data is not None:
+        infos, rejected = [], []
+        for i, img in enumerate(data.get("images") or []):
+            try:
+                info = SourceInfo(str(img.get("name") or f"image{i + 1}"), int(img["width"]), int(img["height"]),
+                                  str(img.get("mode") or "RGB"), "")
+            except Exception:
+                rejected.append({"name": f"image{i + 1}", "error": "width/height gerekli"})
+                continue
+            if info.width <= 0 or info.height <= 0 or info.width * info.height > max_pixels:
+                rejected.append({"name": info.name, "error": f"{info.width}x{info.height} geçersiz ya da sınırı aşıyor"})
+                continue
+            infos.append(info)
+    else:
+        sources = [(secure_filename(f.filename or "") or "file", f.stream) for f in request.files.getlist("files") if f]
+        infos, rejected = preflight(sources, max_pixels, verify=False)
+
+    body = quote(current_app, infos, sizes, scale, encoding=opts["encoding"], quality=opts["quality"])
+    have = int(current_user.tokens or 0)
+    body.update(
+        ok=True,
+        orientation="landscape" if orientation == "landscape" else "portrait",
+        scale=scale,
+        sizes=labels,
+        encoding=opts["encoding"],
+        quality=opts["quality"],
+        tokens_remaining=have,
+        affordable=have >= body["tokens"],
+        images=[i._asdict() for i in infos],
+        rejected=rejected,
+    )
+    return jsonify(body)
 
-    # İşle
+
+@upload_bp.post("/upload/preview")
+@login_required
+def upload_preview():
+    """
+    Token düşmeden, paket üretmeden önizleme: files ve/veya upload_ids (+ /upload ile aynı
+    orientation/sizes alanları). Her görsel draft decode edilir, seçilen her ölçü için uzun
+    kenarı PREVIEW_EDGE px olan WebP/JPEG data URI döner. En fazla PREVIEW_MAX_FILES görsel;
+    parçalı yüklemeler tüketilmez (aynı upload_ids ile /upload'a devam edilir).
+    """
+    upload_ids = [i.strip() for v in request.form.getlist("upload_ids") for i in v.split(",") if i.strip()]
     try:
-        sizes = _sizes_for_orientation(orientation)
-        _ = _process_folder(job_in, job_out, sizes, scale=scale)
-    except Exception as e:
-        shutil.rmtree(job_in, ignore_errors=True)
-        shutil.rmtree(job_out, ignore_errors=True)
-        current_app.logger.exception("[UPLOAD] İşleme hatası")
-        return Response("İşleme hatası", status=500)
-
-    # ZIP’e paketle
-    zip_bytes = io.BytesIO()
-    with zipfile.ZipFile(zip_bytes, "w", zipfile.ZIP_DEFLATED) as zf:
-        for p in job_out.rglob("*"):
-            if p.is_file():
-                zf.write(p, arcname=str(p.relative_to(job_out)))
-    zip_bytes.seek(0)
-
-    # Token düş + audit log
-    now = datetime.utcnow()
+        orientation, _, sizes, labels, _ = _plan_params(request.form, request.form.getlist("sizes"))
+        chunked = claim_sessions(current_user.id, upload_ids)
+    except ValueError as e:
+        return jsonify(ok=False, error=str(e)), 400
+    sources = [(secure_filename(f.filename or "") or "file", f.stream) for f in request.files.getlist("files") if f]
+    sources = [(name, fp) for name, fp in sources if _allowed(name)]
+    opened = [(secure_filename(s.filename) or s.id, open(part_path(current_app, s.id), "rb")) for s in chunked]
+    sources += opened
     try:
-        # Kullanıcı tokenlarını düş
-        current_user.tokens = have - need
+        if not sources:
+            return jsonify(ok=False, error="Yalnızca PNG/JPG kabul edilir"), 400
+        limit = int(current_app.config.get("PREVIEW_MAX_FILES", 20))
+        if len(sources) > limit:
+            return jsonify(ok=False, error=f"En fazla {limit} görsel önizlenebilir"), 400
+
+        infos, rejected = preflight(sources, _max_pixels(), verify=False)
+        ok_names = {i.name for i in infos}
+        edge = preview_edge(current_app)
+        fmt, _ = preview_format()
+        mime = Image.MIME.get(fmt, "image/jpeg")
+        psizes = [preview_size(size, edge) for size in sizes]
+        streams = [fp for name, fp in sources if name in ok_names]
+        lease = admit(current_app, estimate_job_bytes(current_app, streams, psizes, 1, sequential=True))
+        if lease is None:
+            resp = jsonify(ok=False, error="Sunucu yoğun, lütfen biraz sonra tekrar deneyin")
+            resp.status_code = 503
+            resp.headers["Retry-After"] = str(int(current_app.config.get("IMAGING_RETRY_AFTER", 15)))
+            return resp
+        images = []
+        try:
+            for name, fp in sources:
+                if name not in ok_names:
+                    continue
+                try:
+                    blobs = render_previews(fp, sizes, edge, fmt)
+                except Exception as e:
+                    rejected.append({"name": name, "error": f"{name}: önizlenemedi ({e})"})
+                    continue
+                images.append({
+                    "name": name,
+                    "previews": [f"data:{mime};base64,{base64.b64encode(b).decode('ascii')}" for b in blobs],
+                })
+        finally:
+            lease.release()
+    finally:
+        for _, fp in opened:
+            fp.close()
+
+    return jsonify(
+        ok=True,
+        orientation="landscape" if orientation == "landscape" else "portrait",
+        edge=edge,
+        format=mime,
+        sizes=[{"label": label, "width": w, "height": h} for label, (w, h) in zip(labels, psizes)],
+        images=images,
+        rejected=rejected,
+    )
 
-        # upload eventi (grafikler için dosya sayısı önemli)
-        db.session.add(
-            AuditEvent(
-                user_id=current_user.id,
-                event="upload",
-                created_at=now,
-                meta=json.dumps({"files": file_count, "orientation": orientation, "scale": scale}),
-            )
-        )
 
-        # token_spent eventi (admin “Harcanan” sütunu için)
-        db.session.add(
-            AuditEvent(
-                user_id=current_user.id,
-                event="token_spent",
-                created_at=now,
-                meta=json.dumps({"tokens": need, "reason": "upload", "files": file_count}),
-            )
-        )
+def _own_session(upload_id: str) -> UploadSession:
+    s = db.session.get(UploadSession, upload_id)
+    if not s or s.user_id != current_user.id:
+        abort(404)
+    return s
+
 
-        db.session.commit()
-    except Exception as e:
+def _session_body(s: UploadSession) -> dict:
+    return {
+        "ok": True,
+        "upload_id": s.id,
+        "filename": s.filename,
+        "size": s.size,
+        "offset": s.received,
+        "status": s.status,
+        "sha256": s.digest,
+        "upload_url": url_for("upload.chunked_put", upload_id=s.id),
+    }
+
+
+@upload_bp.post("/upload/chunked")
+@login_required
+def chunked_init():
+    """
+    Parçalı yükleme başlatır. JSON: {"filename", "size" (bayt), "sha256" (opsiyonel)}.
+    201 + upload_id, upload_url, offset=0. Dosya MAX_CONTENT_LENGTH ile sınırlı değildir;
+    üst sınır UPLOAD_CHUNKED_MAX_BYTES.
+    """
+    data = request.get_json(silent=True) or {}
+    name = secure_filename(str(data.get("filename") or ""))
+    if not name or not _allowed(name):
+        return jsonify(ok=False, error="Yalnızca PNG/JPG kabul edilir"), 400
+    try:
+        size = int(data.get("size"))
+    except Exception:
+        return jsonify(ok=False, error="size gerekli"), 400
+    max_bytes = int(current_app.config.get("UPLOAD_CHUNKED_MAX_BYTES", 1024 ** 3))
+    if size <= 0 or size > max_bytes:
+        return jsonify(ok=False, error=f"size 1..{max_bytes} bayt olmalı"), 400
+    sha256 = str(data.get("sha256") or "").strip().lower() or None
+    if sha256 and (len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256)):
+        return jsonify(ok=False, error="sha256 geçersiz"), 400
+    try:
+        s = create_session(current_app._get_current_object(), current_user.id, name, size, sha256)
+    except Exception:
         db.session.rollback()
-        current_app.logger.exception("[UPLOAD] Token düşme/log yazma hatası")
-        return Response("Kayıt hatası", status=500)
-    finally:
-        # Geçici klasörleri sil (istersen saklayabilirsin)
-        shutil.rmtree(job_in, ignore_errors=True)
-        shutil.rmtree(job_out, ignore_errors=True)
+        current_app.logger.exception("[UPLOAD] Parçalı yükleme başlatılamadı")
+        return jsonify(ok=False, error="Kayıt hatası"), 500
+    return jsonify(_session_body(s)), 201
 
-    # Dosya adı
-    if file_count == 1 and original_names:
-        base = Path(original_names[0]).stem
-        filename = f"{base}.zip"
-    else:
-        filename = "pack.zip"
 
-    # Yanıt
-    resp = send_file(
-        zip_bytes,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/zip",
+@upload_bp.get("/upload/chunked/<upload_id>")
+@login_required
+def chunked_status(upload_id: str):
+    """Kaldığı yerden devam için mevcut offset (= diske yazılmış bayt)."""
+    return jsonify(_session_body(_own_session(upload_id)))
+
+
+@upload_bp.put("/upload/chunked/<upload_id>")
+@login_required
+def chunked_put(upload_id: str):
+    """
+    Ham gövde = dosyanın offset'ten başlayan parçası. offset ?offset= ya da
+    "Content-Range: bytes <başlangıç>-<bitiş>/<toplam>" ile verilir. Gövde diske akışla yazılır.
+    offset mevcut konumla uyuşmazsa 409 + güncel offset (istemci oradan devam eder).
+    """
+    s = _own_session(upload_id)
+    offset = request.args.get("offset", type=int)
+    cr = request.headers.get("Content-Range") or ""
+    if offset is None and cr.startswith("bytes "):
+        try:
+            offset = int(cr[6:].split("-", 1)[0])
+        except ValueError:
+            offset = None
+    if offset is None:
+        return jsonify(ok=False, error="offset gerekli", offset=s.received), 400
+
+    ok, msg = write_chunk(current_app._get_current_object(), s, offset, request.stream, request.content_length)
+    if not ok:
+        status = 409 if msg in ("offset uyuşmuyor", "Oturum kapalı") else 400
+        if msg.startswith("Yazma hatası"):
+            current_app.logger.error(f"[UPLOAD] {s.id}: {msg}")
+            status = 500
+        return jsonify(ok=False, error=msg, offset=s.received), status
+    return jsonify(_session_body(s))
+
+
+@upload_bp.post("/upload/chunked/<upload_id>/finalize")
+@login_required
+def chunked_finalize(upload_id: str):
+    """
+    Boyut + SHA-256 kontrolü ve pre-flight (başlık). Başarılıysa upload_id /upload'a
+    upload_ids olarak verilebilir. Reddedilen görselin oturumu silinir (422).
+    """
+    s = _own_session(upload_id)
+    app = current_app._get_current_object()
+    ok, msg = finalize_session(app, s)
+    if not ok:
+        return jsonify(ok=False, error=msg, offset=s.received), 409
+    with open(part_path(app, s.id), "rb") as fp:
+        _, rejected = preflight([(s.filename, fp)], _max_pixels())
+    if rejected:
+        discard_session(app, s)
+        return jsonify(ok=False, error="Dosya işlenemez", rejected=rejected), 422
+    return jsonify(_session_body(s))
+
+
+@upload_bp.delete("/upload/chunked/<upload_id>")
+@login_required
+def chunked_abort(upload_id: str):
+    s = _own_session(upload_id)
+    if s.status == "used":
+        return jsonify(ok=False, error="Yükleme kullanıldı"), 409
+    discard_session(current_app._get_current_object(), s)
+    return jsonify(ok=True)
+
+
+def _own_job(job_id: str) -> RenderJob:
+    job = db.session.get(RenderJob, job_id)
+    if not job or job.user_id != current_user.id:
+        abort(404)
+    return job
+
+
+@upload_bp.get("/upload/jobs/<job_id>")
+@login_required
+def job_status_view(job_id: str):
+    """İş durumu + görsel bazında ilerleme; bitince indirme adresi ve kalan token."""
+    job = _own_job(job_id)
+    body = job_status(job)
+    if job.status == "done":
+        expires = pack_expires_at(current_app, job)
+        body["download_url"] = url_for("upload.job_download", job_id=job.id)
+        body["expires_at"] = expires.isoformat() if expires else None
+        body["tokens_remaining"] = int(current_user.tokens or 0)
+    if job.status in ("queued", "running", "done"):
+        body["previews_url"] = url_for("upload.job_previews", job_id=job.id)
+    return jsonify(body)
+
+
+@upload_bp.get("/upload/jobs/<job_id>/previews")
+@login_required
+def job_previews(job_id: str):
+    """
+    İşin önizlemeleri (render sürerken de): ölçüler + görsel başına önizleme adresleri.
+    ready=False => henüz yazılmadı; görseller hazır oldukça listeye eklenir.
+    """
+    job = _own_job(job_id)
+    meta = read_index(preview_dir(current_app, job.id)) if job.status != "expired" else None
+    if not meta:
+        return jsonify(ok=True, ready=False, status=job.status, sizes=[], images=[])
+    return jsonify(
+        ok=True,
+        ready=True,
+        status=job.status,
+        edge=meta["edge"],
+        sizes=meta["sizes"],
+        images=[{"name": name,
+                 "previews": [url_for("upload.job_preview_file", job_id=job.id, image=name, index=i)
+                              for i in range(len(meta["sizes"]))]}
+                for name in meta["images"]],
     )
+
+
+@upload_bp.get("/upload/jobs/<job_id>/previews/<image>/<int:index>")
+@login_required
+def job_preview_file(job_id: str, image: str, index: int):
+    job = _own_job(job_id)
+    path = preview_file(preview_dir(current_app, job.id), image, index)
+    if path is None:
+        abort(404)
+    resp = send_file(path, max_age=3600, conditional=True)
+    resp.headers["Cache-Control"] = "private, max-age=3600"
+    return resp
+
+
+@upload_bp.get("/upload/jobs/<job_id>/download")
+@login_required
+def job_download(job_id: str):
+    """
+    Tamamlanmış paket (async iş ya da senkron yanıtın saklanan kopyası); PACK_TTL_HOURS
+    boyunca tekrar indirilebilir. ETag/If-None-Match ve Range (kaldığı yerden indirme)
+    desteklenir; PACK_SENDFILE ayarlıysa baytları önündeki web sunucusu gönderir.
+    """
+    job = _own_job(job_id)
+    if job.status == "expired":
+        return Response("Paketin saklama süresi doldu", status=410)
+    if job.status != "done":
+        return Response("İş henüz tamamlanmadı", status=409)
+    _, _, zip_path = job_dirs(current_app, job.id)
+    expires = pack_expires_at(current_app, job)
+    if not zip_path.is_file() or (expires and expires < datetime.utcnow()):
+        return Response("Paket bulunamadı", status=410)
+    resp = send_pack(current_app, job, zip_path)
     resp.headers["X-Tokens-Remaining"] = str(int(current_user.tokens or 0))
     return resp
@@ -0,0 +1,94 @@
+# app/services/admission.py
+import threading, time
+from collections import deque
+
+
+class Lease:
+    """MemoryBudget'tan alınan pay; release() birden çok kez çağrılabilir."""
+
+    def __init__(self, budget: "MemoryBudget", granted: int):
+        self.budget = budget
+        self.granted = granted
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.budget._release(self.granted)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class MemoryBudget:
+    """
+    Görsel işleme için süreç geneli bellek bütçesi (decode edilmiş piksel baytı).
+    - acquire(): bütçe yetmezse sırada bekler (FIFO; büyük istekler aç kalmaz).
+    - queue_limit doluysa ya da timeout dolarsa None döner => çağıran 503 verir.
+    - Tek başına bütçeyi aşan istek, bütçenin tamamını alarak yalnız çalışır.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+
+    def acquire(self, cost: int, timeout: float | None = None, queue_limit: int | None = None) -> Lease | None:
+        granted = max(1, min(int(cost), self.capacity))
+        with self._cond:
+            if not self._queue and self.in_use + granted <= self.capacity:
+                return self._grant(granted)
+            if queue_limit is not None and len(self._queue) >= queue_limit:
+                self.rejected += 1
+                return None
+
+            ticket = object()
+            self._queue.append(ticket)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            try:
+                while not (self._queue[0] is ticket and self.in_use + granted <= self.capacity):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.rejected += 1
+                        return None
+                    self._cond.wait(remaining)
+                return self._grant(granted)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def _grant(self, granted: int) -> Lease:
+        self.in_use += granted
+        self.admitted += 1
+        return Lease(self, granted)
+
+    def _release(self, granted: int):
+        with self._cond:
+            self.in_use = max(0, self.in_use - granted)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "capacity_bytes": self.capacity,
+                "in_use_bytes": self.in_use,
+                "in_use_pct": round(100.0 * self.in_use / self.capacity, 1),
+                "waiting": len(self._queue),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+def get_memory_budget(app) -> MemoryBudget:
+    """Uygulama başına tek bütçe (tüm istek/iş thread'leri paylaşır)."""
+    budget = app.extensions.get("memory_budget")
+    if budget is None:
+        capacity = int(app.config.get("IMAGING_MEMORY_BUDGET_MB", 2048)) * 1024 * 1024
+        budget = app.extensions.setdefault("memory_budget", MemoryBudget(capacity))
+    return budget
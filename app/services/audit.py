@@ -0,0 +1,65 @@
+# app/services/audit.py
+import json
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from ..models import AuditEvent
+
+# Analitikte sık okunan meta alanları audit_event'te tipli kolon olarak da tutulur; meta JSON'u
+# geri kalan (gösterim amaçlı) alanlar için aynen yazılmaya devam eder. Kolonlar flush öncesi
+# meta'dan doldurulur (yazan kodun ayrıca bir şey yapması gerekmez); açıkça verilen değer
+# korunur. bulk_save_objects / ham SQL ile yazanlar kolonları kendileri vermelidir.
+INT_FIELDS = ("tokens", "files", "tier")
+STR_FIELDS = ("order_id", "txn_id")
+HOT_FIELDS = INT_FIELDS + STR_FIELDS
+
+# Eski satırlar için (kolonlar ilk eklendiğinde bir kez, DB patch'ten). CAST'ler promote()
+# ile aynı sonucu verir; geçersiz JSON'lu satırlar atlanır.
+BACKFILL_SQL = """
+    UPDATE audit_event SET
+        tokens   = CAST(json_extract(meta,'$.tokens') AS INTEGER),
+        files    = CAST(json_extract(meta,'$.files') AS INTEGER),
+        tier     = CAST(json_extract(meta,'$.tier') AS INTEGER),
+        order_id = CAST(json_extract(meta,'$.order_id') AS TEXT),
+        txn_id   = CAST(json_extract(meta,'$.txn_id') AS TEXT)
+    WHERE meta IS NOT NULL AND json_valid(meta)
+"""
+
+
+def _int(value):
+    try:
+        return int(float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return 0
+
+
+def promote(ev: AuditEvent) -> AuditEvent:
+    """Boş tipli kolonları meta JSON'undan doldurur (idempotent)."""
+    if not ev.meta or all(getattr(ev, f) is not None for f in HOT_FIELDS):
+        return ev
+    try:
+        m = json.loads(ev.meta)
+    except Exception:
+        return ev
+    if not isinstance(m, dict):
+        return ev
+    for f in INT_FIELDS:
+        if getattr(ev, f) is None:
+            setattr(ev, f, _int(m.get(f)))
+    for f in STR_FIELDS:
+        if getattr(ev, f) is None and m.get(f) is not None:
+            setattr(ev, f, str(m[f]))
+    return ev
+
+
+@event.listens_for(Session, "before_flush")
+def _promote_pending(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, AuditEvent):
+            promote(obj)
+
+
+def backfill_columns(session) -> int:
+    """Var olan satırların tipli kolonlarını meta'dan yazar; güncellenen satır sayısı."""
+    return session.execute(text(BACKFILL_SQL)).rowcount
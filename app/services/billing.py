@@ -1,9 +1,21 @@
 # app/services/billing.py
 import json
+from datetime import datetime
 from typing import Optional, Tuple
 from sqlalchemy import text
 from .. import db
 from ..models import User, AuditEvent
+from .imaging import BOYUTLAR_8LI_PORTRAIT
+
+# Tam 8'li paket = dosya başına 1 token; seçilen ölçülerin toplam piksel alanı bu paketin
+# alanına oranlanır (scale tüm ölçüleri aynı oranda büyüttüğü için fiyata girmez)
+FULL_PLAN_AREA = sum(w * h for w, h in BOYUTLAR_8LI_PORTRAIT)
+
+
+def upload_price(files: int, sizes) -> int:
+    """files x (seçili alan / tam paket alanı), yukarı yuvarlanır; en az 1 token."""
+    area = sum(w * h for w, h in sizes)
+    return max(1, -(-files * area // FULL_PLAN_AREA))
 
 def grant_tokens(
     user: User,
@@ -24,25 +36,21 @@ def grant_tokens(
     if not user or not isinstance(tokens, int) or tokens <= 0:
         return False, "Geçersiz parametre"
 
-    # Idempotency (aynı siparişi ikinci kez işlemeyelim)
+    # Idempotency (aynı siparişi ikinci kez işlemeyelim; order_id/txn_id indeksli kolonlar)
     if order_id or txn_id:
-        rows = db.session.execute(
+        dup = db.session.execute(
             text("""
-                SELECT id, meta FROM audit_event
+                SELECT order_id, txn_id FROM audit_event
                 WHERE event='token_purchase' AND user_id=:uid
-                ORDER BY id DESC LIMIT 200
+                  AND (order_id=:oid OR txn_id=:tid)
+                LIMIT 1
             """),
-            {"uid": user.id},
-        ).fetchall()
-        for _, meta_txt in rows:
-            try:
-                m = json.loads(meta_txt or "{}")
-            except Exception:
-                m = {}
-            if order_id and m.get("order_id") == order_id:
-                return True, "Bu sipariş zaten işlenmiş (order_id eşleşti)."
-            if txn_id and m.get("txn_id") == txn_id:
-                return True, "Bu işlem zaten işlenmiş (txn_id eşleşti)."
+            {"uid": user.id, "oid": order_id, "tid": txn_id},
+        ).first()
+        if dup and order_id and dup.order_id == order_id:
+            return True, "Bu sipariş zaten işlenmiş (order_id eşleşti)."
+        if dup:
+            return True, "Bu işlem zaten işlenmiş (txn_id eşleşti)."
 
     # Token ekle
     user.tokens = int(user.tokens or 0) + tokens
@@ -64,3 +72,49 @@ def grant_tokens(
     except Exception as e:
         db.session.rollback()
         return False, f"DB hatası: {e}"
+
+
+def charge_upload(
+    user: User,
+    tokens: int,
+    *,
+    files: int,
+    orientation: str,
+    scale: int,
+    sizes: Optional[list] = None,
+    commit: bool = True,
+) -> Tuple[bool, str]:
+    """
+    Yükleme ücretini düşer:
+    - user.tokens -= tokens (yetersizse hiçbir şey yazmaz)
+    - audit_event: upload (meta.files, seçildiyse meta.sizes) + token_spent (meta.tokens, reason='upload')
+    commit=False => çağıran kendi transaction'ını commit eder (örn. job durumu ile birlikte).
+    """
+    have = int(user.tokens or 0)
+    if tokens > have:
+        return False, "Yetersiz token"
+
+    now = datetime.utcnow()
+    user.tokens = have - tokens
+
+    # upload eventi (grafikler için dosya sayısı önemli)
+    meta = {"files": files, "orientation": orientation, "scale": scale}
+    if sizes:
+        meta["sizes"] = list(sizes)
+    db.session.add(AuditEvent(
+        user_id=user.id, event="upload", created_at=now, meta=json.dumps(meta),
+    ))
+    # token_spent eventi (admin “Harcanan” sütunu için)
+    db.session.add(AuditEvent(
+        user_id=user.id, event="token_spent", created_at=now,
+        meta=json.dumps({"tokens": tokens, "reason": "upload", "files": files}),
+    ))
+
+    if not commit:
+        return True, "Token düşüldü."
+    try:
+        db.session.commit()
+        return True, "Token düşüldü."
+    except Exception as e:
+        db.session.rollback()
+        return False, f"DB hatası: {e}"
@@ -0,0 +1,262 @@
+# app/services/cache.py
+import hashlib, os, shutil, threading, uuid
+from pathlib import Path
+
+# Kaynak dosyayı hash'lerken okunan parça boyutu
+HASH_CHUNK = 1024 * 1024
+# Taşma olunca girdiler max_bytes'ın bu oranına inene kadar silinir (her commit'te tarama olmasın)
+EVICT_LOW_WATER = 0.9
+
+
+def sha256_file(path) -> str:
+    """Dosya yolu ya da seek edilebilir dosya nesnesi; nesne başa sarılarak bırakılır."""
+    h = hashlib.sha256()
+    if hasattr(path, "read"):
+        path.seek(0)
+        for buf in iter(lambda: path.read(HASH_CHUNK), b""):
+            h.update(buf)
+        path.seek(0)
+        return h.hexdigest()
+    with open(path, "rb") as fh:
+        for buf in iter(lambda: fh.read(HASH_CHUNK), b""):
+            h.update(buf)
+    return h.hexdigest()
+
+
+def link_or_copy(src, dst):
+    """Aynı dosya sisteminde hard link (kopyasız), olmazsa kopya."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class RenderCache:
+    """
+    İçerik adresli render önbelleği (instance/render_cache).
+    - Anahtar: sha256(kaynak) + yön + scale + encoder imzası (make_key).
+    - Girdi: <root>/<key[:2]>/<key>/<W>x<H><ext> — her ölçü ayrı dosya; ext kodlama
+      profilinin uzantısı (imaging.output_ext).
+    - LRU: girdi klasörünün mtime'ı son erişim saatidir; toplam boyut max_bytes'ı
+      aşınca en eski girdiler silinir. Toplam bellekte tutulur (ilk commit'te ve evict'te
+      diskten yeniden sayılır); commit ağacı taramaz, yalnız bilinen toplam taşınca evict
+      çalışır. Diğer süreçlerin yazdıkları periyodik evict (temizleyici) ile sayılır. İsabetler open_hit / link_hit ile evict'le aynı
+      kilit altında açılır ya da bağlanır: açık dosya / hard link silinmeye karşı veriyi tutar.
+    - Single-flight: aynı anahtar için süreç içinde tek render; diğerleri begin()
+      False döndüğünde wait() ile bekler. Süreçler arası birleştirme yoktur.
+    """
+
+    def __init__(self, root, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._inflight: dict[str, threading.Event] = {}
+        self._usage: int | None = None    # bilinen toplam bayt (None => henüz taranmadı)
+
+    @staticmethod
+    def make_key(source_hash: str, orientation: str, scale: int, encoder: str) -> str:
+        raw = f"{source_hash}|{orientation}|{int(scale)}|{encoder}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def size_name(size: tuple[int, int], ext: str = ".jpg") -> str:
+        return f"{size[0]}x{size[1]}{ext}"
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    # ---- okuma ----
+    def lookup(self, key: str, sizes, ext: str = ".jpg") -> dict[tuple[int, int], Path] | None:
+        """
+        Tüm ölçüler önbellekteyse {ölçü: yol} döner ve girdiyi 'yeni kullanıldı' işaretler.
+        Yollar eşzamanlı evict ile silinebilir; okuyacak çağıran open_hit / link_hit kullanmalı.
+        """
+        entry = self._entry(key)
+        found = {}
+        for size in sizes:
+            p = entry / self.size_name(size, ext)
+            if not p.is_file():
+                return None
+            found[tuple(size)] = p
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return found
+
+    def open_hit(self, key: str, sizes, ext: str = ".jpg") -> list | None:
+        """İsabette sizes sırasıyla açık dosyalar (çağıran kapatır); yoksa ya da o arada silindiyse None."""
+        with self._lock:
+            hit = self.lookup(key, sizes, ext)
+            if not hit:
+                return None
+            opened = []
+            try:
+                for size in sizes:
+                    opened.append(open(hit[tuple(size)], "rb"))
+            except OSError:       # başka süreç girdiyi silmiş
+                for fh in opened:
+                    fh.close()
+                return None
+            return opened
+
+    def link_hit(self, key: str, sizes, targets, ext: str = ".jpg") -> bool:
+        """
+        İsabette her (ölçü, hedef yol) çiftini girdiye bağlar (hard link, olmazsa kopya);
+        yoksa ya da o arada silindiyse yarım bağlanan hedefleri silip False döner.
+        """
+        with self._lock:
+            hit = self.lookup(key, sizes, ext)
+            if not hit:
+                return False
+            done = []
+            try:
+                for size, dst in targets:
+                    link_or_copy(hit[tuple(size)], dst)
+                    done.append(dst)
+            except OSError:
+                for dst in done:
+                    Path(dst).unlink(missing_ok=True)
+                return False
+            return True
+
+    # ---- single-flight ----
+    def begin(self, key: str) -> bool:
+        """Bu anahtarın render'ını üstlen; başka bir thread zaten üstlendiyse False."""
+        with self._lock:
+            if key in self._inflight:
+                return False
+            self._inflight[key] = threading.Event()
+            return True
+
+    def end(self, key: str):
+        with self._lock:
+            ev = self._inflight.pop(key, None)
+        if ev:
+            ev.set()
+
+    def wait(self, key: str, timeout: float | None = None) -> bool:
+        with self._lock:
+            ev = self._inflight.get(key)
+        return ev.wait(timeout) if ev else True
+
+    # ---- yazma ----
+    def writer(self, key: str, ext: str = ".jpg") -> "CacheWriter":
+        """Girdiyi parça parça doldurmak için (bellekte render edilen çıktılar)."""
+        return CacheWriter(self, key, ext)
+
+    def put(self, key: str, files: dict[tuple[int, int], str], ext: str = ".jpg"):
+        """Render edilmiş dosyaları girdiye bağlar (önce geçici klasör, sonra atomik rename)."""
+        w = self.writer(key, ext)
+        try:
+            for size, src in files.items():
+                w.add(size, src)
+            w.commit()
+        finally:
+            w.abort()
+
+    def _commit(self, key: str, tmp: Path):
+        entry = self._entry(key)
+        added = sum(p.stat().st_size for p in tmp.iterdir())
+        with self._lock:
+            if entry.exists():
+                for p in tmp.iterdir():
+                    try:
+                        added -= (entry / p.name).stat().st_size
+                    except OSError:
+                        pass
+                    os.replace(p, entry / p.name)
+                os.utime(entry)
+            else:
+                os.replace(tmp, entry)
+            if self._usage is None:
+                self._usage = sum(size for _, size, _ in self.entries())
+            else:
+                self._usage += added
+            over = self._usage > self.max_bytes
+        if over:
+            self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        """(son erişim, bayt, klasör) listesi (tam ağaç taraması)."""
+        out = []
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            for entry in shard.iterdir():
+                if entry.name.startswith(".") or not entry.is_dir():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                    out.append((entry.stat().st_mtime, size, entry))
+                except OSError:
+                    continue
+        return out
+
+    def usage(self) -> int:
+        """Bilinen toplam bayt (henüz taranmadıysa tarar)."""
+        with self._lock:
+            if self._usage is None:
+                self._usage = sum(size for _, size, _ in self.entries())
+            return self._usage
+
+    def evict(self) -> int:
+        """
+        Ağacı tarayıp toplamı yeniden sayar; max_bytes aşılmışsa en eski girdileri
+        max_bytes * EVICT_LOW_WATER altına inene kadar siler. Kalan toplamı döner.
+        """
+        with self._lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                target = int(self.max_bytes * EVICT_LOW_WATER)
+                for _, size, entry in entries:
+                    if total <= target:
+                        break
+                    shutil.rmtree(entry, ignore_errors=True)
+                    total -= size
+            self._usage = total
+            return total
+
+
+class CacheWriter:
+    """Geçici klasöre yazar; commit() ile girdiye taşır, abort() ile siler (commit sonrası etkisiz)."""
+
+    def __init__(self, cache: RenderCache, key: str, ext: str = ".jpg"):
+        self.cache = cache
+        self.key = key
+        self.ext = ext
+        parent = cache._entry(key).parent
+        parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = parent / f".{key}.{uuid.uuid4().hex}.tmp"
+        self.tmp.mkdir()
+
+    def add(self, size: tuple[int, int], src):
+        """src: dosya yolu (hard link) ya da dosya nesnesi (kopyalanır, sonra başa sarılır)."""
+        dst = self.tmp / self.cache.size_name(size, self.ext)
+        if hasattr(src, "read"):
+            src.seek(0)
+            with open(dst, "wb") as fh:
+                shutil.copyfileobj(src, fh, HASH_CHUNK)
+            src.seek(0)
+        else:
+            link_or_copy(src, dst)
+
+    def commit(self):
+        self.cache._commit(self.key, self.tmp)
+
+    def abort(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def get_render_cache(app) -> RenderCache | None:
+    """Uygulama başına tek RenderCache (single-flight tablosu paylaşılmalı); kapalıysa None."""
+    if not app.config.get("RENDER_CACHE_ENABLED", True):
+        return None
+    cache = app.extensions.get("render_cache")
+    if cache is None:
+        root = Path(app.instance_path) / app.config.get("RENDER_CACHE_DIRNAME", "render_cache")
+        cache = app.extensions.setdefault(
+            "render_cache", RenderCache(root, app.config.get("RENDER_CACHE_MAX_BYTES", 2 * 1024 ** 3)))
+    return cache
@@ -0,0 +1,83 @@
+# app/services/hll.py
+import hashlib, math, struct
+
+# HyperLogLog (Flajolet ve ark. 2007), saf Python. 2^p yazmaç; standart hata ≈ 1.04/√m
+# (p=12 => m=4096, %1.6). Küçük kardinalitelerde linear counting kullanıldığı için sonuç
+# neredeyse kesindir. Eskizler birleştirilebilir (yazmaç bazında max): birleşimin tahmini,
+# parçaların ayrı ayrı tahminlerinin toplamı değil, tekil sayıdır.
+#
+# Saklama biçimi (kanonik; aynı yazmaçlar => aynı baytlar):
+#   b"S" + p + sıralı (yazmaç no: uint16, değer: uint8) çiftleri   az dolu eskizler
+#   b"D" + p + m bayt                                              yoğun eskizler
+DEFAULT_PRECISION = 12
+_POW = [2.0 ** -r for r in range(65)]
+
+
+def _hash64(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    __slots__ = ("p", "m", "registers")
+
+    def __init__(self, p: int = DEFAULT_PRECISION):
+        if not 4 <= p <= 16:
+            raise ValueError("p 4..16 aralığında olmalı")
+        self.p, self.m = p, 1 << p
+        self.registers = bytearray(self.m)
+
+    @property
+    def std_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value) -> bool:
+        """Değeri ekler; yazmaç değiştiyse True (saklanan eskizin yeniden yazılması gerekir)."""
+        h = _hash64(value)
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rho = (64 - self.p) - rest.bit_length() + 1
+        if self.registers[idx] < rho:
+            self.registers[idx] = rho
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Farklı hassasiyetteki eskizler birleştirilemez")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def merge_bytes(self, data: bytes) -> "HyperLogLog":
+        """Saklanan eskizi (to_bytes) çözmeden birleştirir."""
+        kind, p = data[:1], data[1]
+        if p != self.p:
+            raise ValueError("Farklı hassasiyetteki eskizler birleştirilemez")
+        if kind == b"D":
+            self.registers = bytearray(map(max, self.registers, data[2:]))
+        else:
+            regs = self.registers
+            for idx, rho in struct.iter_unpack(">HB", data[2:]):
+                if regs[idx] < rho:
+                    regs[idx] = rho
+        return self
+
+    def count(self) -> float:
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(map(_POW.__getitem__, self.registers))
+        if estimate <= 2.5 * m:
+            zeros = self.registers.count(0)
+            if zeros:
+                return m * math.log(m / zeros)   # linear counting
+        return estimate
+
+    def to_bytes(self) -> bytes:
+        pairs = [(i, r) for i, r in enumerate(self.registers) if r]
+        if len(pairs) * 3 < self.m:
+            return b"S" + bytes((self.p,)) + b"".join(struct.pack(">HB", i, r) for i, r in pairs)
+        return b"D" + bytes((self.p,)) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | None, p: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        hll = cls(data[1] if data else p)
+        return hll.merge_bytes(data) if data else hll
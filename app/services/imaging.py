@@ -1,7 +1,12 @@
-# app/services/imaging.py
-from PIL import Image
+from PIL import Image, ImageChops, ImageFilter, ImageMath, ImageStat, features
 from pathlib import Path
-import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from math import gcd, log10
+from typing import Iterator, NamedTuple
+import io, os, re, tempfile, time
+from multiprocessing import get_context
+
+from .cache import sha256_file, link_or_copy
 
 # 8 temel ölçü (px) — dikey (portre)
 BOYUTLAR_8LI_PORTRAIT = [
@@ -20,42 +25,1080 @@ BOYUTLAR_8LI_LANDSCAPE = [(h, w) for (w, h) in BOYUTLAR_8LI_PORTRAIT]
 
 LABELS_8LI = ["5x7", "8x10", "9x12", "11x14", "16x20", "18x24", "24x36", "ISO A2"]
 
+IZINLI_UZANTILAR = (".png", ".jpg", ".jpeg")
+
+# Ölçü seçimi: tablo ölçüleri 72 px/inç tabanındadır (scale ile büyür). Özel ölçüler
+# "<en>x<boy>" inç olarak verilir; uzun kenar CUSTOM_MAX_INCHES'i aşamaz.
+PX_PER_INCH = 72
+CUSTOM_MAX_INCHES = 40
+MAX_SIZES = 12
+_CUSTOM_RE = re.compile(r"^(\d+(?:\.\d+)?)x(\d+(?:\.\d+)?)$")
+
+# Paralel motor: 'thread' | 'process' | 'serial'
+EXECUTORS = ("thread", "process", "serial")
+
 try:
     RESAMPLE = Image.Resampling.LANCZOS
 except Exception:
     RESAMPLE = Image.LANCZOS
 
+# Kalite kademeleri (yeniden örnekleme filtresi). best = LANCZOS (eski davranış).
+# fast: BILINEAR + hafif 3x3 keskinleştirme; keskinleştirme çıktılara değil decode edilen
+# kaynağa bir kez uygulanır (100 MP'lik bir çıktıyı filtrelemek LANCZOS'tan pahalıdır).
+QUALITY_TIERS = {
+    "fast": Image.Resampling.BILINEAR,
+    "standard": Image.Resampling.BICUBIC,
+    "best": RESAMPLE,
+}
+DEFAULT_QUALITY = "best"
+FAST_SHARPEN = ImageFilter.Kernel((3, 3), [0, -1, 0, -1, 12, -1, 0, -1, 0], 8)
+
+
+def resolve_quality(name, default: str = DEFAULT_QUALITY) -> str:
+    name = (name or "").strip().lower()
+    return name if name in QUALITY_TIERS else default
+
+
+# Kademeli planda türetilen ölçülerin doğrudan yola göre kabul edilen en düşük PSNR'ı (dB)
+# ve SSIM'i (bkz. cascade_quality_report; tests/test_quality.py)
+CASCADE_MIN_PSNR = 40.0
+CASCADE_MIN_SSIM = 0.98
+
+# Decode-zamanı küçültme (JPEG draft / DCT ölçekleme):
+# kaynak, plandaki en büyük kök hedefin DRAFT_MARGIN katından küçük olmayacak şekilde
+# 1/2, 1/4 ya da 1/8 ölçekte decode edilir; hiçbir ölçü tam çözünürlük istemiyorsa tam
+# decode hiç yapılmaz. 2.0 payla LANCZOS çıktısı tam decode yoluna göre >= DRAFT_MIN_PSNR
+# ve >= DRAFT_MIN_SSIM (bkz. draft_quality_report; tests/test_quality.py).
+DRAFT_MARGIN = 2.0
+DRAFT_MIN_PSNR = 38.0
+DRAFT_MIN_SSIM = 0.97
+# Büyük küçültmelerde resize(..., reducing_gap) önce tam sayı reduce yapar (Pillow: >= 3.0
+# sonuç pratikte ayırt edilemez). Büyütmelerde etkisizdir.
+REDUCING_GAP = 3.0
+
+# Şeritli (bant) render: hedef piksel sayısı BAND_MIN_PIXELS'i aşan kök ölçüler
+# BAND_ROWS satırlık yatay şeritler halinde yeniden örneklenir. Her şerit resize(box=...)
+# ile üretilir; filtre desteği kutunun dışındaki kaynak satırlarından okunduğu için
+# şerit sınırlarında dikiş oluşmaz. Kazanç yalnız resize ara görüntüsündedir: Pillow'un
+# yatay geçiş ara görüntüsü (hedef genişlik x kaynak yükseklik) tek şerit boyuna iner.
+# Şeritler kodlayıcıya akıtılmaz (Pillow kodlayıcıları tam görüntü ister): tepe bellek
+# = tam çıktı çerçevesi + bir şerit; estimate_peak_bytes de bunu sayar.
+BAND_MIN_PIXELS = 40_000_000
+BAND_ROWS = 512
+
+
+# Önizleme: her ölçünün uzun kenarı PREVIEW_EDGE px olan küçük kopyası. Tam çıktılardan
+# değil, kaynağın draft decode'undan (JPEG'de 1/8'e kadar DCT ölçekleme) üretilir; çıktılar
+# gibi kırpmasız germe olduğundan en-boy/yön hatası paket indirilmeden görülür.
+PREVIEW_EDGE = 256
+PREVIEW_QUALITY = 75
+
+
+class EncodingProfile(NamedTuple):
+    format: str      # Pillow kaydedici adı
+    ext: str         # çıktı dosya uzantısı
+    options: dict    # save() parametreleri
+
+
+# Adlandırılmış çıktı kodlama profilleri. print-max eski davranıştır (q100, 4:2:0).
+# optimize/progressive JPEG'de Pillow kodlama tamponunu ~1 bayt/piksel ayırır; WebP method=1
+# (4'e göre ~%10 büyük, 3-4 kat hızlı) baskı boyutlarında encode süresini makul tutar.
+ENCODING_PROFILES = {
+    "print-max": EncodingProfile("JPEG", ".jpg", {"quality": 100, "dpi": (300, 300)}),
+    "print-standard": EncodingProfile(
+        "JPEG", ".jpg", {"quality": 92, "subsampling": 0, "optimize": True, "dpi": (300, 300)}),
+    "web": EncodingProfile(
+        "JPEG", ".jpg", {"quality": 85, "subsampling": 2, "progressive": True, "optimize": True, "dpi": (300, 300)}),
+    "web-webp": EncodingProfile("WEBP", ".webp", {"quality": 85, "method": 1}),
+}
+DEFAULT_ENCODING = "print-max"
+
+
+def available_encodings() -> list[str]:
+    """Bu Pillow kurulumunda kullanılabilen profiller (WebP derlenmemiş olabilir)."""
+    return [name for name, prof in ENCODING_PROFILES.items()
+            if prof.format != "WEBP" or features.check("webp")]
+
+
+def resolve_encoding(name, default: str = DEFAULT_ENCODING) -> str:
+    """Geçerli ve kullanılabilir profil adı; değilse default."""
+    name = (name or "").strip().lower()
+    return name if name in available_encodings() else default
+
+
+def output_ext(encoding: str) -> str:
+    return ENCODING_PROFILES[encoding].ext
+
+
+class RenderSettings(NamedTuple):
+    """Çıktı piksellerini etkileyen motor ayarları (process havuzuna da taşınır)."""
+    cascade: bool = True
+    draft_margin: float | None = DRAFT_MARGIN   # None/0 => her zaman tam decode
+    reducing_gap: float | None = REDUCING_GAP   # None => düz LANCZOS
+    band_rows: int | None = BAND_ROWS           # None/0 => şeritsiz
+    band_min_pixels: int = BAND_MIN_PIXELS
+    encoding: str = DEFAULT_ENCODING            # ENCODING_PROFILES anahtarı
+    quality: str = DEFAULT_QUALITY              # QUALITY_TIERS anahtarı
+
 def get_sizes(orientation: str):
     """'portrait' ya da 'landscape' gelir; uygun boyut listesi döner."""
     if str(orientation).lower() == 'landscape':
         return BOYUTLAR_8LI_LANDSCAPE
     return BOYUTLAR_8LI_PORTRAIT
 
-def resimleri_numaralandirarak_kaydet(
-    klasor_yolu: str,
+def _size_key(text: str) -> str:
+    return re.sub(r"[\s\"”″]", "", str(text).lower()).replace("×", "x")
+
+
+_LABEL_INDEX = {_size_key(label): i for i, label in enumerate(LABELS_8LI)}
+_LABEL_INDEX[_size_key("A2")] = LABELS_8LI.index("ISO A2")
+
+
+def select_sizes(orientation: str, selection=None) -> tuple[list[tuple[int, int]], list[str]]:
+    """
+    İstekteki ölçü seçiminden (ölçüler, etiketler) üretir. selection: etiket listesi ya da
+    virgüllü metin ("8x10, ISO A2, 4x6"); tablo etiketleri (LABELS_8LI) ve özel inç ölçüleri
+    kabul edilir. Boş seçim => tüm tablo. Geçersiz girdi => ValueError.
+    """
+    landscape = str(orientation).lower() == "landscape"
+    if isinstance(selection, str):
+        selection = [selection]
+    items = [part for raw in (selection or []) for part in str(raw).split(",") if part.strip()]
+    if not items:
+        return list(get_sizes(orientation)), list(LABELS_8LI)
+
+    sizes, labels = [], []
+    for raw in items:
+        key = _size_key(raw)
+        if key in _LABEL_INDEX:
+            i = _LABEL_INDEX[key]
+            size, label = get_sizes(orientation)[i], LABELS_8LI[i]
+        else:
+            m = _CUSTOM_RE.match(key)
+            if not m:
+                raise ValueError(f"Geçersiz ölçü: {raw.strip()}")
+            a, b = sorted((float(m.group(1)), float(m.group(2))))
+            if a < 1 or b > CUSTOM_MAX_INCHES:
+                raise ValueError(f"Özel ölçü 1-{CUSTOM_MAX_INCHES} inç aralığında olmalı: {raw.strip()}")
+            w, h = round(a * PX_PER_INCH), round(b * PX_PER_INCH)
+            size, label = ((h, w) if landscape else (w, h)), f"{a:g}x{b:g}"
+        if label not in labels:
+            sizes.append(size)
+            labels.append(label)
+    if len(sizes) > MAX_SIZES:
+        raise ValueError(f"En fazla {MAX_SIZES} ölçü seçilebilir")
+    return sizes, labels
+
+
+def _label(index: int, labels) -> str:
+    return labels[index] if index < len(labels) else f"size{index+1}"
+
+def _decode(p, draft_size: tuple[int, int] | None = None) -> Image.Image:
+    """
+    Kaynağı bir kez açar, RGB/L'ye çevirir ve pikselleri belleğe alır.
+    draft_size verilirse JPEG, her iki eksende en az bu boyutta kalan en küçük
+    DCT ölçeğinde decode edilir (PNG vb. için etkisiz).
+    """
+    with Image.open(p) as im:
+        if draft_size:
+            im.draft(im.mode, draft_size)
+        if im.mode not in ("RGB", "L"):
+            return im.convert("RGB")
+        im.load()
+        return im.copy()
+
+
+def _source(p, draft_size: tuple[int, int] | None, settings: RenderSettings, timer=None) -> Image.Image:
+    """Render kaynağı: _decode + (fast kademesinde) bir kerelik keskinleştirme."""
+    t0 = time.perf_counter()
+    im = _decode(p, draft_size)
+    if settings.quality == "fast":
+        im = im.filter(FAST_SHARPEN)
+    if timer:
+        timer("decode", time.perf_counter() - t0, None)
+    return im
+
+class RenderStep(NamedTuple):
+    index: int                  # boyutlar listesindeki sıra (etiket için)
+    size: tuple[int, int]       # ölçeklenmiş hedef (px)
+    parent: int | None = None   # None => kaynaktan LANCZOS; aksi halde üst adımın index'i
+    factor: int = 1             # üst adımdan Image.reduce faktörü
+
+
+def _exact_factor(big: tuple[int, int], small: tuple[int, int]) -> int:
+    """big, small'un tam katıysa (iki eksende aynı k) k'yı, değilse 0 döner."""
+    (bw, bh), (sw, sh) = big, small
+    if bw % sw or bh % sh:
+        return 0
+    k = bw // sw
+    return k if k > 1 and k == bh // sh else 0
+
+
+def plan_renders(boyutlar, scale: int, cascade: bool = True) -> list[list[RenderStep]]:
+    """
+    "Baskı piramidi" planı: ölçüleri en-boy oranına göre gruplar, büyükten küçüğe sıralar;
+    bir ölçü aynı gruptaki daha büyük bir çıktının tam katıysa onu kaynaktan değil,
+    o çıktıdan Image.reduce ile türetir (örn. 8x10 = 16x20 / 2, 9x12 = 18x24 / 2).
+    Zincir listesi döner; her zincir kökten başlar, zincirler pahalıdan ucuza sıralıdır.
+    cascade=False => her ölçü kaynaktan (eski yol).
+    """
+    steps = [(i, (int(w * scale), int(h * scale))) for i, (w, h) in enumerate(boyutlar)]
+    if not cascade:
+        return [[RenderStep(i, size)] for i, size in steps]
+
+    groups: dict[tuple[int, int], list] = {}
+    for i, (w, h) in steps:
+        g = gcd(w, h)
+        groups.setdefault((w // g, h // g), []).append((i, (w, h)))
+
+    chains: list[list[RenderStep]] = []
+    for members in groups.values():
+        members.sort(key=lambda m: m[1][0] * m[1][1], reverse=True)
+        placed: list[tuple[RenderStep, list[RenderStep]]] = []
+        for i, size in members:
+            best = None
+            for step, chain in placed:
+                k = _exact_factor(step.size, size)
+                if k and (best is None or k < best[0]):
+                    best = (k, step, chain)
+            if best:
+                k, parent, chain = best
+                step = RenderStep(i, size, parent.index, k)
+                chain.append(step)
+            else:
+                step = RenderStep(i, size)
+                chain = [step]
+                chains.append(chain)
+            placed.append((step, chain))
+
+    chains.sort(key=lambda c: c[0].size[0] * c[0].size[1], reverse=True)
+    return chains
+
+
+def _save_output(out: Image.Image, dst, encoding: str = DEFAULT_ENCODING):
+    prof = ENCODING_PROFILES[encoding]
+    out.save(dst, prof.format, **prof.options)
+
+
+def draft_size(plan: list[list[RenderStep]], settings: RenderSettings) -> tuple[int, int] | None:
+    """Plandaki kök hedeflerin en büyüğü x DRAFT_MARGIN — decode bundan küçük olamaz."""
+    if not settings.draft_margin or not plan:
+        return None
+    need_w = max(chain[0].size[0] for chain in plan)
+    need_h = max(chain[0].size[1] for chain in plan)
+    return (int(need_w * settings.draft_margin), int(need_h * settings.draft_margin))
+
+
+def _resize(im: Image.Image, size: tuple[int, int], settings: RenderSettings) -> Image.Image:
+    if settings.band_rows and size[0] * size[1] >= settings.band_min_pixels:
+        return _resize_banded(im, size, settings)
+    if settings.reducing_gap:
+        return im.resize(size, QUALITY_TIERS[settings.quality], reducing_gap=settings.reducing_gap)
+    return im.resize(size, QUALITY_TIERS[settings.quality])
+
+
+def _resize_banded(im: Image.Image, size: tuple[int, int], settings: RenderSettings) -> Image.Image:
+    """
+    Hedefi band_rows satırlık şeritler halinde tam çerçeveye yapıştırır (bkz. BAND_MIN_PIXELS).
+    Tam çerçeve bellekte tutulur; sınırlanan yalnız şerit başına resize ara görüntüsüdür.
+    """
+    w, h = size
+    sw, sh = im.size
+    sy = sh / h
+    extra = {"reducing_gap": settings.reducing_gap} if settings.reducing_gap else {}
+    out = Image.new(im.mode, size)
+    for y0 in range(0, h, settings.band_rows):
+        y1 = min(h, y0 + settings.band_rows)
+        band = im.resize((w, y1 - y0), QUALITY_TIERS[settings.quality], box=(0, y0 * sy, sw, y1 * sy), **extra)
+        out.paste(band, (0, y0))
+        del band
+    return out
+
+
+def _render_chain(im: Image.Image, chain: list[RenderStep], dsts: dict[int, str],
+                  settings: RenderSettings = RenderSettings(), timer=None) -> list[str]:
+    """
+    Zinciri sırayla üretir; türetilen adımlar üst adımın çıktısından reduce edilir.
+    Bir çıktı, zincirde ondan türeyecek adım kalmayınca bırakılır.
+    timer(stage, saniye, ölçü sırası) verilirse her adımın resize/encode süresi bildirilir.
+    """
+    last_use = {step.parent: pos for pos, step in enumerate(chain) if step.parent is not None}
+    rendered: dict[int, Image.Image] = {}
+    for pos, step in enumerate(chain):
+        t0 = time.perf_counter()
+        if step.parent is None:
+            out = _resize(im, step.size, settings)
+        else:
+            out = rendered[step.parent].reduce(step.factor)
+            if last_use[step.parent] == pos:
+                del rendered[step.parent]
+        t1 = time.perf_counter()
+        _save_output(out, dsts[step.index], settings.encoding)
+        if timer:
+            timer("resize", t1 - t0, step.index)
+            timer("encode", time.perf_counter() - t1, step.index)
+        if step.index in last_use:
+            rendered[step.index] = out
+        del out
+    return [dsts[step.index] for step in chain]
+
+
+def _render_image(p: str, boyutlar, alt_klasor: str, base: str, scale: int, labels,
+                  settings: RenderSettings = RenderSettings()) -> list[str]:
+    """Tek görseli bir kez decode edip tüm ölçüleri sırayla üretir (process havuzu işçisi)."""
+    plan = plan_renders(boyutlar, scale, settings.cascade)
+    im = _source(p, draft_size(plan, settings), settings)
+    os.makedirs(alt_klasor, exist_ok=True)
+    dsts = _dsts(alt_klasor, base, len(boyutlar), labels, output_ext(settings.encoding))
+    return [dst for chain in plan for dst in _render_chain(im, chain, dsts, settings)]
+
+
+def preview_format() -> tuple[str, str]:
+    """(Pillow kaydedici, uzantı): WebP derlenmişse WEBP, değilse JPEG."""
+    return ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+
+
+def preview_size(size: tuple[int, int], edge: int = PREVIEW_EDGE) -> tuple[int, int]:
+    """Ölçünün en-boy oranında, uzun kenarı edge olan önizleme boyutu."""
+    w, h = size
+    k = edge / max(w, h)
+    return max(1, round(w * k)), max(1, round(h * k))
+
+
+def render_previews(p, boyutlar, edge: int = PREVIEW_EDGE, fmt: str | None = None,
+                    quality: int = PREVIEW_QUALITY) -> list[bytes]:
+    """
+    Her ölçü için kodlanmış önizleme baytları (boyutlar sırasıyla). Kaynak bir kez, en büyük
+    önizlemenin DRAFT_MARGIN katına kadar küçültülerek decode edilir. Dosya nesneleri de
+    kabul edilir ve başa sarılarak bırakılır.
+    """
+    fmt = fmt or preview_format()[0]
+    sizes = [preview_size(size, edge) for size in boyutlar]
+    try:
+        im = _decode(p, (int(max(w for w, _ in sizes) * DRAFT_MARGIN), int(max(h for _, h in sizes) * DRAFT_MARGIN)))
+    finally:
+        if hasattr(p, "seek"):
+            p.seek(0)
+    out = []
+    for size in sizes:
+        buf = io.BytesIO()
+        im.resize(size, Image.Resampling.BICUBIC, reducing_gap=REDUCING_GAP).save(buf, fmt, quality=quality)
+        out.append(buf.getvalue())
+    return out
+
+
+def probe_dims(paths) -> list[tuple[int, int, str]]:
+    """
+    Yalnızca başlıkları okur (piksel decode yok): [(w, h, mode)]; açılamayanlar atlanır.
+    Dosya nesneleri de kabul edilir ve başa sarılarak bırakılır.
+    """
+    dims = []
+    for p in paths:
+        try:
+            with Image.open(p) as im:
+                dims.append((im.size[0], im.size[1], im.mode))
+        except Exception:
+            continue
+        finally:
+            if hasattr(p, "seek"):
+                p.seek(0)
+    return dims
+
+
+def _pixel_bytes(mode: str) -> int:
+    """
+    Pillow'un bellekte piksel başına ayırdığı bayt: 8 bitlik tek bantlı kipler 1, I;16
+    ailesi 2, diğerleri 4 (RGB de 4 bayta hizalanır; LA/PA, I, F, CMYK...).
+    """
+    if mode in ("1", "L", "P"):
+        return 1
+    if mode.startswith("I;16"):
+        return 2
+    return 4
+
+
+def _resize_transient(src: tuple[int, int], size: tuple[int, int], band_rows: int | None,
+                      band_min_pixels: int) -> int:
+    """
+    Kök resize'ın çıktı çerçevesi dışındaki geçici ara görüntüsü (piksel): yatay geçiş
+    hedef genişlik x kaynak yüksekliği; şeritli yolda bir şeridin ara görüntüsü + şeridin kendisi.
+    """
+    w, h = size
+    if band_rows and w * h >= band_min_pixels:
+        rows = min(h, band_rows)
+        return w * (-(-rows * src[1] // h) + rows)
+    return w * src[1]
+
+
+def estimate_peak_bytes(dims, boyutlar, scale: int, cascade: bool = True, workers: int | None = None,
+                        sequential: bool = False, band_rows: int | None = BAND_ROWS,
+                        band_min_pixels: int = BAND_MIN_PIXELS) -> int:
+    """
+    Bir isteğin en kötü durumda aynı anda bellekte tuttuğu decode edilmiş piksel baytı:
+    tüm kaynaklar (thread modunda hepsi decode edilip tutulabilir) + aynı anda çalışan
+    en pahalı `workers` zincirin çıktıları (zincir boyunca ara çıktılar tutulur; şeritli
+    yolda da tam çerçeve) ve kök resize'ın ara görüntüsü.
+    sequential=True (iter_render_streams): kaynaklar sırayla işlenir, yalnız en büyüğü sayılır.
+    """
+    if not dims:
+        return 0
+    workers = int(workers or 0) or (os.cpu_count() or 1)
+    if sequential:
+        dims = [max(dims, key=lambda d: d[0] * d[1] * _pixel_bytes(d[2]))]
+    src = sum(w * h * _pixel_bytes(mode) for w, h, mode in dims)
+    chain_costs = []
+    for w, h, mode in dims:
+        b = _pixel_bytes(mode)
+        for chain in plan_renders(boyutlar, scale, cascade):
+            frames = sum(sw * sh for sw, sh in (step.size for step in chain))
+            transient = _resize_transient((w, h), chain[0].size, band_rows, band_min_pixels)
+            chain_costs.append((frames + transient) * b)
+    chain_costs.sort(reverse=True)
+    return src + sum(chain_costs[:workers])
+
+
+def psnr(a: Image.Image, b: Image.Image) -> float:
+    """İki aynı boyutlu görsel arasındaki PSNR (dB); özdeşse inf."""
+    diff = ImageStat.Stat(ImageChops.difference(a, b))
+    mse = sum(diff.sum2) / (a.size[0] * a.size[1] * len(diff.sum2))
+    return float("inf") if mse == 0 else 10 * log10(255 ** 2 / mse)
+
+
+def ssim(a: Image.Image, b: Image.Image, block: int = 8) -> float:
+    """
+    Parlaklık (L) üzerinde blok SSIM: block x block örtüşmeyen pencerelerde yerel
+    ortalama/varyans/kovaryans (BOX ile), pencerelerin ortalaması; özdeşse 1.0.
+    """
+    fa, fb = a.convert("L").convert("F"), b.convert("L").convert("F")
+    small = (max(1, fa.size[0] // block), max(1, fa.size[1] // block))
+    box = (0, 0, small[0] * block, small[1] * block)
+
+    def mean(im):
+        return im.resize(small, Image.Resampling.BOX, box=box)
+
+    mx, my = mean(fa), mean(fb)
+    xx = mean(ImageMath.lambda_eval(lambda e: e["x"] * e["x"], x=fa))
+    yy = mean(ImageMath.lambda_eval(lambda e: e["y"] * e["y"], y=fb))
+    xy = mean(ImageMath.lambda_eval(lambda e: e["x"] * e["y"], x=fa, y=fb))
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    smap = ImageMath.lambda_eval(
+        lambda e: ((e["mx"] * e["my"] * 2 + c1) * ((e["xy"] - e["mx"] * e["my"]) * 2 + c2))
+        / ((e["mx"] * e["mx"] + e["my"] * e["my"] + c1)
+           * (e["xx"] - e["mx"] * e["mx"] + e["yy"] - e["my"] * e["my"] + c2)),
+        mx=mx, my=my, xx=xx, yy=yy, xy=xy,
+    )
+    # ImageStat F görüntülerde histogram kullandığı için ortalama BOX ile alınır
+    return float(smap.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0)))
+
+
+def cascade_quality_report(p, boyutlar, scale: int = 5, labels=LABELS_8LI, metric=psnr) -> dict[str, float]:
+    """
+    Kademeli planın kalite kontrolü: türetilen her ölçüyü kaynaktan doğrudan LANCZOS
+    ile üretilenle karşılaştırır, {etiket: metric} döner (metric=psnr | ssim).
+    CASCADE_MIN_PSNR / CASCADE_MIN_SSIM altı = regresyon.
+    """
+    im = _decode(p)
+    report = {}
+    for chain in plan_renders(boyutlar, scale):
+        rendered = {}
+        for step in chain:
+            if step.parent is None:
+                rendered[step.index] = im.resize(step.size, RESAMPLE)
+                continue
+            rendered[step.index] = rendered[step.parent].reduce(step.factor)
+            direct = im.resize(step.size, RESAMPLE)
+            report[_label(step.index, labels)] = metric(rendered[step.index], direct)
+    return report
+
+
+def draft_quality_report(p, boyutlar, scale: int = 1, labels=LABELS_8LI,
+                         settings: RenderSettings = RenderSettings(), metric=psnr) -> dict[str, float]:
+    """
+    Decode-zamanı küçültmenin doğruluk kontrolü: her kök ölçüyü draft + reducing_gap
+    yoluyla ve tam decode + düz LANCZOS yoluyla üretip {etiket: metric} döner
+    (metric=psnr | ssim). Draft uygulanmıyorsa (PNG ya da kaynak yeterince büyük değil)
+    PSNR inf, SSIM 1.0 olur. DRAFT_MIN_PSNR / DRAFT_MIN_SSIM altı = regresyon.
+    """
+    plan = plan_renders(boyutlar, scale, settings.cascade)
+    full = _decode(p)
+    fast = _decode(p, draft_size(plan, settings))
+    report = {}
+    for chain in plan:
+        step = chain[0]
+        report[_label(step.index, labels)] = metric(_resize(fast, step.size, settings),
+                                                   full.resize(step.size, RESAMPLE))
+    return report
+
+
+def _proc_status_kb(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _band_probe(p, size: tuple[int, int], settings: RenderSettings, dst: str) -> tuple[float, float]:
+    """
+    band_benchmark alt süreci: decode + tek ölçü render/encode; (ek tepe RSS MB, saniye).
+    Linux'ta decode geçicileri sayılmasın diye tepe işareti (VmHWM) decode sonrası sıfırlanır.
+    """
+    import resource
+    im = _decode(p)
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+    base = _proc_status_kb("VmRSS") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    _save_output(_resize(im, size, settings), dst, settings.encoding)
+    elapsed = time.perf_counter() - t0
+    peak = _proc_status_kb("VmHWM") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak - base) / 1024, elapsed
+
+
+def band_benchmark(p, boyutlar=BOYUTLAR_8LI_PORTRAIT, scale: int = 5, labels=LABELS_8LI,
+                   band_rows: int = BAND_ROWS, band_min_pixels: int = BAND_MIN_PIXELS) -> dict[str, dict]:
+    """
+    Şeritli render ölçümü: band_min_pixels'i aşan her kök ölçü, tam çerçeve ve şeritli
+    yolla ayrı (spawn) süreçlerde üretilir. Tepe RSS decode sonrası taban üzerindeki artıştır
+    (MB; Linux ru_maxrss). Dönen: {etiket: {"full": {...}, "banded": {...}, "psnr": dB}}.
+    """
+    full = RenderSettings(band_rows=None)
+    banded = RenderSettings(band_rows=band_rows, band_min_pixels=band_min_pixels)
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for chain in plan_renders(boyutlar, scale):
+            step = chain[0]
+            if step.size[0] * step.size[1] < band_min_pixels:
+                continue
+            row = {}
+            for name, settings in (("full", full), ("banded", banded)):
+                dst = os.path.join(tmp, f"{name}.jpg")
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    rss, secs = pool.submit(_band_probe, p, step.size, settings, dst).result()
+                row[name] = {"peak_rss_mb": round(rss, 1), "seconds": round(secs, 3)}
+            with Image.open(os.path.join(tmp, "full.jpg")) as a, Image.open(os.path.join(tmp, "banded.jpg")) as b:
+                row["psnr"] = psnr(a, b)
+            report[_label(step.index, labels)] = row
+    return report
+
+
+def encoding_benchmark(p, boyutlar=BOYUTLAR_8LI_PORTRAIT, scale: int = 1, encodings=None) -> dict[str, dict]:
+    """
+    Profil karşılaştırması: kaynak bir kez decode edilip tüm ölçüler her profille bellekte
+    encode edilir (resize süresi hariç). Dönen: {profil: {"bytes", "seconds", "bytes_per_sec",
+    "pixels_per_sec", "size_ratio"}}; size_ratio print-max'e göre toplam çıktı boyutudur.
+    """
+    im = _decode(p)
+    outs = [im.resize((int(w * scale), int(h * scale)), RESAMPLE) for w, h in boyutlar]
+    pixels = sum(o.size[0] * o.size[1] for o in outs)
+    report = {}
+    for name in encodings or available_encodings():
+        total, t0 = 0, time.perf_counter()
+        for out in outs:
+            buf = io.BytesIO()
+            _save_output(out, buf, name)
+            total += buf.tell()
+        secs = time.perf_counter() - t0
+        report[name] = {"bytes": total, "seconds": round(secs, 3),
+                        "bytes_per_sec": int(total / secs), "pixels_per_sec": int(pixels / secs)}
+    base = report.get(DEFAULT_ENCODING, {}).get("bytes")
+    for row in report.values():
+        row["size_ratio"] = round(row["bytes"] / base, 3) if base else None
+    return report
+
+
+def quality_benchmark(p, boyutlar=BOYUTLAR_8LI_PORTRAIT, scale: int = 5, labels=LABELS_8LI) -> dict[str, dict]:
+    """
+    Kalite kademelerinin süre/kalite dengesi: her ölçü kaynaktan her kademeyle üretilir ve
+    best (LANCZOS) çıktısıyla karşılaştırılır. Dönen: {"prepare": {kademe: sn},
+    "sizes": {etiket: {kademe: {"seconds", "speedup", "psnr", "ssim"}}}}; prepare, fast
+    kademesinin kaynak keskinleştirmesidir (görsel başına bir kez).
+    """
+    im = _decode(p)
+    sources, prepare = {}, {}
+    for tier in QUALITY_TIERS:
+        t0 = time.perf_counter()
+        sources[tier] = _source(p, None, RenderSettings(quality=tier)) if tier == "fast" else im
+        prepare[tier] = round(time.perf_counter() - t0, 3) if tier == "fast" else 0.0
+    report = {}
+    for i, (w, h) in enumerate(boyutlar):
+        size = (int(w * scale), int(h * scale))
+        row, ref, ref_secs = {}, None, None
+        for tier in ("best", "standard", "fast"):
+            t0 = time.perf_counter()
+            out = sources[tier].resize(size, QUALITY_TIERS[tier])
+            secs = time.perf_counter() - t0
+            if tier == "best":
+                ref, ref_secs = out, secs
+            row[tier] = {"seconds": round(secs, 3), "speedup": round(ref_secs / secs, 2) if secs else None,
+                         "psnr": psnr(out, ref), "ssim": round(ssim(out, ref), 5)}
+        report[_label(i, labels)] = row
+    return {"prepare": prepare, "sizes": report}
+
+
+def _default_on_error(dosya_adi: str, e: Exception):
+    print(f"Hata: {dosya_adi} → {e}")
+
+def encoder_signature(settings: RenderSettings = RenderSettings()) -> str:
+    """Çıktı baytlarını etkileyen ayarların özeti (render önbelleği anahtarına girer)."""
+    prof = ENCODING_PROFILES[settings.encoding]
+    opts = ",".join(f"{k}={v}" for k, v in sorted(prof.options.items()))
+    return (f"{settings.encoding}:{prof.format.lower()}[{opts}]-{settings.quality}-cascade{int(bool(settings.cascade))}"
+            f"-draft{settings.draft_margin or 0}-gap{settings.reducing_gap or 0}"
+            f"-band{settings.band_rows or 0}@{settings.band_min_pixels}")
+
+
+def _folder_jobs(klasor_yolu, hedef_klasor) -> list[tuple[str, str, str, str]]:
+    """(dosya_adi, kaynak, alt_klasor, base) listesi."""
+    jobs = []
+    for dosya_adi in sorted(os.listdir(klasor_yolu)):
+        if not dosya_adi.lower().endswith(IZINLI_UZANTILAR):
+            continue
+        base = Path(dosya_adi).stem
+        jobs.append((dosya_adi, os.path.join(klasor_yolu, dosya_adi), os.path.join(hedef_klasor, base), base))
+    return jobs
+
+
+def _dsts(alt_klasor: str, base: str, n: int, labels, ext: str = ".jpg") -> dict[int, str]:
+    return {i: os.path.join(alt_klasor, f"{_label(i, labels)} {base}{ext}") for i in range(n)}
+
+
+def iter_render_folder(
+    klasor_yolu,
     boyutlar: list[tuple[int, int]],
-    hedef_klasor: str,
-    scale: int = 5
-):
-    scale = max(1, min(int(scale), 5))
+    hedef_klasor,
+    scale: int = 5,
+    *,
+    executor: str = "thread",
+    workers: int | None = None,
+    labels=LABELS_8LI,
+    on_error=None,
+    cascade: bool = True,
+    draft_margin: float | None = DRAFT_MARGIN,
+    reducing_gap: float | None = REDUCING_GAP,
+    band_rows: int | None = BAND_ROWS,
+    band_min_pixels: int = BAND_MIN_PIXELS,
+    encoding: str = DEFAULT_ENCODING,
+    quality: str = DEFAULT_QUALITY,
+    cache=None,
+    orientation: str | None = None,
+    pool=None,
+    timer=None,
+) -> Iterator[str]:
+    """
+    klasor_yolu içindeki her görsel için hedef_klasor/<basename>/ altında çıktı üretir
+    ve her çıktının yolunu hazır olduğu anda yield eder (paketleyici beklemeden başlar).
+    - executor='thread': her görsel bir kez decode edilir, ölçü zincirleri havuza
+      dağıtılır (Pillow resize/encode sırasında GIL'i bırakır).
+    - executor='process': her görsel ayrı bir süreçte decode + tüm ölçüler.
+    - executor='serial' ya da workers=1: eski davranış, tek çekirdek.
+    cascade=True ise ölçüler plan_renders zincirleriyle üretilir (bkz. plan_renders);
+    draft_margin / reducing_gap decode-zamanı küçültmeyi (bkz. DRAFT_MARGIN), band_rows /
+    band_min_pixels çok büyük çıktıların şeritli üretimini (bkz. BAND_MIN_PIXELS) ayarlar;
+    encoding çıktı kodlama profili (bkz. ENCODING_PROFILES), quality yeniden örnekleme
+    kademesidir (bkz. QUALITY_TIERS).
+    cache (services.cache.RenderCache) verilirse önbellekteki görseller render edilmez.
+    pool (concurrent.futures.Executor, örn. services.scheduler.UserPool) verilirse
+    executor='thread' görevleri kendi havuzu yerine ona gönderilir.
+    timer(stage, saniye, ölçü sırası | None) verilirse decode / resize / encode süreleri
+    bildirilir (havuz thread'lerinden çağrılabilir; process motorunda bildirilmez).
+    Hatalar on_error(dosya_adi, exc) ile bildirilir (her zaman çağıran thread'de).
+    """
+    on_error = on_error or _default_on_error
     os.makedirs(hedef_klasor, exist_ok=True)
+    jobs = _folder_jobs(klasor_yolu, hedef_klasor)
+    settings = RenderSettings(cascade, draft_margin, reducing_gap, band_rows, band_min_pixels, encoding, quality)
+    opts = dict(executor=executor, workers=workers, labels=labels, on_error=on_error, settings=settings, pool=pool,
+                timer=timer)
+    if cache is None:
+        yield from _iter_jobs(jobs, boyutlar, scale, **opts)
+        return
+    if orientation is None:
+        orientation = "landscape" if boyutlar and boyutlar[0][0] > boyutlar[0][1] else "portrait"
+    yield from _iter_cached(jobs, boyutlar, scale, cache, orientation, **opts)
+
 
-    for dosya_adi in os.listdir(klasor_yolu):
-        if not dosya_adi.lower().endswith((".png", ".jpg", ".jpeg")):
+def _iter_cached(jobs, boyutlar, scale, cache, orientation, *, labels, on_error, settings, **opts) -> Iterator[str]:
+    """
+    Önbellek sarmalayıcısı:
+    1) her kaynağın anahtarı hesaplanır; aynı istekteki kopyalar tek render'a indirgenir
+    2) önbellekte olanlar hard link ile çıktıya bağlanır (render yok)
+    3) başka bir isteğin render ettiği anahtarlar (single-flight) kendi işimiz bittikten
+       sonra beklenir; lider başarısız olduysa render'ı biz üstleniriz
+    4) render edilen görselin tüm ölçüleri bitince önbelleğe yazılır
+    """
+    encoder = encoder_signature(settings)
+    n = len(boyutlar)
+    ext = output_ext(settings.encoding)
+    groups: dict[str, list] = {}
+    for job in jobs:
+        dosya_adi, p = job[0], job[1]
+        try:
+            key = cache.make_key(sha256_file(p), orientation, scale, encoder)
+        except Exception as e:
+            on_error(dosya_adi, e)
             continue
-        p = os.path.join(klasor_yolu, dosya_adi)
+        groups.setdefault(key, []).append(job)
+
+    def _link_from(key: str, group) -> list[str] | None:
+        """Grubun tüm çıktılarını girdiye bağlar (evict'e karşı kilit altında); isabet yoksa None."""
+        targets = []
+        for dosya_adi, _p, alt_klasor, base in group:
+            os.makedirs(alt_klasor, exist_ok=True)
+            dsts = _dsts(alt_klasor, base, n, labels, ext)
+            targets += [(size, dsts[i]) for i, size in enumerate(boyutlar)]
+        return [dst for _, dst in targets] if cache.link_hit(key, boyutlar, targets, ext) else None
+
+    led, waiting = [], []
+    try:
+        for key, group in groups.items():
+            linked = _link_from(key, group)
+            if linked is not None:
+                yield from linked
+            elif cache.begin(key):
+                led.append(key)
+            else:
+                waiting.append(key)
+
+        while led or waiting:
+            if led:
+                yield from _render_and_store(led, groups, boyutlar, scale, cache, labels, on_error, settings, opts)
+                for key in led:
+                    cache.end(key)
+                led = []
+            still = []
+            for key in waiting:
+                cache.wait(key)
+                linked = _link_from(key, groups[key])
+                if linked is not None:
+                    yield from linked
+                elif cache.begin(key):
+                    led.append(key)       # lider başarısız oldu; render bizde
+                else:
+                    still.append(key)
+            waiting = still
+    finally:
+        for key in led:
+            cache.end(key)
+
+
+def _render_and_store(keys, groups, boyutlar, scale, cache, labels, on_error, settings, opts) -> Iterator[str]:
+    """Lider anahtarları render eder; görselin tüm ölçüleri çıkınca önbelleğe koyar, kopyaları bağlar."""
+    n = len(boyutlar)
+    leaders = {groups[key][0][2]: key for key in keys}   # alt_klasor -> key
+    done: dict[str, int] = {}
+    for path in _iter_jobs([groups[key][0] for key in keys], boyutlar, scale,
+                           labels=labels, on_error=on_error, settings=settings, **opts):
+        yield path
+        alt_klasor = os.path.dirname(path)
+        done[alt_klasor] = done.get(alt_klasor, 0) + 1
+        if done[alt_klasor] != n or alt_klasor not in leaders:
+            continue
+        key = leaders[alt_klasor]
+        dosya_adi, _p, _alt, base = groups[key][0]
+        dsts = _dsts(alt_klasor, base, n, labels, output_ext(settings.encoding))
+        files = {tuple(size): dsts[i] for i, size in enumerate(boyutlar)}
         try:
-            with Image.open(p) as im:
-                if im.mode not in ("RGB", "L"):
-                    im = im.convert("RGB")
-                base = Path(dosya_adi).stem
-                alt_klasor = os.path.join(hedef_klasor, base)
-                os.makedirs(alt_klasor, exist_ok=True)
-                for index, (w, h) in enumerate(boyutlar):
-                    out_w, out_h = w * scale, h * scale
-                    out = im.resize((out_w, out_h), RESAMPLE)
-                    label = LABELS_8LI[index] if index < len(LABELS_8LI) else f"size{index+1}"
-                    dst = os.path.join(alt_klasor, f"{label} {base}.jpg")
-                    out.save(dst, "JPEG", quality=100, dpi=(300, 300))
+            cache.put(key, files, output_ext(settings.encoding))
         except Exception as e:
-            print(f"Hata: {dosya_adi} → {e}")
+            on_error(dosya_adi, e)
+        for dup_name, _dp, dup_alt, dup_base in groups[key][1:]:
+            os.makedirs(dup_alt, exist_ok=True)
+            dup_dsts = _dsts(dup_alt, dup_base, n, labels, output_ext(settings.encoding))
+            for i in range(n):
+                link_or_copy(dsts[i], dup_dsts[i])
+                yield dup_dsts[i]
+
+
+def _iter_jobs(
+    jobs,
+    boyutlar,
+    scale: int,
+    *,
+    executor: str = "thread",
+    workers: int | None = None,
+    labels=LABELS_8LI,
+    on_error=None,
+    settings: RenderSettings = RenderSettings(),
+    pool=None,
+    timer=None,
+) -> Iterator[str]:
+    """
+    Render çekirdeği: jobs = [(dosya_adi, kaynak, alt_klasor, base)]. pool yalnızca
+    executor='thread' yolunda kullanılır (process/serial kendi düzenini korur); timer
+    process yolunda kullanılmaz (süreler işçi süreçte kalır).
+    """
+    on_error = on_error or _default_on_error
+    workers = int(workers or 0) or (os.cpu_count() or 1)
+    if executor not in EXECUTORS:
+        executor = "thread"
+
+    plan = plan_renders(boyutlar, scale, settings.cascade)
+    draft = draft_size(plan, settings)
+
+    if executor == "serial" or (workers == 1 and pool is None):
+        for dosya_adi, p, alt_klasor, base in jobs:
+            try:
+                im = _source(p, draft, settings, timer)
+                os.makedirs(alt_klasor, exist_ok=True)
+                dsts = _dsts(alt_klasor, base, len(boyutlar), labels, output_ext(settings.encoding))
+                for chain in plan:
+                    yield from _render_chain(im, chain, dsts, settings, timer)
+            except Exception as e:
+                on_error(dosya_adi, e)
+        return
+
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            pending = {pool.submit(_render_image, p, boyutlar, alt_klasor, base, scale, labels, settings): dosya_adi
+                       for dosya_adi, p, alt_klasor, base in jobs}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    dosya_adi = pending.pop(fut)
+                    try:
+                        yield from fut.result()
+                    except Exception as e:
+                        on_error(dosya_adi, e)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return
+
+    # thread: decode'lar paralel, her decode bitince zincir görevleri kuyruğa. Aynı anda en
+    # fazla `workers` görsel açıktır; bir görselin zincirleri bitince sıradaki decode verilir
+    # (paylaşılan havuzda görsel başına görevler diğer kullanıcılarınkiyle harmanlanır).
+    own_pool = pool is None
+    pool = pool or ThreadPoolExecutor(max_workers=workers)
+    pending, open_chains, failed = {}, {}, set()
+    queue = iter(enumerate(jobs))
+
+    def _fill():
+        while len(open_chains) < workers:
+            nxt = next(queue, None)
+            if nxt is None:
+                return
+            i, (dosya_adi, p, alt_klasor, base) = nxt
+            open_chains[i] = len(plan)
+            pending[pool.submit(_source, p, draft, settings, timer)] = ("decode", i, dosya_adi, alt_klasor, base)
+
+    def _settle(i: int, n: int):
+        open_chains[i] -= n
+        if open_chains[i] <= 0:
+            del open_chains[i]
+
+    try:
+        _fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, i, dosya_adi, alt_klasor, base = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    if dosya_adi not in failed:
+                        failed.add(dosya_adi)
+                        on_error(dosya_adi, e)
+                    _settle(i, len(plan) if kind == "decode" else 1)
+                    continue
+                if kind == "chain":
+                    _settle(i, 1)
+                    yield from result
+                    continue
+                os.makedirs(alt_klasor, exist_ok=True)
+                dsts = _dsts(alt_klasor, base, len(boyutlar), labels, output_ext(settings.encoding))
+                for chain in plan:
+                    pending[pool.submit(_render_chain, result, chain, dsts, settings, timer)] = (
+                        "chain", i, dosya_adi, alt_klasor, base)
+            _fill()
+    finally:
+        if own_pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            for fut in pending:
+                fut.cancel()
+            wait(pending)
+
+
+def iter_render_streams(
+    sources,
+    boyutlar: list[tuple[int, int]],
+    scale: int = 5,
+    *,
+    executor: str = "thread",
+    workers: int | None = None,
+    labels=LABELS_8LI,
+    on_error=None,
+    cascade: bool = True,
+    draft_margin: float | None = DRAFT_MARGIN,
+    reducing_gap: float | None = REDUCING_GAP,
+    band_rows: int | None = BAND_ROWS,
+    band_min_pixels: int = BAND_MIN_PIXELS,
+    encoding: str = DEFAULT_ENCODING,
+    quality: str = DEFAULT_QUALITY,
+    cache=None,
+    orientation: str | None = None,
+    spill_bytes: int = 16 * 1024 * 1024,
+    spill_dir=None,
+    pool=None,
+    timer=None,
+) -> Iterator[tuple[str, object]]:
+    """
+    Geçici dosyasız render yolu: sources = [(dosya_adi, seek edilebilir dosya nesnesi)].
+    Kaynak doğrudan akıştan decode edilir, her çıktı bir SpooledTemporaryFile'a encode
+    edilir (spill_bytes'ı aşan çıktı spill_dir'e taşar) ve (arcname, dosya nesnesi)
+    olarak verilir; packing.stream_zip bunları okuyup kapatır. Önbellek isabetinde
+    (arcname, önbellek dosyasına açık dosya nesnesi) verilir (açık dosya, eşzamanlı evict
+    girdiyi silse de okunabilir).
+    Görseller sırayla işlenir (bellekte tek decode), bir görselin zincirleri havuzda
+    paraleldir. executor her zaman thread'dir (bellek içi çıktılar süreçler arası taşınmaz);
+    pool verilirse zincirler ona gönderilir; timer için bkz. iter_render_folder.
+    """
+    on_error = on_error or _default_on_error
+    workers = int(workers or 0) or (os.cpu_count() or 1)
+    if orientation is None:
+        orientation = "landscape" if boyutlar and boyutlar[0][0] > boyutlar[0][1] else "portrait"
+    settings = RenderSettings(cascade, draft_margin, reducing_gap, band_rows, band_min_pixels, encoding, quality)
+    encoder = encoder_signature(settings)
+    plan = plan_renders(boyutlar, scale, settings.cascade)
+    draft = draft_size(plan, settings)
+    n = len(boyutlar)
+    ext = output_ext(settings.encoding)
+
+    def _arcnames(base):
+        return {i: f"{base}/{_label(i, labels)} {base}{ext}" for i in range(n)}
+
+    def _render(dosya_adi, stream, writer) -> Iterator[tuple[str, object]]:
+        stream.seek(0)
+        im = _source(stream, draft, settings, timer)
+        base = Path(dosya_adi).stem
+        names = _arcnames(base)
+        bufs = {i: tempfile.SpooledTemporaryFile(max_size=spill_bytes, dir=spill_dir) for i in range(n)}
+        pending = {pool.submit(_render_chain, im, chain, bufs, settings, timer): chain for chain in plan}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    chain = pending.pop(fut)
+                    fut.result()
+                    for step in chain:
+                        buf = bufs.pop(step.index)
+                        if writer:
+                            writer.add(boyutlar[step.index], buf)
+                        buf.seek(0)
+                        yield names[step.index], buf
+        finally:
+            # hâlâ çalışan zincirler bufs'a yazıyor olabilir: kapatmadan önce bitmelerini bekle
+            for fut in pending:
+                fut.cancel()
+            wait(pending)
+            for buf in bufs.values():
+                buf.close()
+
+    own_pool = pool is None
+    pool = pool or ThreadPoolExecutor(max_workers=workers)
+    try:
+        for dosya_adi, stream in sources:
+            try:
+                if cache is None:
+                    yield from _render(dosya_adi, stream, None)
+                    continue
+                key = cache.make_key(sha256_file(stream), orientation, scale, encoder)
+                hit = cache.open_hit(key, boyutlar, ext)
+                if not hit and not cache.begin(key):
+                    cache.wait(key)     # aynı anahtar başka istekte render ediliyor
+                    hit = cache.open_hit(key, boyutlar, ext)
+                    if not hit and not cache.begin(key):
+                        yield from _render(dosya_adi, stream, None)
+                        continue
+                if hit:
+                    names = _arcnames(Path(dosya_adi).stem)
+                    try:
+                        for i in range(n):
+                            fh, hit[i] = hit[i], None
+                            yield names[i], fh      # stream_zip okuyup kapatır
+                    finally:
+                        for fh in hit:
+                            if fh:
+                                fh.close()
+                    continue
+                writer = cache.writer(key, ext)
+                try:
+                    yield from _render(dosya_adi, stream, writer)
+                    writer.commit()
+                finally:
+                    writer.abort()
+                    cache.end(key)
+            except Exception as e:
+                on_error(dosya_adi, e)
+    finally:
+        if own_pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_render_jobs(
+    jobs,
+    boyutlar: list[tuple[int, int]],
+    scale: int = 5,
+    *,
+    executor: str = "thread",
+    workers: int | None = None,
+    labels=LABELS_8LI,
+    on_error=None,
+    cascade: bool = True,
+    draft_margin: float | None = DRAFT_MARGIN,
+    reducing_gap: float | None = REDUCING_GAP,
+    band_rows: int | None = BAND_ROWS,
+    band_min_pixels: int = BAND_MIN_PIXELS,
+    encoding: str = DEFAULT_ENCODING,
+    quality: str = DEFAULT_QUALITY,
+    timer=None,
+) -> Iterator[str]:
+    """
+    Hazır iş listesinden render: jobs = [(dosya_adi, kaynak yolu, alt_klasor, base)];
+    çıktılar alt_klasor/"<etiket> <base><ext>" olarak yazılır (web yoluyla aynı adlar).
+    Klasör düzenini çağıran belirler (örn. app.batch'in özyinelemeli ağacı).
+    """
+    settings = RenderSettings(cascade, draft_margin, reducing_gap, band_rows, band_min_pixels, encoding, quality)
+    yield from _iter_jobs(jobs, boyutlar, scale, executor=executor, workers=workers, labels=labels,
+                          on_error=on_error, settings=settings, timer=timer)
+
+
+def output_paths(alt_klasor: str, base: str, n: int, labels=LABELS_8LI, encoding: str = DEFAULT_ENCODING) -> list[str]:
+    """Bir görselin n ölçüsünün çıktı yolları (render sırasından bağımsız, ölçü sırasıyla)."""
+    dsts = _dsts(alt_klasor, base, n, labels, output_ext(encoding))
+    return [dsts[i] for i in range(n)]
+
+
+def render_folder(klasor_yolu, boyutlar: list[tuple[int, int]], hedef_klasor, scale: int = 5, **kwargs) -> int:
+    """iter_render_folder'ı sonuna kadar çalıştırır; üretilen dosya sayısını döner."""
+    return sum(1 for _ in iter_render_folder(klasor_yolu, boyutlar, hedef_klasor, scale, **kwargs))
+
+def resimleri_numaralandirarak_kaydet(
+    klasor_yolu: str,
+    boyutlar: list[tuple[int, int]],
+    hedef_klasor: str,
+    scale: int = 5,
+    executor: str = "thread",
+    workers: int | None = None,
+    cascade: bool = True,
+    draft_margin: float | None = DRAFT_MARGIN,
+    reducing_gap: float | None = REDUCING_GAP,
+    band_rows: int | None = BAND_ROWS,
+    band_min_pixels: int = BAND_MIN_PIXELS,
+    encoding: str = DEFAULT_ENCODING,
+    quality: str = DEFAULT_QUALITY,
+):
+    """Tek klasör, hata çıktısı print. Büyük/özyinelemeli toplu işler için: python -m app.batch"""
+    scale = max(1, min(int(scale), 5))
+    return render_folder(klasor_yolu, boyutlar, hedef_klasor, scale,
+                         executor=executor, workers=workers, cascade=cascade,
+                         draft_margin=draft_margin, reducing_gap=reducing_gap,
+                         band_rows=band_rows, band_min_pixels=band_min_pixels, encoding=encoding,
+                         quality=quality)
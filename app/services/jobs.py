@@ -0,0 +1,411 @@
+# app/services/jobs.py
+import json, os, shutil, socket, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import and_, func, or_, select, update
+
+from .. import db
+from ..models import User, RenderJob
+from .admission import get_memory_budget
+from .billing import charge_upload
+from .cache import get_render_cache
+from .imaging import (
+    LABELS_8LI, IZINLI_UZANTILAR, DRAFT_MARGIN, REDUCING_GAP, BAND_ROWS, BAND_MIN_PIXELS, DEFAULT_ENCODING,
+    DEFAULT_QUALITY, get_sizes, iter_render_folder, probe_dims, estimate_peak_bytes, resolve_encoding,
+    resolve_quality,
+)
+from .scheduler import user_pool
+from .settings import get_setting
+from .timing import StageTimer, publish
+from .packing import stream_zip_from_folder
+from .previews import write_job_previews
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# app_setting anahtarları: admin panelinden seçilen varsayılan kodlama profili ve
+# zorlanan kalite kademesi (boş => zorlama yok)
+ENCODING_SETTING = "imaging.encoding_profile"
+QUALITY_FORCE_SETTING = "imaging.quality_force"
+
+
+def default_encoding(app) -> str:
+    """Admin ayarı > IMAGING_ENCODING_PROFILE > print-max (uygulama bağlamı gerekir)."""
+    fallback = resolve_encoding(app.config.get("IMAGING_ENCODING_PROFILE"), DEFAULT_ENCODING)
+    return resolve_encoding(get_setting(ENCODING_SETTING), fallback)
+
+
+def forced_quality(app) -> str | None:
+    """Admin'in zorladığı kalite kademesi; yoksa None (uygulama bağlamı gerekir)."""
+    return resolve_quality(get_setting(QUALITY_FORCE_SETTING), None)
+
+
+def quality_for(app, requested=None) -> str:
+    """Zorlanan kademe > istekteki kademe > IMAGING_QUALITY > best."""
+    default = resolve_quality(app.config.get("IMAGING_QUALITY"), DEFAULT_QUALITY)
+    return forced_quality(app) or resolve_quality(requested, default)
+
+
+def render_kwargs(app) -> dict:
+    """
+    Uygulama ayarlarından render motoru parametreleri (istek dışı thread'lerde de
+    kullanılabilir; kodlama profili DB'den okunduğu için uygulama bağlamı gerekir).
+    """
+    cfg = app.config
+    logger = app.logger
+
+    def _on_error(name, e):
+        logger.error(f"[UPLOAD] {name} işlenemedi: {e}")
+
+    return dict(
+        executor=cfg.get("IMAGING_EXECUTOR", "thread"),
+        workers=cfg.get("IMAGING_WORKERS", 0),
+        labels=LABELS_8LI,
+        on_error=_on_error,
+        cascade=cfg.get("IMAGING_CASCADE", True),
+        draft_margin=cfg.get("IMAGING_DRAFT_MARGIN", DRAFT_MARGIN) or None,
+        reducing_gap=cfg.get("IMAGING_REDUCING_GAP", REDUCING_GAP) or None,
+        band_rows=cfg.get("IMAGING_BAND_ROWS", BAND_ROWS) or None,
+        band_min_pixels=cfg.get("IMAGING_BAND_MIN_PIXELS", BAND_MIN_PIXELS),
+        encoding=default_encoding(app),
+        quality=quality_for(app),
+        cache=get_render_cache(app),
+    )
+
+
+def job_sizes(job: RenderJob) -> tuple[list[tuple[int, int]], list[str]]:
+    """İşin ölçü planı: (ölçüler, etiketler); eski kayıtlarda 8'li tablo."""
+    if not job.sizes:
+        return list(get_sizes(job.orientation)), list(LABELS_8LI)
+    rows = json.loads(job.sizes)
+    return [(int(w), int(h)) for _, w, h in rows], [label for label, _, _ in rows]
+
+
+def storage_root(app) -> Path:
+    """İş girdileri/çıktıları: RENDER_STORAGE_DIR (işçilerle paylaşılan disk) ya da instance."""
+    return Path(app.config.get("RENDER_STORAGE_DIR") or app.instance_path)
+
+
+def job_dirs(app, job_id: str) -> tuple[Path, Path, Path]:
+    """(girdi klasörü, çıktı klasörü, zip yolu) — hepsi storage_root altında."""
+    inst = storage_root(app)
+    uploads_dir = inst / app.config.get("UPLOADS_DIRNAME", "uploads")
+    outputs_dir = inst / app.config.get("OUTPUTS_DIRNAME", "outputs")
+    return uploads_dir / job_id, outputs_dir / job_id, outputs_dir / f"{job_id}.zip"
+
+
+def preview_dir(app, job_id: str) -> Path:
+    """İşin önizleme klasörü (paketin yanında, paketle birlikte silinir)."""
+    _, job_out, _ = job_dirs(app, job_id)
+    return job_out.with_name(f"{job_id}.previews")
+
+
+def estimate_job_bytes(app, sources, sizes, scale: int, sequential: bool = False) -> int:
+    """
+    Kaynakların başlıklarından (decode etmeden) tepe piksel belleği tahmini.
+    sources: job_in klasörü ya da dosya nesneleri listesi (bellek içi yol, sequential=True).
+    """
+    if isinstance(sources, Path):
+        sources = sorted(p for p in sources.iterdir() if p.name.lower().endswith(IZINLI_UZANTILAR))
+    return estimate_peak_bytes(
+        probe_dims(sources), sizes, scale,
+        cascade=app.config.get("IMAGING_CASCADE", True),
+        workers=app.config.get("IMAGING_WORKERS", 0),
+        sequential=sequential,
+        band_rows=app.config.get("IMAGING_BAND_ROWS", BAND_ROWS) or None,
+        band_min_pixels=app.config.get("IMAGING_BAND_MIN_PIXELS", BAND_MIN_PIXELS),
+    )
+
+
+def admit(app, cost: int, wait: bool = False):
+    """
+    Bellek bütçesinden pay ister. wait=False (senkron istek): IMAGING_QUEUE_LIMIT ve
+    IMAGING_ADMISSION_TIMEOUT uygulanır, sığmazsa None (=> 503). wait=True (arka plan işi):
+    yer açılana kadar bekler.
+    """
+    budget = get_memory_budget(app)
+    if wait:
+        return budget.acquire(cost)
+    return budget.acquire(
+        cost,
+        timeout=float(app.config.get("IMAGING_ADMISSION_TIMEOUT", 30)),
+        queue_limit=int(app.config.get("IMAGING_QUEUE_LIMIT", 8)),
+    )
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _get_executor(app) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, int(app.config.get("RENDER_JOB_WORKERS", 2)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render-job")
+        return _executor
+
+
+def submit_render_job(app, job_id: str):
+    """
+    Kaydı yapılmış (status=queued) işi başlatır. RENDER_JOB_MODE=inline ise bu sürecin arka
+    plan havuzu işi hemen üstlenir; queue ise iş tabloda bekler ve `python -m app.worker`
+    süreçlerinden biri alır.
+    """
+    if app.config.get("RENDER_JOB_MODE", "inline") == "queue":
+        return
+    _get_executor(app).submit(_run_job, app, job_id)
+
+
+def _run_job(app, job_id: str):
+    with app.app_context():
+        try:
+            job = claim_job(app, worker_id("web"), job_id)
+            if job:
+                run_claimed_job(app, job)
+        except Exception:
+            app.logger.exception(f"[JOB] {job_id} beklenmeyen hata")
+        finally:
+            db.session.remove()
+
+
+# ---------------------------------------------------------------------------
+# Kiralama (lease): iş tablosu aynı zamanda kuyruktur. İşçi, işi koşullu UPDATE ile
+# üstlenir (aynı satırı iki işçi alamaz), çalışırken kirayı heartbeat ile uzatır; kirası
+# dolan (çöken/donan işçinin) "running" işi başka bir işçi yeniden üstlenir.
+
+def worker_id(prefix: str = "worker") -> str:
+    """host:pid:thread — kiranın sahibi."""
+    return f"{prefix}:{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"[:64]
+
+
+def lease_seconds(app) -> float:
+    return float(app.config.get("RENDER_LEASE_SECONDS", 60))
+
+
+def _claimable(now: datetime):
+    return or_(
+        RenderJob.status == "queued",
+        and_(RenderJob.status == "running",
+             or_(RenderJob.lease_expires_at.is_(None), RenderJob.lease_expires_at < now)),
+    )
+
+
+def claim_job(app, owner: str, job_id: str | None = None) -> RenderJob | None:
+    """
+    Bekleyen (ya da kirası dolmuş) en eski işi owner adına üstlenir; job_id verilirse
+    yalnız o işi dener. Alınamazsa None.
+    """
+    now = datetime.utcnow()
+    if job_id:
+        candidates = [job_id]
+    else:
+        candidates = db.session.execute(
+            select(RenderJob.id).where(_claimable(now)).order_by(RenderJob.created_at).limit(5)
+        ).scalars().all()
+    for jid in candidates:
+        res = db.session.execute(
+            update(RenderJob)
+            .where(RenderJob.id == jid, _claimable(now))
+            .values(status="running", lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds(app)),
+                    attempts=RenderJob.attempts + 1,
+                    started_at=func.coalesce(RenderJob.started_at, now))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if res.rowcount == 1:
+            job = db.session.get(RenderJob, jid)
+            db.session.refresh(job)
+            return job
+    return None
+
+
+def renew_lease(app, job_id: str, owner: str) -> bool:
+    """Kirayı uzatır; iş artık bu işçide değilse False."""
+    res = db.session.execute(
+        update(RenderJob)
+        .where(RenderJob.id == job_id, RenderJob.lease_owner == owner, RenderJob.status == "running")
+        .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds(app)))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return res.rowcount == 1
+
+
+class LeaseLost(Exception):
+    """Kira başka bir işçiye geçti; bu işçi işi bırakır (çıktılara dokunmaz)."""
+
+
+class _Heartbeat(threading.Thread):
+    """Kirayı RENDER_LEASE_SECONDS / 3 aralıkla uzatır; kaybedilirse lost set edilir."""
+
+    def __init__(self, app, job_id: str, owner: str):
+        super().__init__(name=f"lease-{job_id[:8]}", daemon=True)
+        self.app, self.job_id, self.owner = app, job_id, owner
+        self.interval = max(1.0, lease_seconds(app) / 3)
+        self.lost = threading.Event()
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    if not renew_lease(self.app, self.job_id, self.owner):
+                        self.lost.set()
+                        return
+                except Exception as e:
+                    # geçici DB hatası (örn. SQLite kilidi): kira dolmadan tekrar denenir
+                    db.session.rollback()
+                    self.app.logger.error(f"[JOB] {self.job_id} heartbeat hatası: {e}")
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        self._halt.set()
+
+    def check(self):
+        if self.lost.is_set():
+            raise LeaseLost(self.job_id)
+
+
+def _fail(job_id: str, owner: str, msg: str):
+    """İşi failed yapar (kira hâlâ owner'daysa)."""
+    db.session.rollback()
+    db.session.execute(
+        update(RenderJob)
+        .where(RenderJob.id == job_id, RenderJob.lease_owner == owner, RenderJob.status == "running")
+        .values(status="failed", error=msg, finished_at=datetime.utcnow(), lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def run_claimed_job(app, job: RenderJob):
+    """
+    Üstlenilmiş işi render eder, paketler ve token düşer. Kira kaybedilirse (işçi donup
+    iş başkasına geçtiyse) sessizce bırakır; girdiler/çıktılar yeni sahibe kalır.
+    """
+    job_id, owner = job.id, job.lease_owner
+    job_in, job_out, zip_path = job_dirs(app, job_id)
+    if job.attempts > int(app.config.get("RENDER_MAX_ATTEMPTS", 3)):
+        _fail(job_id, owner, "İşleme hatası (deneme sınırı)")
+        shutil.rmtree(job_in, ignore_errors=True)
+        shutil.rmtree(job_out, ignore_errors=True)
+        shutil.rmtree(preview_dir(app, job_id), ignore_errors=True)
+        return
+
+    heartbeat = _Heartbeat(app, job_id, owner)
+    heartbeat.start()
+    # Önceki (çöken) denemeden kalan yarım çıktılar temizlenir, ilerleme sıfırlanır
+    shutil.rmtree(job_out, ignore_errors=True)
+    progress = {name: 0 for name in json.loads(job.progress or "{}")}
+    lease = None
+    lost = False
+    timer = StageTimer(scale=job.scale)
+    try:
+        sizes, labels = job_sizes(job)
+        timer.labels = labels
+        job_out.mkdir(parents=True, exist_ok=True)
+        # Önizlemeler (draft decode, ucuz): bellek kabulünü beklemeden, render'dan önce
+        try:
+            with timer.stage("previews"):
+                write_job_previews(app, job_in, preview_dir(app, job_id), sizes, labels)
+        except Exception as e:
+            app.logger.error(f"[JOB] {job_id} önizleme hatası: {e}")
+        heartbeat.check()
+        with timer.stage("admit"):
+            lease = admit(app, estimate_job_bytes(app, job_in, sizes, job.scale), wait=True)
+
+        # Render: her çıktı bittikçe görsel bazında ilerlemeyi yaz
+        produced = []
+        opts = dict(render_kwargs(app), labels=labels)
+        if job.encoding:
+            opts["encoding"] = resolve_encoding(job.encoding, opts["encoding"])
+        opts["quality"] = quality_for(app, job.quality)   # zorlama iş başladığı anda uygulanır
+        opts["pool"] = user_pool(app, job.user_id)         # adil zamanlayıcı (kullanıcı bazında)
+        opts["timer"] = timer
+        with timer.stage("render"):
+            for path in iter_render_folder(job_in, sizes, job_out, job.scale, **opts):
+                heartbeat.check()
+                produced.append(path)
+                base = Path(path).parent.name
+                progress[base] = progress.get(base, 0) + 1
+                job.progress = json.dumps(progress)
+                db.session.commit()
+
+        if not produced:
+            _fail(job_id, owner, "Hiçbir görsel işlenemedi")
+            return
+
+        # Paket: diske akış halinde yaz (bellekte tüm ZIP tutulmaz)
+        tmp = zip_path.with_suffix(f".{uuid.uuid4().hex[:8]}.part")
+        with timer.stage("zip"), open(tmp, "wb") as fh:
+            for chunk in stream_zip_from_folder(job_out, produced):
+                fh.write(chunk)
+        heartbeat.check()
+        tmp.replace(zip_path)
+
+        # Durum (kira koşuluyla) + token düş + audit log: tek transaction, yalnız başarılı tamamlanmada
+        t_commit = time.perf_counter()
+        done = db.session.execute(
+            update(RenderJob)
+            .where(RenderJob.id == job_id, RenderJob.lease_owner == owner, RenderJob.status == "running")
+            .values(status="done", finished_at=datetime.utcnow(), lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        if done.rowcount != 1:
+            raise LeaseLost(job_id)
+        user = db.session.get(User, job.user_id)
+        tokens = job.files if job.tokens is None else job.tokens
+        ok, msg = charge_upload(user, tokens, files=job.files, orientation=job.orientation,
+                                scale=job.scale, sizes=labels if job.sizes else None, commit=False)
+        if not ok:
+            zip_path.unlink(missing_ok=True)
+            _fail(job_id, owner, msg)
+            return
+        db.session.commit()
+        timer("commit", time.perf_counter() - t_commit)
+        publish(app, timer, "job", job_id, files=job.files, attempts=job.attempts)
+    except LeaseLost:
+        lost = True
+        db.session.rollback()
+        app.logger.error(f"[JOB] {job_id} kirası başka işçiye geçti, bırakıldı ({owner})")
+    except Exception:
+        app.logger.exception(f"[JOB] {job_id} işleme hatası")
+        zip_path.unlink(missing_ok=True)
+        _fail(job_id, owner, "İşleme hatası")
+    finally:
+        heartbeat.stop()
+        if lease:
+            lease.release()
+        if not lost:
+            shutil.rmtree(job_in, ignore_errors=True)
+            shutil.rmtree(job_out, ignore_errors=True)
+
+
+def job_status(job: RenderJob) -> dict:
+    """Durum uç noktası için JSON gövdesi (görsel bazında ilerleme dahil)."""
+    sizes, labels = job_sizes(job)
+    per_image = len(sizes)
+    progress = json.loads(job.progress or "{}")
+    images = [{"name": name, "done": int(done), "total": per_image} for name, done in progress.items()]
+    return {
+        "id": job.id,
+        "status": job.status,
+        "files": job.files,
+        "orientation": job.orientation,
+        "scale": job.scale,
+        "encoding": job.encoding,
+        "quality": job.quality,
+        "sizes": labels,
+        "tokens": job.files if job.tokens is None else job.tokens,
+        "images": images,
+        "done": sum(i["done"] for i in images),
+        "total": per_image * len(images),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,164 @@
+# app/services/ledger.py
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..models import AuditEvent, UserLedger
+from . import audit  # noqa: tipli kolon kancası bu modülünkinden önce kayıtlı olmalı
+
+# user_ledger, token hareketli audit_event yazımlarıyla AYNI transaction'da güncellenir:
+# oturum flush edilmeden önce yeni AuditEvent'ler kullanıcı başına toplanır ve tek bir
+# atomik upsert (kolon = kolon + delta) yazılır; flush/commit başarısız olursa ikisi birlikte
+# geri alınır. bulk_save_objects / ham SQL ile yazılan olaylar kancadan geçmez — bunlar için
+# rebuild_ledger (python -m app.ledger rebuild) kullanılır.
+LEDGER_EVENTS = ("token_spent", "token_purchase", "daily_claim", "reward_claim", "tier_claim")
+_FIELDS = ("spent", "purchased", "daily_claims", "reward", "tiers_claimed")
+
+# audit_event'ten yeniden hesaplama (rebuild ve tutarlılık kontrolü aynı tanımı kullanır)
+_AGGREGATE_SQL = """
+    SELECT user_id,
+           COALESCE(SUM(CASE WHEN event='token_spent'    THEN tokens END),0) AS spent,
+           COALESCE(SUM(CASE WHEN event='token_purchase' THEN tokens END),0) AS purchased,
+           SUM(CASE WHEN event='daily_claim' THEN 1 ELSE 0 END)               AS daily_claims,
+           COALESCE(SUM(CASE WHEN event='reward_claim'   THEN tokens END),0) AS reward
+    FROM audit_event
+    WHERE user_id IS NOT NULL AND event IN ('token_spent','token_purchase','daily_claim','reward_claim') {extra}
+    GROUP BY user_id
+"""
+_TIERS_SQL = """
+    SELECT user_id, tier
+    FROM audit_event WHERE user_id IS NOT NULL AND event='tier_claim' {extra}
+"""
+
+_UPSERT_SQL = text("""
+    INSERT INTO user_ledger (user_id, spent, purchased, daily_claims, reward, tiers_claimed, updated_at)
+    VALUES (:user_id, :spent, :purchased, :daily_claims, :reward, :tiers_claimed, :now)
+    ON CONFLICT(user_id) DO UPDATE SET
+        spent         = spent + excluded.spent,
+        purchased     = purchased + excluded.purchased,
+        daily_claims  = daily_claims + excluded.daily_claims,
+        reward        = reward + excluded.reward,
+        tiers_claimed = tiers_claimed | excluded.tiers_claimed,
+        updated_at    = excluded.updated_at
+""")
+
+
+def event_delta(ev: AuditEvent) -> dict | None:
+    """Olayın ledger'a katkısı (tipli kolonlardan; bkz. audit.promote); token hareketi yoksa None."""
+    if ev.user_id is None or ev.event not in LEDGER_EVENTS:
+        return None
+    delta = dict.fromkeys(_FIELDS, 0)
+    if ev.event == "token_spent":
+        delta["spent"] = ev.tokens or 0
+    elif ev.event == "token_purchase":
+        delta["purchased"] = ev.tokens or 0
+    elif ev.event == "daily_claim":
+        delta["daily_claims"] = 1
+    elif ev.event == "reward_claim":
+        delta["reward"] = ev.tokens or 0
+    else:
+        tier = ev.tier or 0
+        delta["tiers_claimed"] = 1 << tier if 1 <= tier <= 30 else 0
+    return delta
+
+
+@event.listens_for(Session, "before_flush")
+def _apply_ledger(session, flush_context, instances):
+    totals: dict[int, dict] = {}
+    for obj in session.new:
+        if not isinstance(obj, AuditEvent):
+            continue
+        delta = event_delta(obj)
+        if delta is None:
+            continue
+        row = totals.setdefault(obj.user_id, dict.fromkeys(_FIELDS, 0))
+        for k, v in delta.items():
+            row[k] = row[k] | v if k == "tiers_claimed" else row[k] + v
+    if not totals:
+        return
+    now = datetime.utcnow()
+    session.connection().execute(
+        _UPSERT_SQL, [dict(row, user_id=uid, now=now) for uid, row in sorted(totals.items())])
+
+
+def get_ledger(user_id: int) -> UserLedger:
+    """Kullanıcının toplamları; satırı yoksa (hiç token hareketi yok) sıfırlı geçici nesne."""
+    row = db.session.get(UserLedger, user_id)
+    return row or UserLedger(user_id=user_id, **dict.fromkeys(_FIELDS, 0))
+
+
+def tiers_of(ledger: UserLedger) -> set[int]:
+    return {t for t in range(1, 31) if (ledger.tiers_claimed or 0) >> t & 1}
+
+
+def _expected(user_ids=None) -> dict[int, tuple]:
+    """audit_event'ten {user_id: (_FIELDS sırasıyla değerler)}."""
+    extra = ""
+    if user_ids is not None:
+        if not user_ids:
+            return {}
+        extra = f"AND user_id IN ({','.join(str(int(u)) for u in user_ids)})"
+    out = {r.user_id: [int(r.spent), int(r.purchased), int(r.daily_claims), int(r.reward), 0]
+           for r in db.session.execute(text(_AGGREGATE_SQL.format(extra=extra)))}
+    for uid, tier in db.session.execute(text(_TIERS_SQL.format(extra=extra))):
+        if tier is not None and 1 <= tier <= 30:
+            out.setdefault(uid, [0, 0, 0, 0, 0])[4] |= 1 << tier
+    return {uid: tuple(vals) for uid, vals in out.items()}
+
+
+def rebuild_ledger(user_ids=None) -> int:
+    """
+    audit_event'ten yeniden hesaplar (user_ids None => hepsi). Tek transaction: silme ve
+    yeniden yazma arasında yazma kilidi tutulduğu için eşzamanlı artışlar kaybolmaz.
+    Yazılan satır sayısını döner.
+    """
+    try:
+        if user_ids is None:
+            db.session.execute(text("DELETE FROM user_ledger"))
+            expected = _expected()
+        else:
+            ids = sorted({int(u) for u in user_ids})
+            if not ids:
+                return 0
+            db.session.execute(text(f"DELETE FROM user_ledger WHERE user_id IN ({','.join(map(str, ids))})"))
+            expected = _expected(ids)
+        now = datetime.utcnow()
+        if expected:
+            db.session.execute(
+                text("INSERT INTO user_ledger (user_id, spent, purchased, daily_claims, reward, tiers_claimed, updated_at) "
+                     "VALUES (:user_id, :spent, :purchased, :daily_claims, :reward, :tiers_claimed, :now)"),
+                [dict(zip(_FIELDS, vals), user_id=uid, now=now) for uid, vals in expected.items()],
+            )
+        db.session.commit()
+        return len(expected)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def check_ledger() -> list[dict]:
+    """Ledger ile audit_event'ten hesaplanan toplamlar arasındaki farklar: [{user_id, field, ledger, expected}]."""
+    expected = _expected()
+    actual = {r.user_id: tuple(int(getattr(r, f) or 0) for f in _FIELDS) for r in UserLedger.query.all()}
+    zero = (0,) * len(_FIELDS)
+    diffs = []
+    for uid in sorted(set(expected) | set(actual)):
+        want, have = expected.get(uid, zero), actual.get(uid, zero)
+        for field, w, h in zip(_FIELDS, want, have):
+            if w != h:
+                diffs.append({"user_id": uid, "field": field, "ledger": h, "expected": w})
+    return diffs
+
+
+def backfill_if_empty(app):
+    """İlk kurulum: tablo boş ve geçmiş olay varsa bir kez doldurulur (create_app'ten)."""
+    if db.session.execute(text("SELECT 1 FROM user_ledger LIMIT 1")).first():
+        return
+    if not db.session.execute(text(
+            "SELECT 1 FROM audit_event WHERE user_id IS NOT NULL AND event IN "
+            "('token_spent','token_purchase','daily_claim','reward_claim','tier_claim') LIMIT 1")).first():
+        return
+    n = rebuild_ledger()
+    app.logger.info(f"[LEDGER] {n} kullanıcı için toplamlar audit_event'ten dolduruldu")
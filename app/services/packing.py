@@ -1,12 +1,99 @@
-# app/services/packing.py
-import io, zipfile
+import io, os, time, zipfile
 from pathlib import Path
+from typing import Iterable, Iterator
+
+# Diskteki bir girdiyi ZIP'e aktarırken okunan parça boyutu
+CHUNK_SIZE = 1024 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    ZipFile için seek edilemeyen hedef: yazılan baytları biriktirir, drain() ile boşaltılır.
+    zipfile tell/seek yapamadığını görünce data descriptor kullanır, yani hiçbir girdi
+    için geri dönüp başlık yamalamaz.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _copy_chunks(fh, dst, sink: _ChunkSink) -> Iterator[bytes]:
+    while True:
+        buf = fh.read(CHUNK_SIZE)
+        if not buf:
+            break
+        dst.write(buf)
+        data = sink.drain()
+        if data:
+            yield data
+
+
+def stream_zip(entries: Iterable[tuple[str, object]], compression=zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+    """
+    entries: (arcname, kaynak) — kaynak dosya yolu (str/Path), bytes ya da okunabilir
+    dosya nesnesi (örn. SpooledTemporaryFile; yazıldıktan sonra kapatılır).
+    Girdiler üretildikçe ZIP parçalarını yield eder; bellekte aynı anda en fazla
+    bir girdinin CHUNK_SIZE'lık parçası (bytes kaynakta o girdinin kendisi) tutulur.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression) as zf:
+        for arcname, src in entries:
+            if isinstance(src, (bytes, bytearray, memoryview)):
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = compression
+                with zf.open(info, "w") as dst:
+                    dst.write(src)
+            elif hasattr(src, "read"):
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = compression
+                try:
+                    src.seek(0)
+                    with zf.open(info, "w") as dst:
+                        yield from _copy_chunks(src, dst, sink)
+                finally:
+                    src.close()
+            else:
+                info = zipfile.ZipInfo.from_file(src, arcname)
+                info.compress_type = compression
+                with open(src, "rb") as fh, zf.open(info, "w") as dst:
+                    yield from _copy_chunks(fh, dst, sink)
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def iter_folder_entries(folder, paths: Iterable[str] | None = None) -> Iterator[tuple[str, str]]:
+    """folder altındaki (ya da verilen) dosyaları (klasöre göre arcname, yol) çiftleri olarak verir."""
+    folder = Path(folder)
+    if paths is None:
+        paths = (p for p in folder.rglob('*') if p.is_file())
+    for p in paths:
+        yield str(Path(p).relative_to(folder)).replace(os.sep, "/"), str(p)
+
+
+def stream_zip_from_folder(folder, paths: Iterable[str] | None = None) -> Iterator[bytes]:
+    return stream_zip(iter_folder_entries(folder, paths))
+
 
 def build_zip_from_folder(folder: str) -> io.BytesIO:
     zip_bytes = io.BytesIO()
-    with zipfile.ZipFile(zip_bytes, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for p in Path(folder).rglob('*'):
-            if p.is_file():
-                zf.write(p, arcname=str(p.relative_to(folder)))
+    for chunk in stream_zip_from_folder(folder):
+        zip_bytes.write(chunk)
     zip_bytes.seek(0)
     return zip_bytes
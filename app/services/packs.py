@@ -0,0 +1,214 @@
+# app/services/packs.py
+import shutil, threading, time, uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask import Response, request, send_file
+
+from .. import db
+from ..models import RenderJob
+from .jobs import job_dirs, preview_dir, storage_root
+
+# Tamamlanan paketler (async işler ve senkron yanıtın kopyası) storage_root/outputs/<job_id>.zip
+# altında PACK_TTL_HOURS boyunca tekrar indirilebilir. Süresi dolan ya da kota için çıkarılan
+# paketin işi status=expired olur (indirme 410). Önizlemeler (<job_id>.previews) paketle gider.
+
+_sweeper_lock = threading.Lock()
+
+
+def pack_ttl(app) -> timedelta:
+    return timedelta(hours=float(app.config.get("PACK_TTL_HOURS", 24)))
+
+
+def pack_expires_at(app, job: RenderJob) -> datetime | None:
+    return job.finished_at + pack_ttl(app) if job.finished_at else None
+
+
+def pack_etag(job: RenderJob, path: Path) -> str:
+    """İçerik değişmedikçe sabit: iş id + boyut + mtime (paket yeniden yazılırsa değişir)."""
+    st = path.stat()
+    return f"{job.id}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def send_pack(app, job: RenderJob, path: Path) -> Response:
+    """
+    Paket yanıtı: ETag + If-None-Match (304). PACK_SENDFILE boşsa Flask/Werkzeug dosyayı
+    Range (206) / If-Range desteğiyle kendisi gönderir; "x-sendfile" (Apache/lighttpd) ya da
+    "x-accel" (nginx, PACK_ACCEL_PREFIX internal location'ı outputs klasörüne eşlenir) ise
+    gövde boş döner, baytları ve Range'i sunucu yazar.
+    """
+    etag = pack_etag(job, path)
+    name = job.result_name or "pack.zip"
+    mode = (app.config.get("PACK_SENDFILE") or "").lower()
+    if not mode:
+        resp = send_file(path, as_attachment=True, download_name=name, mimetype="application/zip",
+                         etag=etag, conditional=True, max_age=0)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+    resp = Response(mimetype="application/zip")
+    if mode == "x-accel":
+        prefix = (app.config.get("PACK_ACCEL_PREFIX") or "/protected-packs/").rstrip("/")
+        resp.headers["X-Accel-Redirect"] = f"{prefix}/{path.name}"
+    else:
+        resp.headers["X-Sendfile"] = str(path.resolve())
+    resp.headers.set("Content-Disposition", "attachment", filename=name)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.set_etag(etag)
+    return resp
+
+
+class PackTee:
+    """
+    Senkron yanıtın ZIP parçalarını aynı anda diske yazar. finalize(): dosya yerine konur
+    (iş done'ı token düşümüyle aynı transaction'da akışın settle'ı yazar); abort():
+    (render/paketleme hatası, token düşülemedi) yarım ya da yerine konmuş dosya silinir,
+    iş failed olur. İstemci kopması abort sebebi değildir: akış kalan parçaları yalnız
+    buraya yazıp paketi tamamlar.
+    Akış üreteci istek bağlamı dışında çalıştığı için DB işlemleri kendi app_context'inde.
+    """
+
+    def __init__(self, app, job_id: str, zip_path: Path):
+        self.app, self.job_id, self.zip_path = app, job_id, zip_path
+        zip_path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = zip_path.with_suffix(f".{uuid.uuid4().hex[:8]}.part")
+        self._fh = open(self.tmp, "wb")
+        self._closed = False
+
+    def write(self, chunk: bytes):
+        self._fh.write(chunk)
+
+    def _finish(self, status: str, error: str | None = None):
+        with self.app.app_context():
+            try:
+                job = db.session.get(RenderJob, self.job_id)
+                if job:
+                    job.status = status
+                    job.error = error
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"[PACK] {self.job_id} durum yazılamadı: {e}")
+            finally:
+                db.session.remove()
+
+    def finalize(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._fh.close()
+        self.tmp.replace(self.zip_path)
+
+    def abort(self, error: str = "Yanıt tamamlanmadı"):
+        if self._closed:
+            self.zip_path.unlink(missing_ok=True)
+        else:
+            self._closed = True
+            self._fh.close()
+            self.tmp.unlink(missing_ok=True)
+        self._finish("failed", error)
+
+
+def _expire(app, job: RenderJob, path: Path) -> int:
+    size = path.stat().st_size if path.is_file() else 0
+    path.unlink(missing_ok=True)
+    shutil.rmtree(preview_dir(app, job.id), ignore_errors=True)
+    job.status = "expired"
+    return size
+
+
+def _sweep_previews(app):
+    outputs = storage_root(app) / app.config.get("OUTPUTS_DIRNAME", "outputs")
+    if not outputs.is_dir():
+        return
+    dirs = {p.name[:-len(".previews")]: p for p in outputs.glob("*.previews") if p.is_dir()}
+    if not dirs:
+        return
+    live = {job_id for (job_id,) in db.session.query(RenderJob.id).filter(
+        RenderJob.id.in_(list(dirs)), RenderJob.status.in_(("queued", "running", "done")))}
+    for job_id, path in dirs.items():
+        if job_id not in live:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def sweep_packs(app) -> dict:
+    """
+    1) finished_at + PACK_TTL_HOURS geçmiş paketleri siler.
+    2) Kalan paketlerin toplamı PACK_QUOTA_MB'ı aşıyorsa en eskilerden başlayarak siler.
+    3) Süreci çöktüğü için "streaming"de kalmış senkron yanıt kayıtlarını failed yapar.
+    4) İşi bitmiş (failed/expired) ya da silinmiş önizleme klasörlerini kaldırır.
+    Dönen: {"expired", "evicted", "freed_bytes", "kept_bytes"}.
+    """
+    cutoff = datetime.utcnow() - pack_ttl(app)
+    quota = int(app.config.get("PACK_QUOTA_MB", 10240)) * 1024 * 1024
+    stats = {"expired": 0, "evicted": 0, "freed_bytes": 0, "kept_bytes": 0}
+    try:
+        kept = []
+        for job in RenderJob.query.filter_by(status="done").order_by(RenderJob.finished_at).all():
+            _, _, zip_path = job_dirs(app, job.id)
+            if job.finished_at is None or job.finished_at < cutoff or not zip_path.is_file():
+                stats["freed_bytes"] += _expire(app, job, zip_path)
+                stats["expired"] += 1
+            else:
+                kept.append((job, zip_path, zip_path.stat().st_size))
+        total = sum(size for _, _, size in kept)
+        for job, zip_path, size in kept:
+            if quota <= 0 or total <= quota:
+                break
+            stats["freed_bytes"] += _expire(app, job, zip_path)
+            stats["evicted"] += 1
+            total -= size
+        stats["kept_bytes"] = total
+        for job in RenderJob.query.filter(RenderJob.status == "streaming", RenderJob.started_at < cutoff).all():
+            job.status = "failed"
+            job.error = "Yanıt tamamlanmadı"
+        db.session.commit()
+        _sweep_previews(app)
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"[PACK] Temizlik hatası: {e}")
+    return stats
+
+
+def _sweep_loop(app, interval: float):
+    from .cache import get_render_cache
+    from .uploads import sweep_sessions
+
+    while True:
+        with app.app_context():
+            try:
+                stats = sweep_packs(app)
+                if stats["expired"] or stats["evicted"]:
+                    app.logger.info(f"[PACK] temizlik: {stats}")
+                sweep_sessions(app)
+                cache = get_render_cache(app)
+                if cache:
+                    cache.evict()   # toplamı diskten yeniden sayar (diğer süreçlerin yazdıkları dahil)
+            except Exception:
+                # tek turdaki hata thread'i öldürmesin; sonraki turda yeniden denenir
+                db.session.rollback()
+                app.logger.exception("[PACK] Temizleyici turu hatası")
+            finally:
+                db.session.remove()
+        time.sleep(interval)
+
+
+def start_sweeper(app):
+    """
+    Süreç başına bir arka plan temizleyici (PACK_SWEEP_SECONDS; 0 => kapalı). Yalnız web
+    giriş noktası çağırır; çok süreçli dağıtımda PACK_SWEEPER=0 ile süreç bazında kapatılır.
+    """
+    interval = float(app.config.get("PACK_SWEEP_SECONDS", 600))
+    if interval <= 0 or not app.config.get("PACK_SWEEPER", True):
+        return
+    with _sweeper_lock:
+        if app.extensions.get("pack_sweeper"):
+            return
+        t = threading.Thread(target=_sweep_loop, args=(app, interval), name="pack-sweeper", daemon=True)
+        app.extensions["pack_sweeper"] = t
+        t.start()
@@ -0,0 +1,108 @@
+# app/services/preflight.py
+import os
+from typing import NamedTuple
+
+from PIL import Image
+
+from .billing import upload_price
+from .imaging import (
+    BAND_MIN_PIXELS, BAND_ROWS, DEFAULT_ENCODING, DEFAULT_QUALITY, plan_renders, estimate_peak_bytes,
+)
+
+# Kabul edilen kaynak biçimleri (Pillow format adı; uzantıya güvenilmez)
+ALLOWED_FORMATS = ("JPEG", "PNG")
+
+# Tahmin katsayıları (tek çekirdek, megapiksel/sn). Kaba değerlerdir; sunucuda
+# imaging.encoding_benchmark / quality_benchmark ile ölçülüp güncellenebilir.
+DECODE_MPX_PER_SEC = 120.0
+RESIZE_MPX_PER_SEC = {"best": 35.0, "standard": 45.0, "fast": 70.0}   # kök çıktı pikseli
+ENCODE_MPX_PER_SEC = {"print-max": 150.0, "print-standard": 55.0, "web": 45.0, "web-webp": 25.0}
+# Çıktı bayt/piksel — fotoğraflar için üst tahmin
+BYTES_PER_PIXEL = {"print-max": 0.9, "print-standard": 0.35, "web": 0.2, "web-webp": 0.12}
+
+
+class SourceInfo(NamedTuple):
+    name: str
+    width: int
+    height: int
+    mode: str
+    format: str
+
+
+class PreflightError(ValueError):
+    """Kaynak reddedildi (mesaj kullanıcıya gösterilebilir)."""
+
+
+def inspect_source(name: str, fp, max_pixels: int, verify: bool = True) -> SourceInfo:
+    """
+    Yalnız başlığı okur (piksel ayrılmaz): biçim, boyut, mod. verify=True ise Pillow'un
+    yapı kontrolü de çalışır (PNG'de chunk/CRC; decode yapmaz). Nesne başa sarılarak bırakılır.
+    """
+    try:
+        with Image.open(fp) as im:
+            info = SourceInfo(name, im.size[0], im.size[1], im.mode, im.format or "")
+            if info.format not in ALLOWED_FORMATS:
+                raise PreflightError(f"{name}: desteklenmeyen biçim ({info.format or '?'})")
+            if info.width * info.height > max_pixels:
+                raise PreflightError(
+                    f"{name}: {info.width}x{info.height} piksel sınırını aşıyor ({max_pixels // 1_000_000} MP)")
+            if verify:
+                im.verify()
+            return info
+    except PreflightError:
+        raise
+    except Image.DecompressionBombError:
+        raise PreflightError(f"{name}: piksel sınırını aşıyor")
+    except Exception:
+        raise PreflightError(f"{name}: görsel okunamadı ya da bozuk")
+    finally:
+        if hasattr(fp, "seek"):
+            fp.seek(0)
+
+
+def preflight(sources, max_pixels: int, verify: bool = True) -> tuple[list[SourceInfo], list[dict]]:
+    """sources = [(ad, dosya nesnesi)] => (kabul edilenler, [{"name", "error"}] reddedilenler)."""
+    accepted, rejected = [], []
+    for name, fp in sources:
+        try:
+            accepted.append(inspect_source(name, fp, max_pixels, verify))
+        except PreflightError as e:
+            rejected.append({"name": name, "error": str(e)})
+    return accepted, rejected
+
+
+def estimate_render(infos, sizes, scale: int, *, encoding: str = DEFAULT_ENCODING,
+                    quality: str = DEFAULT_QUALITY, cascade: bool = True, workers: int | None = None) -> dict:
+    """
+    Boyut planından tahmini çıktı baytı ve render süresi. Decode görsel başına seri,
+    kök resize + encode zincirler arasında min(workers, zincir sayısı) çekirdeğe bölünür.
+    """
+    workers = int(workers or 0) or (os.cpu_count() or 1)
+    plan = plan_renders(sizes, scale, cascade)
+    out_px = sum(step.size[0] * step.size[1] for chain in plan for step in chain)
+    root_px = sum(chain[0].size[0] * chain[0].size[1] for chain in plan)
+    lanes = max(1, min(workers, len(plan)))
+    per_image = (root_px / RESIZE_MPX_PER_SEC[quality] + out_px / ENCODE_MPX_PER_SEC[encoding]) / 1e6 / lanes
+    seconds = sum(i.width * i.height / 1e6 / DECODE_MPX_PER_SEC + per_image for i in infos)
+    return {
+        "output_bytes": int(out_px * len(infos) * BYTES_PER_PIXEL[encoding]),
+        "render_seconds": round(seconds, 1),
+    }
+
+
+def quote(app, infos, sizes, scale: int, *, encoding: str, quality: str) -> dict:
+    """Header bilgisinden fiyat + tahmini çıktı/süre + bellek payı (admission ile aynı hesap)."""
+    cfg = app.config
+    cascade = cfg.get("IMAGING_CASCADE", True)
+    dims = [(i.width, i.height, i.mode) for i in infos]
+    body = {
+        "files": len(infos),
+        "tokens": upload_price(len(infos), sizes) if infos else 0,
+        "peak_bytes": estimate_peak_bytes(dims, sizes, scale, cascade=cascade,
+                                          workers=cfg.get("IMAGING_WORKERS", 0),
+                                          band_rows=cfg.get("IMAGING_BAND_ROWS", BAND_ROWS) or None,
+                                          band_min_pixels=cfg.get("IMAGING_BAND_MIN_PIXELS", BAND_MIN_PIXELS)),
+    }
+    body.update(estimate_render(infos, sizes, scale, encoding=encoding, quality=quality,
+                                cascade=cascade, workers=cfg.get("IMAGING_WORKERS", 0)))
+    return body
@@ -0,0 +1,66 @@
+# app/services/previews.py
+import json, os, shutil, uuid
+from pathlib import Path
+
+from .imaging import IZINLI_UZANTILAR, PREVIEW_EDGE, preview_format, preview_size, render_previews
+
+# İş önizlemeleri: <önizleme klasörü>/<görsel>/<ölçü sırası><uzantı> + index.json.
+# index.json her görselden sonra yeniden yazılır; arayüz render sürerken hazır olanları gösterir.
+INDEX_NAME = "index.json"
+
+
+def preview_edge(app) -> int:
+    return max(32, min(int(app.config.get("PREVIEW_EDGE", PREVIEW_EDGE)), 1024))
+
+
+def _write_index(out_dir: Path, index: dict):
+    tmp = out_dir / f"{INDEX_NAME}.{uuid.uuid4().hex[:8]}"
+    tmp.write_text(json.dumps(index), encoding="utf-8")
+    os.replace(tmp, out_dir / INDEX_NAME)
+
+
+def write_job_previews(app, src_dir: Path, out_dir: Path, sizes, labels) -> int:
+    """
+    src_dir'deki her görselin tüm ölçüler için önizlemesini yazar; yazılan görsel sayısını
+    döner. Okunamayan görsel atlanır (render aynı hatayı ayrıca raporlar).
+    """
+    edge = preview_edge(app)
+    fmt, ext = preview_format()
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index = {
+        "edge": edge,
+        "ext": ext,
+        "sizes": [{"label": label, "width": w, "height": h}
+                  for label, (w, h) in zip(labels, (preview_size(s, edge) for s in sizes))],
+        "images": [],
+    }
+    for p in sorted(p for p in src_dir.iterdir() if p.name.lower().endswith(IZINLI_UZANTILAR)):
+        try:
+            blobs = render_previews(p, sizes, edge, fmt)
+        except Exception as e:
+            app.logger.error(f"[PREVIEW] {p.name} önizlenemedi: {e}")
+            continue
+        img_dir = out_dir / p.stem
+        img_dir.mkdir(exist_ok=True)
+        for i, blob in enumerate(blobs):
+            (img_dir / f"{i}{ext}").write_bytes(blob)
+        index["images"].append(p.stem)
+        _write_index(out_dir, index)
+    return len(index["images"])
+
+
+def read_index(out_dir: Path) -> dict | None:
+    try:
+        return json.loads((out_dir / INDEX_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def preview_file(out_dir: Path, image: str, index: int) -> Path | None:
+    """index.json'da kayıtlı görselin dosyası; yoksa None (yol dışına çıkılamaz)."""
+    meta = read_index(out_dir)
+    if not meta or image not in meta["images"] or not 0 <= index < len(meta["sizes"]):
+        return None
+    path = out_dir / image / f"{index}{meta['ext']}"
+    return path if path.is_file() else None
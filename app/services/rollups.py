@@ -0,0 +1,186 @@
+# app/services/rollups.py
+import calendar
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..models import AuditEvent
+from . import audit  # noqa: tipli kolon kancası bu modülünkinden önce kayıtlı olmalı
+from .hll import HyperLogLog
+
+# metrics_hourly, her audit_event yazımıyla aynı transaction'da (UTC saat, event) kovasına
+# eklenir: count +1, files/tokens tipli kolonlardan. Analitik uç noktaları kovaları okur,
+# audit_event'i taramaz. Kovalar UTC'dir; yerel gün/saat dönüşümü okuma anında kova başına
+# yapılır (tam saat olmayan saat dilimlerinde kova, yerel gün sınırında başladığı güne sayılır).
+# Tekil kullanıcı sayıları toplanamadığı için her kova ayrıca user_id'lerin HyperLogLog eskizini
+# tutar; herhangi bir aralığın tekil sayısı kova eskizleri birleştirilerek bulunur (distinct_users).
+# bulk_save_objects / ham SQL yazımları kancadan geçmez: python -m app.rollups rebuild.
+_UPSERT_SQL = text("""
+    INSERT INTO metrics_hourly (hour, event, count, files, tokens)
+    VALUES (:hour, :event, :count, :files, :tokens)
+    ON CONFLICT(hour, event) DO UPDATE SET
+        count  = count + excluded.count,
+        files  = files + excluded.files,
+        tokens = tokens + excluded.tokens
+""")
+
+# audit_event'ten hesaplama (rebuild ve tutarlılık kontrolü aynı tanımı kullanır)
+_EXPECTED_SQL = """
+    SELECT CAST(strftime('%s', created_at) AS INTEGER) / 3600 AS hour, event,
+           COUNT(*) AS count, SUM(COALESCE(files,0)) AS files, SUM(MAX(COALESCE(tokens,0),0)) AS tokens
+    FROM audit_event
+    WHERE created_at >= :start
+    GROUP BY hour, event
+"""
+
+
+def hour_of(ts: datetime) -> int:
+    """UTC (naif) zaman damgasının kova numarası."""
+    return calendar.timegm(ts.timetuple()) // 3600
+
+
+def hour_start(hour: int) -> datetime:
+    return datetime.utcfromtimestamp(hour * 3600)
+
+
+@event.listens_for(Session, "before_flush")
+def _apply_rollups(session, flush_context, instances):
+    buckets: dict[tuple[int, str], list] = {}
+    users: dict[tuple[int, str], set] = {}
+    for obj in session.new:
+        if not isinstance(obj, AuditEvent):
+            continue
+        if obj.created_at is None:
+            obj.created_at = datetime.utcnow()   # kolon varsayılanı insert'te uygulanır; kova için şimdi ver
+        key = (hour_of(obj.created_at), obj.event)
+        row = buckets.setdefault(key, [0, 0, 0])
+        row[0] += 1
+        row[1] += obj.files or 0
+        row[2] += max(0, obj.tokens or 0)
+        if obj.user_id is not None:
+            users.setdefault(key, set()).add(obj.user_id)
+    if not buckets:
+        return
+    conn = session.connection()
+    conn.execute(_UPSERT_SQL, [
+        {"hour": h, "event": ev, "count": n, "files": f, "tokens": t}
+        for (h, ev), (n, f, t) in sorted(buckets.items())
+    ])
+    # eskiz oku-değiştir-yaz: üstteki upsert yazma kilidini aldığı için eşzamanlı yazan yok
+    for (h, ev), uids in sorted(users.items()):
+        blob = conn.execute(text("SELECT user_sketch FROM metrics_hourly WHERE hour=:h AND event=:ev"),
+                            {"h": h, "ev": ev}).scalar()
+        sketch = HyperLogLog.from_bytes(blob)
+        changed = False
+        for uid in uids:
+            changed = sketch.add(uid) or changed
+        if changed:
+            conn.execute(text("UPDATE metrics_hourly SET user_sketch=:s WHERE hour=:h AND event=:ev"),
+                         {"s": sketch.to_bytes(), "h": h, "ev": ev})
+
+
+def _expected_sketches(start: datetime) -> dict[tuple[int, str], bytes]:
+    sketches: dict[tuple[int, str], HyperLogLog] = {}
+    for h, ev, uid in db.session.execute(text("""
+        SELECT DISTINCT CAST(strftime('%s', created_at) AS INTEGER) / 3600 AS hour, event, user_id
+        FROM audit_event
+        WHERE created_at >= :start AND user_id IS NOT NULL
+    """), {"start": start.strftime("%Y-%m-%d %H:%M:%S")}):
+        sketches.setdefault((h, ev), HyperLogLog()).add(uid)
+    return {key: sk.to_bytes() for key, sk in sketches.items()}
+
+
+def rebuild_rollups(since: datetime | None = None) -> int:
+    """
+    Kovaları audit_event'ten yeniden hesaplar (since None => tüm geçmiş; verilirse o saatin
+    kovasından itibaren). Tek transaction. Yazılan kova sayısını döner.
+    """
+    start = hour_start(hour_of(since)) if since else datetime(1970, 1, 1)
+    try:
+        db.session.execute(text("DELETE FROM metrics_hourly WHERE hour >= :h"), {"h": hour_of(start)})
+        n = db.session.execute(
+            text("INSERT INTO metrics_hourly (hour, event, count, files, tokens) " + _EXPECTED_SQL),
+            {"start": start.strftime("%Y-%m-%d %H:%M:%S")},
+        ).rowcount
+        sketches = _expected_sketches(start)
+        if sketches:
+            db.session.execute(
+                text("UPDATE metrics_hourly SET user_sketch=:s WHERE hour=:h AND event=:ev"),
+                [{"s": blob, "h": h, "ev": ev} for (h, ev), blob in sketches.items()],
+            )
+        db.session.commit()
+        return n
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def check_rollups(since: datetime | None = None) -> list[dict]:
+    """Kovalar ile audit_event'ten hesaplananlar arasındaki farklar: [{hour, event, stored, expected}]."""
+    start = hour_start(hour_of(since)) if since else datetime(1970, 1, 1)
+    expected = {(r.hour, r.event): (r.count, r.files, r.tokens) for r in db.session.execute(
+        text(_EXPECTED_SQL), {"start": start.strftime("%Y-%m-%d %H:%M:%S")})}
+    sketches = _expected_sketches(start)
+    expected = {key: vals + (sketches.get(key),) for key, vals in expected.items()}
+    stored = {(r.hour, r.event): (r.count, r.files, r.tokens, r.user_sketch) for r in db.session.execute(
+        text("SELECT hour, event, count, files, tokens, user_sketch FROM metrics_hourly WHERE hour >= :h"),
+        {"h": hour_of(start)})}
+    return [
+        {"hour": hour_start(h).isoformat(), "event": ev,
+         "stored": _summary(stored.get((h, ev))), "expected": _summary(expected.get((h, ev)))}
+        for h, ev in sorted(set(expected) | set(stored))
+        if expected.get((h, ev)) != stored.get((h, ev))
+    ]
+
+
+def _summary(vals):
+    """Fark raporu için: eskiz baytları yerine tahmini tekil sayı."""
+    if vals is None:
+        return None
+    count, files, tokens, blob = vals
+    return {"count": count, "files": files, "tokens": tokens,
+            "users": round(HyperLogLog.from_bytes(blob).count(), 1) if blob else None}
+
+
+DISTINCT_GROUPS = ("day", "week", "month", "total")
+
+
+def group_key(hour: int, group: str) -> str:
+    """Kovanın yerel saatte düştüğü grup: 2025-03-14 / 2025-W11 / 2025-03 / total."""
+    local = datetime.fromtimestamp(hour * 3600)
+    if group == "day":
+        return local.strftime("%Y-%m-%d")
+    if group == "week":
+        year, week, _ = local.isocalendar()
+        return f"{year}-W{week:02d}"
+    if group == "month":
+        return local.strftime("%Y-%m")
+    return "total"
+
+
+def distinct_users(event_name: str, start_hour: int, end_hour: int, group: str = "day") -> dict[str, HyperLogLog]:
+    """
+    [start_hour, end_hour) aralığındaki kovaların eskizlerini gruba göre birleştirir;
+    {grup anahtarı: HyperLogLog}. audit_event okunmaz; maliyet kova sayısıyla orantılı.
+    """
+    merged: dict[str, HyperLogLog] = {}
+    for hour, blob in db.session.execute(text("""
+        SELECT hour, user_sketch FROM metrics_hourly
+        WHERE event=:ev AND hour >= :h0 AND hour < :h1 AND user_sketch IS NOT NULL
+    """), {"ev": event_name, "h0": start_hour, "h1": end_hour}):
+        key = group_key(hour, group)
+        sketch = merged.get(key)
+        merged[key] = sketch.merge_bytes(blob) if sketch else HyperLogLog.from_bytes(blob)
+    return merged
+
+
+def backfill_if_empty(app):
+    """İlk kurulum: tablo boş ve geçmiş olay varsa bir kez doldurulur (create_app'ten)."""
+    if db.session.execute(text("SELECT 1 FROM metrics_hourly LIMIT 1")).first():
+        return
+    if not db.session.execute(text("SELECT 1 FROM audit_event LIMIT 1")).first():
+        return
+    n = rebuild_rollups()
+    app.logger.info(f"[ROLLUP] {n} saatlik kova audit_event'ten dolduruldu")
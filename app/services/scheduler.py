@@ -0,0 +1,209 @@
+# app/services/scheduler.py
+import os, threading, time
+from collections import deque
+from concurrent.futures import Executor, Future
+
+from sqlalchemy import text
+
+from .. import db
+
+# Kullanıcı sınıfları: token satın almış kullanıcılar "paid" (ağırlıklı öncelik), diğerleri "free"
+USER_CLASSES = ("free", "paid")
+
+_create_lock = threading.Lock()
+
+
+class _Flow:
+    """Bir kullanıcının bekleyen görevleri + sanal zamanı (ağırlıklı harcanan süre)."""
+
+    def __init__(self, key, user_class: str, weight: float, vtime: float):
+        self.key = key
+        self.user_class = user_class
+        self.weight = weight
+        self.vtime = vtime
+        self.queue: deque = deque()     # (future, fn, args, kwargs, kuyruğa girdiği an)
+        self.running = 0
+
+
+class FairScheduler:
+    """
+    Görsel işleme görevleri (decode / ölçü zinciri) için süreç geneli ağırlıklı adil kuyruk.
+    - Her kullanıcının ayrı FIFO'su vardır; boşalan işçi, sanal zamanı en küçük olan
+      (ve eşzamanlılık sınırına takılmayan) kullanıcının sıradaki görevini alır.
+    - Sanal zaman = gerçekleşen görev süresi / ağırlık. Görev maliyeti önceden tahmin
+      edilmez, bitince ölçülür (büyük scale'li görevler kullanıcıya daha pahalıya yazılır).
+    - Boşta kalıp geri dönen kullanıcı birikmiş kredi kullanamaz: sanal zamanı o anki
+      sanal saatten başlar.
+    - user_limit > 0 ise bir kullanıcının aynı anda çalışan görev sayısı bununla sınırlıdır.
+    Görevin içinden yeni görev beklenmemelidir (işçiler paylaşılır).
+    """
+
+    def __init__(self, workers: int, user_limit: int = 0, weights: dict | None = None):
+        self.workers = max(1, int(workers))
+        self.user_limit = max(0, int(user_limit or 0))
+        self.weights = dict(weights or {})
+        self._cond = threading.Condition()
+        self._flows: dict = {}
+        self._vclock = 0.0
+        self._stats = {c: {"submitted": 0, "completed": 0, "wait_total": 0.0, "wait_max": 0.0, "busy_seconds": 0.0}
+                       for c in USER_CLASSES}
+        self._threads = [threading.Thread(target=self._loop, name=f"imaging-sched-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def pool(self, user_id, user_class: str = "free") -> "UserPool":
+        """Kullanıcıya bağlı Executor (imaging'in pool parametresine verilir)."""
+        return UserPool(self, user_id, user_class if user_class in USER_CLASSES else "free")
+
+    def _submit(self, key, user_class: str, fn, args, kwargs) -> Future:
+        fut = Future()
+        with self._cond:
+            flow = self._flows.get(key)
+            if flow is None:
+                flow = self._flows[key] = _Flow(key, user_class, float(self.weights.get(user_class, 1.0)) or 1.0,
+                                                self._vclock)
+            elif not flow.queue and not flow.running:
+                flow.vtime = max(flow.vtime, self._vclock)
+            flow.queue.append((fut, fn, args, kwargs, time.monotonic()))
+            self._stats[flow.user_class]["submitted"] += 1
+            self._cond.notify()
+        return fut
+
+    def _pick(self):
+        """Sırası gelen görev (kilit altında çağrılır); yoksa None."""
+        best = None
+        for key, flow in list(self._flows.items()):
+            while flow.queue and flow.queue[0][0].cancelled():
+                flow.queue.popleft()
+            if not flow.queue and not flow.running:
+                del self._flows[key]      # iptal edilen görevlerle boşalan kullanıcı
+                continue
+            if not flow.queue or (self.user_limit and flow.running >= self.user_limit):
+                continue
+            if best is None or flow.vtime < best.vtime:
+                best = flow
+        if best is None:
+            return None
+        self._vclock = max(self._vclock, best.vtime)
+        best.running += 1
+        return best, best.queue.popleft()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                picked = self._pick()
+                while picked is None:
+                    self._cond.wait()
+                    picked = self._pick()
+            flow, (fut, fn, args, kwargs, queued_at) = picked
+            started = time.monotonic()
+            if fut.set_running_or_notify_cancel():
+                try:
+                    fut.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    fut.set_exception(e)
+            elapsed = time.monotonic() - started
+            with self._cond:
+                flow.running -= 1
+                flow.vtime += elapsed / flow.weight
+                st = self._stats[flow.user_class]
+                wait_s = started - queued_at
+                st["completed"] += 1
+                st["wait_total"] += wait_s
+                st["wait_max"] = max(st["wait_max"], wait_s)
+                st["busy_seconds"] += elapsed
+                if not flow.queue and not flow.running and self._flows.get(flow.key) is flow:
+                    del self._flows[flow.key]
+                self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        """Kullanıcı sınıfı bazında kuyruk derinliği, çalışan görev ve bekleme süreleri."""
+        with self._cond:
+            classes = {}
+            for c, st in self._stats.items():
+                flows = [f for f in self._flows.values() if f.user_class == c]
+                queued = [item for f in flows for item in f.queue if not item[0].cancelled()]
+                now = time.monotonic()
+                classes[c] = {
+                    "weight": float(self.weights.get(c, 1.0)),
+                    "active_users": len(flows),
+                    "queued": len(queued),
+                    "running": sum(f.running for f in flows),
+                    "oldest_wait_ms": round(max((now - item[4] for item in queued), default=0.0) * 1000, 1),
+                    "submitted": st["submitted"],
+                    "completed": st["completed"],
+                    "avg_wait_ms": round(st["wait_total"] / st["completed"] * 1000, 1) if st["completed"] else 0.0,
+                    "max_wait_ms": round(st["wait_max"] * 1000, 1),
+                    "busy_seconds": round(st["busy_seconds"], 2),
+                }
+            return {"workers": self.workers, "user_limit": self.user_limit, "classes": classes}
+
+
+class UserPool(Executor):
+    """
+    FairScheduler'a kullanıcı adına görev veren Executor. shutdown() yalnızca bu havuzun
+    görevlerini etkiler (paylaşılan işçiler kapanmaz).
+    """
+
+    def __init__(self, scheduler: FairScheduler, user_id, user_class: str):
+        self.scheduler = scheduler
+        self.user_id = user_id
+        self.user_class = user_class
+        self._futures: set = set()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        fut = self.scheduler._submit(self.user_id, self.user_class, fn, args, kwargs)
+        self._futures.add(fut)
+        fut.add_done_callback(self._futures.discard)
+        return fut
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        pending = list(self._futures)
+        if cancel_futures:
+            for fut in pending:
+                fut.cancel()
+        if wait:
+            for fut in pending:
+                if not fut.cancelled():
+                    try:
+                        fut.exception()
+                    except Exception:
+                        pass
+
+
+def user_class(user_id) -> str:
+    """token_purchase geçmişi olan kullanıcı "paid", diğerleri "free" (uygulama bağlamı gerekir)."""
+    if user_id is None:
+        return "free"
+    try:
+        row = db.session.execute(
+            text("SELECT 1 FROM audit_event WHERE event='token_purchase' AND user_id=:uid LIMIT 1"),
+            {"uid": user_id},
+        ).first()
+    except Exception:
+        db.session.rollback()
+        return "free"
+    return "paid" if row else "free"
+
+
+def get_scheduler(app) -> FairScheduler | None:
+    """Uygulama başına tek zamanlayıcı; IMAGING_SCHEDULER kapalıysa None."""
+    if not app.config.get("IMAGING_SCHEDULER", True):
+        return None
+    with _create_lock:
+        sched = app.extensions.get("imaging_scheduler")
+        if sched is None:
+            workers = int(app.config.get("IMAGING_WORKERS", 0) or 0) or (os.cpu_count() or 1)
+            sched = app.extensions["imaging_scheduler"] = FairScheduler(
+                workers,
+                user_limit=int(app.config.get("IMAGING_SCHED_USER_LIMIT", 0)),
+                weights={"free": 1.0, "paid": float(app.config.get("IMAGING_SCHED_PAID_WEIGHT", 2.0))},
+            )
+        return sched
+
+
+def user_pool(app, user_id) -> UserPool | None:
+    """Kullanıcının görevleri için havuz; zamanlayıcı kapalıysa None (istek kendi havuzunu açar)."""
+    sched = get_scheduler(app)
+    return sched.pool(user_id, user_class(user_id)) if sched else None
@@ -0,0 +1,29 @@
+# app/services/settings.py
+from .. import db
+from ..models import AppSetting
+
+
+def get_setting(key: str, default=None):
+    """app_setting tablosundan değer; kayıt yoksa (ya da okunamazsa) default."""
+    try:
+        row = db.session.get(AppSetting, key)
+    except Exception:
+        db.session.rollback()
+        return default
+    return row.value if row and row.value is not None else default
+
+
+def set_setting(key: str, value, user_id: int | None = None) -> tuple[bool, str]:
+    """Değeri yazar (yoksa ekler). (ok, mesaj) döner."""
+    try:
+        row = db.session.get(AppSetting, key)
+        if row is None:
+            row = AppSetting(key=key)
+            db.session.add(row)
+        row.value = None if value is None else str(value)
+        row.updated_by = user_id
+        db.session.commit()
+        return True, "OK"
+    except Exception as e:
+        db.session.rollback()
+        return False, f"Ayar kaydedilemedi: {e}"
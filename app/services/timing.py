@@ -0,0 +1,189 @@
+# app/services/timing.py
+import json, threading, time
+from collections import deque
+from contextlib import contextmanager
+
+from .imaging import LABELS_8LI
+
+# Yükleme hattının aşamaları (Server-Timing / log / metrik adları):
+#   parse     multipart gövdesinin ayrıştırılması (Werkzeug, ilk request.files erişimi)
+#   preflight başlık kontrolü          save    async yolda orijinallerin diske yazılması
+#   admit     bellek kabulünde bekleme  commit  token düşme + AuditEvent (ya da iş kaydı)
+#   decode / resize / encode            render çekirdeği (imaging timer kancası)
+#   zip       ZIP'e deflate (render beklemesi hariç)
+#   render    render + paketleme duvar saati süresi
+# decode/resize/encode havuz thread'lerinde ölçülür; değerler görev sürelerinin toplamıdır
+# (paralel çalıştıklarında render duvar saatini aşabilir).
+STAGES = ("parse", "preflight", "save", "admit", "commit", "previews", "decode", "resize", "encode", "zip", "render")
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "upload_stage_seconds"
+# Metrik serileri tablo etiketleriyle sınırlı: özel "<w>x<h>" ölçüler tek seride toplanır
+# (kullanıcı girdisi seri sayısını büyütmesin)
+CUSTOM_SIZE = "custom"
+
+_create_lock = threading.Lock()
+
+
+class StageTimer:
+    """
+    Bir isteğin/işin aşama süreleri. imaging'e timer olarak verilir (çağrılabilir;
+    thread-safe): timer(stage, saniye, ölçü sırası | None). Ölçü sırası labels ile etikete
+    çevrilir; resize/encode hem toplamda hem ölçü bazında tutulur.
+    """
+
+    def __init__(self, labels=(), scale: int | None = None):
+        self.labels = list(labels)
+        self.scale = scale
+        self._lock = threading.Lock()
+        self.totals: dict[str, float] = {}
+        self.per_size: dict[tuple[str, str], float] = {}
+
+    def __call__(self, stage: str, seconds: float, index: int | None = None):
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            if index is not None:
+                key = (stage, self.labels[index] if index < len(self.labels) else f"size{index + 1}")
+                self.per_size[key] = self.per_size.get(key, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self(name, time.perf_counter() - t0)
+
+    def server_timing(self) -> str:
+        """Server-Timing başlık değeri (ms); yalnız o ana kadar ölçülen aşamalar."""
+        return ", ".join(f"{stage};dur={self.totals[stage] * 1000:.1f}" for stage in STAGES if stage in self.totals)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            sizes: dict[str, dict] = {}
+            for (stage, label), secs in self.per_size.items():
+                sizes.setdefault(label, {})[stage] = round(secs * 1000, 1)
+            return {
+                "scale": self.scale,
+                "stages_ms": {stage: round(secs * 1000, 1) for stage, secs in self.totals.items()},
+                "sizes_ms": sizes,
+            }
+
+
+def timed_zip(zipper, entries, timer: StageTimer):
+    """
+    zipper(entries) (örn. packing.stream_zip) üretecini sarar: 'render' = parça üretiminin
+    toplam süresi (istemciye yazma hariç), 'zip' = bundan girdilerin (render) beklenmesi
+    çıkarılmış kısım. Yarıda bırakılırsa o ana kadarki süreler yazılır.
+    """
+    waited = 0.0
+
+    def _entries():
+        nonlocal waited
+        it = iter(entries)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - t0
+            yield item
+
+    spent = 0.0
+    chunks = zipper(_entries())
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                spent += time.perf_counter() - t0
+            yield chunk
+    finally:
+        chunks.close()
+        timer("render", spent)
+        timer("zip", max(0.0, spent - waited))
+
+
+class StageMetrics:
+    """
+    Süreç geneli aşama dağılımları: (stage, size, scale) serisi başına son `reservoir`
+    gözlem (yüzdelikler) + kümülatif sum/count. Prometheus summary olarak yazılır.
+    size: tablo etiketi, "all" ya da CUSTOM_SIZE (tablo dışı ölçüler).
+    Süreç başınadır; ayrı render işçisi süreçleri kendi sayaçlarını tutar (bkz. [TIMING] log).
+    """
+
+    def __init__(self, reservoir: int = 2048):
+        self.reservoir = max(16, int(reservoir))
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str, str], list] = {}   # key -> [deque, sum, count]
+
+    def observe(self, stage: str, seconds: float, size: str = "all", scale=None):
+        key = (stage, size, str(scale) if scale is not None else "")
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [deque(maxlen=self.reservoir), 0.0, 0]
+            s[0].append(seconds)
+            s[1] += seconds
+            s[2] += 1
+
+    def record(self, timer: StageTimer):
+        for stage, secs in timer.totals.items():
+            self.observe(stage, secs, "all", timer.scale)
+        per_size: dict[tuple[str, str], float] = {}
+        for (stage, label), secs in timer.per_size.items():
+            key = (stage, label if label in LABELS_8LI else CUSTOM_SIZE)
+            per_size[key] = per_size.get(key, 0.0) + secs
+        for (stage, size), secs in per_size.items():
+            self.observe(stage, secs, size, timer.scale)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            items = [(key, sorted(s[0]), s[1], s[2]) for key, s in self._series.items()]
+        rows = []
+        for (stage, size, scale), values, total, count in sorted(items):
+            rows.append({
+                "stage": stage, "size": size, "scale": scale, "count": count, "sum": total,
+                "quantiles": {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES},
+            })
+        return rows
+
+    def prometheus(self) -> str:
+        """Prometheus metin biçimi (text/plain; version=0.0.4)."""
+        lines = [
+            f"# HELP {METRIC_NAME} Upload pipeline stage duration per job (seconds).",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        for row in self.snapshot():
+            labels = f'stage="{row["stage"]}",size="{_escape(row["size"])}",scale="{row["scale"]}"'
+            for q, v in row["quantiles"].items():
+                lines.append(f'{METRIC_NAME}{{{labels},quantile="{q}"}} {v:.6f}')
+            lines.append(f"{METRIC_NAME}_sum{{{labels}}} {row['sum']:.6f}")
+            lines.append(f"{METRIC_NAME}_count{{{labels}}} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def get_stage_metrics(app) -> StageMetrics:
+    with _create_lock:
+        metrics = app.extensions.get("stage_metrics")
+        if metrics is None:
+            metrics = app.extensions["stage_metrics"] = StageMetrics(int(app.config.get("TIMING_RESERVOIR", 2048)))
+        return metrics
+
+
+def publish(app, timer: StageTimer, kind: str, job_id: str | None = None, **fields):
+    """İş bitiminde: tek satır JSON [TIMING] logu + süreç metriklerine ekleme."""
+    if not app.config.get("TIMING_ENABLED", True):
+        return
+    get_stage_metrics(app).record(timer)
+    if app.config.get("TIMING_LOG", True):
+        body = dict(kind=kind, job_id=job_id, **fields, **timer.as_dict())
+        app.logger.info(f"[TIMING] {json.dumps(body, ensure_ascii=False)}")
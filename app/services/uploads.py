@@ -0,0 +1,187 @@
+# app/services/uploads.py
+import hashlib, os, threading, uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .. import db
+from ..models import UploadSession
+
+# İstek gövdesi diske bu büyüklükte parçalarla akar (tamamı belleğe alınmaz)
+COPY_BUFSIZE = 1024 * 1024
+
+# Süreç içi artımlı SHA-256 durumu: {oturum id: (hashlib nesnesi, hash'lenen bayt)}.
+# hashlib durumu serileştirilemediği için DB'de tutulmaz; süreç yeniden başlarsa ya da
+# kayıt offset ile uyuşmazsa .part dosyası diskten akışla yeniden hash'lenir.
+_hashers: dict[str, tuple] = {}
+_locks: dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _lock(sid: str) -> threading.Lock:
+    with _registry_lock:
+        return _locks.setdefault(sid, threading.Lock())
+
+
+def _forget(sid: str):
+    with _registry_lock:
+        _hashers.pop(sid, None)
+        _locks.pop(sid, None)
+
+
+def chunked_dir(app) -> Path:
+    """instance/uploads/chunked"""
+    return Path(app.instance_path) / app.config.get("UPLOADS_DIRNAME", "uploads") / "chunked"
+
+
+def part_path(app, sid: str) -> Path:
+    return chunked_dir(app) / f"{sid}.part"
+
+
+def _hash_file(path: Path, length: int):
+    """.part dosyasının ilk length baytını akışla hash'ler."""
+    h = hashlib.sha256()
+    left = length
+    with open(path, "rb") as fp:
+        while left > 0:
+            buf = fp.read(min(COPY_BUFSIZE, left))
+            if not buf:
+                break
+            h.update(buf)
+            left -= len(buf)
+    return h
+
+
+def _hasher(app, s: UploadSession):
+    h, n = _hashers.get(s.id, (None, -1))
+    if h is None or n != s.received:
+        h = _hash_file(part_path(app, s.id), s.received)
+    return h
+
+
+def create_session(app, user_id: int, filename: str, size: int, sha256: str | None = None) -> UploadSession:
+    """Boş .part dosyası ile yeni oturum açar; süresi dolmuş oturumları da temizler."""
+    sweep_sessions(app)
+    s = UploadSession(id=uuid.uuid4().hex, user_id=user_id, filename=filename, size=size,
+                      received=0, sha256=(sha256 or "").lower() or None, status="open")
+    path = part_path(app, s.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    db.session.add(s)
+    db.session.commit()
+    _hashers[s.id] = (hashlib.sha256(), 0)
+    return s
+
+
+def write_chunk(app, s: UploadSession, offset: int, stream, length: int | None = None) -> tuple[bool, str]:
+    """
+    stream'i offset'ten itibaren .part dosyasına parça parça yazar ve hash'i günceller.
+    offset oturumun mevcut konumundan farklıysa yazmaz (istemci GET ile konumu alıp devam eder).
+    Bağlantı yarıda koparsa o ana kadar yazılan kısım korunur. (ok, mesaj) döner.
+    """
+    with _lock(s.id):
+        db.session.refresh(s)
+        if s.status != "open":
+            return False, "Oturum kapalı"
+        if offset != s.received:
+            return False, "offset uyuşmuyor"
+        h = _hasher(app, s)
+        limit = s.size - s.received if length is None else min(length, s.size - s.received)
+        written = 0
+        try:
+            with open(part_path(app, s.id), "r+b") as fp:
+                fp.seek(s.received)
+                fp.truncate()
+                while True:
+                    buf = stream.read(COPY_BUFSIZE)
+                    if not buf:
+                        break
+                    if written + len(buf) > limit:
+                        return False, "Parça bildirilen boyutu aşıyor"
+                    fp.write(buf)
+                    h.update(buf)
+                    written += len(buf)
+        except OSError as e:
+            return False, f"Yazma hatası: {e}"
+        finally:
+            # Kısmi yazım da (kopan bağlantı) kaydedilir; aşan parça kesilir
+            if written:
+                with open(part_path(app, s.id), "r+b") as fp:
+                    fp.truncate(s.received + written)
+                s.received += written
+                db.session.commit()
+                _hashers[s.id] = (h, s.received)
+        return True, "OK"
+
+
+def finalize_session(app, s: UploadSession) -> tuple[bool, str]:
+    """Boyut ve (bildirildiyse) SHA-256 kontrolü; başarılıysa status=done, digest yazılır."""
+    with _lock(s.id):
+        db.session.refresh(s)
+        if s.status == "done":
+            return True, "OK"
+        if s.status != "open":
+            return False, "Oturum kapalı"
+        if s.received != s.size:
+            return False, f"Eksik yükleme ({s.received}/{s.size} bayt)"
+        digest = _hasher(app, s).hexdigest()
+        if s.sha256 and s.sha256 != digest:
+            return False, "SHA-256 uyuşmuyor"
+        s.digest = digest
+        s.status = "done"
+        db.session.commit()
+        _hashers.pop(s.id, None)
+        return True, "OK"
+
+
+def discard_session(app, s: UploadSession, commit: bool = True):
+    """Oturumu ve .part dosyasını siler."""
+    part_path(app, s.id).unlink(missing_ok=True)
+    _forget(s.id)
+    db.session.delete(s)
+    if commit:
+        db.session.commit()
+
+
+def sweep_sessions(app):
+    """UPLOAD_SESSION_TTL_HOURS'tan uzun süredir güncellenmeyen open/done oturumları siler."""
+    ttl = float(app.config.get("UPLOAD_SESSION_TTL_HOURS", 24))
+    cutoff = datetime.utcnow() - timedelta(hours=ttl)
+    try:
+        stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+        for s in stale:
+            discard_session(app, s, commit=False)
+        if stale:
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"[UPLOAD] Parçalı yükleme temizliği hatası: {e}")
+
+
+def claim_sessions(user_id: int, ids) -> list[UploadSession]:
+    """Kullanıcının tamamlanmış (done) oturumları; biri yoksa/bitmemişse ValueError."""
+    sessions = []
+    for sid in ids:
+        s = db.session.get(UploadSession, sid)
+        if not s or s.user_id != user_id:
+            raise ValueError(f"{sid}: yükleme bulunamadı")
+        if s.status != "done":
+            raise ValueError(f"{sid}: yükleme tamamlanmadı")
+        sessions.append(s)
+    return sessions
+
+
+def mark_used(sessions, commit: bool = True):
+    """Render'a verilen oturumlar tekrar kullanılamaz (dosya render bitince silinir)."""
+    for s in sessions:
+        s.status = "used"
+    if commit:
+        db.session.commit()
+
+
+def remove_parts(app, sids):
+    for sid in sids:
+        try:
+            os.remove(part_path(app, sid))
+        except OSError:
+            pass
+        _forget(sid)
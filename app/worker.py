@@ -0,0 +1,81 @@
+# app/worker.py
+"""
+Bağımsız render işçisi:  python -m app.worker [--concurrency N] [--poll SN] [--exit-when-idle]
+
+render_job tablosundan (status=queued ya da kirası dolmuş running) iş üstlenir, render
+edip paketi RENDER_STORAGE_DIR altına yazar. Aynı DB'ye ve paylaşılan depoya bağlı birden
+çok süreç/sunucu aynı kuyruğu boşaltabilir; çöken işçinin işi kira dolunca yeniden alınır.
+Web sürecinin işleri kendisi çalıştırmaması için RENDER_JOB_MODE=queue ayarlanır.
+"""
+import argparse, signal, threading
+
+from . import create_app, db
+from .services.jobs import claim_job, run_claimed_job, worker_id
+
+
+def run_worker(app, stop: threading.Event, poll: float = 2.0, max_jobs: int = 0,
+               exit_when_idle: bool = False) -> int:
+    """Kuyruktan iş alıp çalıştırır; işlenen iş sayısını döner."""
+    owner = worker_id()
+    handled = 0
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                job = claim_job(app, owner)
+                if job:
+                    app.logger.info(f"[WORKER] {owner} -> {job.id} (deneme {job.attempts})")
+                    run_claimed_job(app, job)
+                    handled += 1
+            except Exception:
+                db.session.rollback()
+                app.logger.exception(f"[WORKER] {owner} döngü hatası")
+                job = None
+            finally:
+                db.session.remove()
+        if max_jobs and handled >= max_jobs:
+            break
+        if job is None:
+            if exit_when_idle:
+                break
+            stop.wait(poll)
+    return handled
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.worker", description="Render işçisi")
+    parser.add_argument("--concurrency", type=int, default=1, help="aynı anda üstlenilecek iş sayısı")
+    parser.add_argument("--poll", type=float, default=2.0, help="kuyruk boşken bekleme (sn)")
+    parser.add_argument("--max-jobs", type=int, default=0, help="her thread için iş sınırı (0 => sınırsız)")
+    parser.add_argument("--exit-when-idle", action="store_true", help="kuyruk boşalınca çık")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    stop = threading.Event()
+
+    def _graceful(signum, frame):
+        # Eldeki iş bitirilir, yenisi alınmaz
+        app.logger.info(f"[WORKER] sinyal {signum}, eldeki iş bitince çıkılıyor")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _graceful)
+    signal.signal(signal.SIGINT, _graceful)
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(run_worker(app, stop, args.poll, args.max_jobs, args.exit_when_idle)),
+            name=f"worker-{i}",
+        )
+        for i in range(max(1, args.concurrency))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        while t.is_alive():
+            t.join(0.5)
+    print(f"{sum(results)} iş işlendi")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,12 +12,97 @@ PREFERRED_URL_SCHEME = os.getenv('PREFERRED_URL_SCHEME', 'http')
 # DB (SQLite)
 SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str((BASE_DIR / 'app.db')).replace('\\', '/')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Birden çok süreç (web + app.worker) aynı SQLite dosyasına yazar: kilit için bekleme (sn)
+SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))}}
 
 # Upload limit
 MAX_CONTENT_LENGTH = 100 * 1024 * 1024
+# Kaynak başına en fazla piksel (pre-flight başlıktan kontrol eder; decompression bomb koruması)
+IMAGING_MAX_PIXELS = int(os.getenv('IMAGING_MAX_PIXELS', str(100_000_000)))
 UPLOADS_DIRNAME = 'uploads'
+# Parçalı (kaldığı yerden devam eden) yükleme: dosya başına üst sınır ve bu kadar saat
+# dokunulmayan oturumların silinmesi. Her PUT parçası yine MAX_CONTENT_LENGTH ile sınırlıdır.
+UPLOAD_CHUNKED_MAX_BYTES = int(os.getenv('UPLOAD_CHUNKED_MAX_BYTES', str(1024 ** 3)))
+UPLOAD_SESSION_TTL_HOURS = float(os.getenv('UPLOAD_SESSION_TTL_HOURS', '24'))
 OUTPUTS_DIRNAME = 'outputs'
 
+# Görsel işleme motoru: 'thread' | 'process' | 'serial'
+IMAGING_EXECUTOR = os.getenv('IMAGING_EXECUTOR', 'thread')
+# 0 => CPU çekirdek sayısı kadar işçi
+IMAGING_WORKERS = int(os.getenv('IMAGING_WORKERS', '0'))
+# Tam kat ölçüleri büyük çıktıdan türet (8x10 = 16x20 / 2 ...); 0 => hepsi kaynaktan
+IMAGING_CASCADE = os.getenv('IMAGING_CASCADE', '1') == '1'
+# Büyük JPEG'lerde decode-zamanı küçültme: draft payı (en büyük hedefin kaç katına kadar
+# küçültülebilir) ve resize reducing_gap; 0 => kapalı
+IMAGING_DRAFT_MARGIN = float(os.getenv('IMAGING_DRAFT_MARGIN', '2.0'))
+IMAGING_REDUCING_GAP = float(os.getenv('IMAGING_REDUCING_GAP', '3.0'))
+# Çok büyük çıktılar (>= IMAGING_BAND_MIN_PIXELS piksel) IMAGING_BAND_ROWS satırlık
+# şeritlerle yeniden örneklenir; 0 => kapalı
+IMAGING_BAND_ROWS = int(os.getenv('IMAGING_BAND_ROWS', '512'))
+IMAGING_BAND_MIN_PIXELS = int(os.getenv('IMAGING_BAND_MIN_PIXELS', '40000000'))
+# Varsayılan çıktı kodlama profili (print-max | print-standard | web | web-webp);
+# admin panelinden değiştirilirse app_setting'deki değer önceliklidir
+IMAGING_ENCODING_PROFILE = os.getenv('IMAGING_ENCODING_PROFILE', 'print-max')
+# Varsayılan yeniden örnekleme kademesi (fast | standard | best); admin panelinden bir
+# kademe zorlanabilir (yük altında), o durumda isteklerin seçimi yok sayılır
+IMAGING_QUALITY = os.getenv('IMAGING_QUALITY', 'best')
+# Adil zamanlayıcı: tüm isteklerin görsel görevleri (decode / ölçü zinciri) IMAGING_WORKERS
+# işçili tek kuyrukta kullanıcılar arasında ağırlıklı adil paylaştırılır. Token satın
+# almış kullanıcıların ağırlığı IMAGING_SCHED_PAID_WEIGHT; IMAGING_SCHED_USER_LIMIT > 0 ise
+# kullanıcı başına aynı anda çalışan görev sınırı. 0 => kapalı (her istek kendi havuzu)
+IMAGING_SCHEDULER = os.getenv('IMAGING_SCHEDULER', '1') == '1'
+IMAGING_SCHED_PAID_WEIGHT = float(os.getenv('IMAGING_SCHED_PAID_WEIGHT', '2.0'))
+IMAGING_SCHED_USER_LIMIT = int(os.getenv('IMAGING_SCHED_USER_LIMIT', '0'))
+# Aşama süreleri: /upload yanıtına Server-Timing, iş sonunda tek satır JSON [TIMING] logu
+# (TIMING_LOG) ve /admin/api/metrics/prometheus yüzdelikleri (seri başına son TIMING_RESERVOIR
+# gözlem; süreç başına)
+TIMING_ENABLED = os.getenv('TIMING_ENABLED', '1') == '1'
+TIMING_LOG = os.getenv('TIMING_LOG', '1') == '1'
+TIMING_RESERVOIR = int(os.getenv('TIMING_RESERVOIR', '2048'))
+# Bellek kabul kontrolü: decode edilmiş piksel bütçesi (MB), bekleme kuyruğu sınırı,
+# en uzun bekleme (sn) ve 503 yanıtındaki Retry-After (sn)
+IMAGING_MEMORY_BUDGET_MB = int(os.getenv('IMAGING_MEMORY_BUDGET_MB', '2048'))
+IMAGING_QUEUE_LIMIT = int(os.getenv('IMAGING_QUEUE_LIMIT', '8'))
+IMAGING_ADMISSION_TIMEOUT = float(os.getenv('IMAGING_ADMISSION_TIMEOUT', '30'))
+IMAGING_RETRY_AFTER = int(os.getenv('IMAGING_RETRY_AFTER', '15'))
+# Bellek içi render yolunda bu boyutu aşan çıktı tamponları instance/outputs'a taşar
+IMAGING_SPILL_BYTES = int(os.getenv('IMAGING_SPILL_BYTES', str(16 * 1024 * 1024)))
+# İçerik adresli render önbelleği (instance/render_cache), LRU bayt bütçesi
+RENDER_CACHE_ENABLED = os.getenv('RENDER_CACHE_ENABLED', '1') == '1'
+RENDER_CACHE_DIRNAME = 'render_cache'
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+# Asenkron yükleme işleri (/upload?async=1) için arka plan işçi sayısı
+RENDER_JOB_WORKERS = int(os.getenv('RENDER_JOB_WORKERS', '2'))
+# 'inline' => işi web süreci çalıştırır; 'queue' => yalnız tabloya yazılır, `python -m app.worker`
+# süreçleri üstlenir. İş girdileri/paketleri RENDER_STORAGE_DIR altında (boş => instance);
+# birden çok sunucuda paylaşılan bir disk olmalıdır.
+RENDER_JOB_MODE = os.getenv('RENDER_JOB_MODE', 'inline')
+RENDER_STORAGE_DIR = os.getenv('RENDER_STORAGE_DIR', '')
+# İş kirası (sn): işçi bunun üçte birinde bir heartbeat atar; dolarsa iş başka işçiye geçer.
+# RENDER_MAX_ATTEMPTS kez üstlenilip bitirilemeyen iş failed olur.
+RENDER_LEASE_SECONDS = int(os.getenv('RENDER_LEASE_SECONDS', '60'))
+RENDER_MAX_ATTEMPTS = int(os.getenv('RENDER_MAX_ATTEMPTS', '3'))
+
+# Tamamlanan paketler (async işler + senkron yanıtın diske yazılan kopyası) bu kadar saat
+# tekrar indirilebilir; toplamı PACK_QUOTA_MB'ı aşarsa en eskiler silinir (temizleyici
+# yalnız web sürecinde, PACK_SWEEP_SECONDS'ta bir çalışır, 0 => kapalı; PACK_SWEEPER=0
+# o süreçte hiç başlatmaz, örn. gunicorn'da tek süreç dışında). PACK_SENDFILE: '' (Flask gönderir) |
+# 'x-sendfile' (Apache/lighttpd) | 'x-accel' (nginx; PACK_ACCEL_PREFIX internal location'ı
+# <storage>/outputs klasörüne eşlenmeli)
+PACK_RETAIN_SYNC = os.getenv('PACK_RETAIN_SYNC', '1') == '1'
+PACK_TTL_HOURS = float(os.getenv('PACK_TTL_HOURS', '24'))
+PACK_QUOTA_MB = int(os.getenv('PACK_QUOTA_MB', '10240'))
+PACK_SWEEP_SECONDS = int(os.getenv('PACK_SWEEP_SECONDS', '600'))
+PACK_SWEEPER = os.getenv('PACK_SWEEPER', '1') == '1'
+PACK_SENDFILE = os.getenv('PACK_SENDFILE', '')
+PACK_ACCEL_PREFIX = os.getenv('PACK_ACCEL_PREFIX', '/protected-packs/')
+
+# Önizleme: ölçü başına uzun kenarı PREVIEW_EDGE px küçük kopya (WebP, yoksa JPEG).
+# Async işlerde render'dan önce paketin yanına yazılır; /upload/preview token düşmeden
+# en fazla PREVIEW_MAX_FILES görsel için anında döner.
+PREVIEW_EDGE = int(os.getenv('PREVIEW_EDGE', '256'))
+PREVIEW_MAX_FILES = int(os.getenv('PREVIEW_MAX_FILES', '20'))
+
 # Test modu: e-posta doğrulaması zorunlu mu?
 EMAIL_VERIFICATION_REQUIRED = os.getenv('REQUIRE_EMAIL_VERIFICATION', '0') == '1'
 
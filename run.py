@@ -1,7 +1,10 @@
 # run.py
 from app import create_app
+from app.services.packs import start_sweeper
 
 app = create_app()
+# Saklanan paketler / parçalı yükleme oturumları için arka plan temizleyici (yalnız web süreci)
+start_sweeper(app)
 
 if __name__ == '__main__':
     # Debug açıldı. Hata olursa tarayıcıda ayrıntılı stack trace göreceksin.
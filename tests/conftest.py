@@ -0,0 +1,31 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+# `pytest` depo kökünden ya da tests/ içinden çalıştırıldığında `app` ve `config` bulunabilsin
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def db_app(tmp_path, monkeypatch):
+    """Geçici SQLite DB ve depo ile uygulama (render önbelleği kapalı); test app_context içinde çalışır."""
+    import config
+    from app import create_app, db
+
+    monkeypatch.setattr(config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'app.db'}", raising=False)
+    monkeypatch.setattr(config, "RENDER_STORAGE_DIR", str(tmp_path / "storage"), raising=False)
+    monkeypatch.setattr(config, "RENDER_CACHE_ENABLED", False, raising=False)
+    app = create_app()
+    app.config["TESTING"] = True
+    # parçalı yükleme dosyaları, taşma tamponları vb. depoya yazılmasın (klasörler create_app'teki gibi)
+    app.instance_path = str(tmp_path / "instance")
+    for name in (app.config.get("UPLOADS_DIRNAME", "uploads"), app.config.get("OUTPUTS_DIRNAME", "outputs")):
+        (tmp_path / "instance" / name).mkdir(parents=True)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,50 @@
+# tests/test_cache.py
+"""Render önbelleği: commit ağacı taramadan toplamı tutar; taşınca en eskiler düşük su seviyesine iner."""
+import os
+
+from app.services.cache import EVICT_LOW_WATER, RenderCache
+
+SIZE = (10, 10)
+
+
+def _put(cache: RenderCache, tmp_path, key: str, nbytes: int):
+    src = tmp_path / f"{key}.{nbytes}.bin"    # put hard link kurar: kaynak dosya yeniden yazılmasın
+    src.write_bytes(b"x" * nbytes)
+    cache.put(key, {SIZE: str(src)})
+
+
+def _scans(cache: RenderCache, monkeypatch) -> list:
+    calls = []
+    entries = cache.entries
+
+    def counted():
+        calls.append(1)
+        return entries()
+
+    monkeypatch.setattr(cache, "entries", counted)
+    return calls
+
+
+def test_commit_keeps_running_total_without_scanning(tmp_path, monkeypatch):
+    cache = RenderCache(tmp_path / "cache", max_bytes=10_000)
+    _put(cache, tmp_path, "a" * 64, 1000)              # ilk commit: bir kez taranır
+    scans = _scans(cache, monkeypatch)
+    for i in range(5):
+        _put(cache, tmp_path, f"{i:x}" * 64, 1000)
+    _put(cache, tmp_path, "a" * 64, 500)               # aynı girdi yeniden yazılır: fark eklenir
+    assert scans == []
+    assert cache.usage() == 5500
+    assert cache.evict() == 5500                       # tam tarama aynı toplamı bulur
+
+
+def test_overflow_evicts_oldest_down_to_low_water(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=10_000)
+    keys = [f"{i:x}" * 64 for i in range(10)]
+    for n, key in enumerate(keys):
+        _put(cache, tmp_path, key, 1000)
+        os.utime(cache._entry(key), (n, n))           # eskiden yeniye sıralı erişim saatleri
+    assert cache.usage() == 10_000
+    _put(cache, tmp_path, "f" * 64, 1000)              # taşma => evict
+    assert cache.usage() <= 10_000 * EVICT_LOW_WATER
+    assert cache.lookup(keys[0], [SIZE]) is None and cache.lookup(keys[1], [SIZE]) is None
+    assert cache.lookup("f" * 64, [SIZE]) is not None
@@ -0,0 +1,111 @@
+# tests/test_chunked_upload.py
+"""
+Parçalı yükleme: kaldığı yerden devam (offset uyuşmazlığı 409 + güncel offset), kopan
+parçada yazılan kısmın korunması, süreç yeniden başlasa da (bellekteki hash durumu yok)
+doğru SHA-256 ve tamamlanan yüklemenin /upload'a verilmesi.
+"""
+import hashlib
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+from app import db
+from app.models import UploadSession, User
+from app.services import uploads
+
+
+@pytest.fixture
+def data() -> bytes:
+    buf = io.BytesIO()
+    Image.effect_mandelbrot((900, 1200), (-2, -1.2, 1, 1.2), 60).convert("RGB").save(buf, "JPEG", quality=95)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client(db_app):
+    user = User(email="c@b.com", tokens=10)
+    user.set_password("x")
+    db.session.add(user)
+    db.session.commit()
+    client = db_app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user.id)
+        sess["_fresh"] = True
+    return client
+
+
+def _start(client, data: bytes, sha256: str | None = None) -> str:
+    r = client.post("/upload/chunked", json={"filename": "big.jpg", "size": len(data), "sha256": sha256})
+    assert r.status_code == 201
+    return r.json["upload_id"]
+
+
+def test_resume_and_digest(client, db_app, data):
+    sha = hashlib.sha256(data).hexdigest()
+    uid = _start(client, data, sha)
+
+    assert client.put(f"/upload/chunked/{uid}?offset=0", data=data[:10_000]).json["offset"] == 10_000
+    r = client.put(f"/upload/chunked/{uid}?offset=5", data=data[5:100])
+    assert (r.status_code, r.json["offset"]) == (409, 10_000)
+
+    uploads._hashers.clear()          # yeniden başlama: hash diskteki parçadan yeniden kurulur
+    off = client.get(f"/upload/chunked/{uid}").json["offset"]
+    end = 30_000
+    r = client.put(f"/upload/chunked/{uid}", data=data[off:end],
+                   headers={"Content-Range": f"bytes {off}-{end - 1}/{len(data)}"})
+    assert r.json["offset"] == end
+    r = client.post(f"/upload/chunked/{uid}/finalize")
+    assert (r.status_code, r.json["offset"]) == (409, end)
+
+    r = client.put(f"/upload/chunked/{uid}?offset={end}", data=data[end:] + b"xx")
+    assert r.status_code == 400                              # bildirilen boyutu aşan parça
+    off = client.get(f"/upload/chunked/{uid}").json["offset"]
+    client.put(f"/upload/chunked/{uid}?offset={off}", data=data[off:])
+    r = client.post(f"/upload/chunked/{uid}/finalize")
+    assert (r.status_code, r.json["status"], r.json["sha256"]) == (200, "done", sha)
+
+    r = client.post("/upload", data={"upload_ids": uid, "sizes": "4x6", "scale": "1"})
+    assert r.status_code == 200
+    assert zipfile.ZipFile(io.BytesIO(r.data)).namelist()
+    assert not uploads.part_path(db_app, uid).exists()
+    assert client.post("/upload", data={"upload_ids": uid}).status_code == 404    # tekrar kullanılamaz
+
+
+def test_digest_mismatch_rejected(client, data):
+    uid = _start(client, data, "0" * 64)
+    client.put(f"/upload/chunked/{uid}?offset=0", data=data)
+    r = client.post(f"/upload/chunked/{uid}/finalize")
+    assert (r.status_code, r.json["error"]) == (409, "SHA-256 uyuşmuyor")
+
+
+class _Broken(io.RawIOBase):
+    """Belirli bayttan sonra bağlantısı kopan istek gövdesi."""
+
+    def __init__(self, data: bytes, cut: int, step: int = 4096):
+        self.data, self.cut, self.step, self.pos = data, cut, step, 0
+
+    def read(self, n=-1):
+        if self.pos >= self.cut:
+            raise OSError("bağlantı koptu")
+        buf = self.data[self.pos:min(self.cut, self.pos + self.step)]
+        self.pos += len(buf)
+        return buf
+
+
+def test_interrupted_chunk_keeps_written_bytes(db_app, data):
+    user = User(email="s@b.com", tokens=0)
+    user.set_password("x")
+    db.session.add(user)
+    db.session.commit()
+    s = uploads.create_session(db_app, user.id, "big.jpg", len(data), hashlib.sha256(data).hexdigest())
+
+    ok, msg = uploads.write_chunk(db_app, s, 0, _Broken(data, cut=20_000))
+    assert not ok and msg.startswith("Yazma hatası")
+    assert db.session.get(UploadSession, s.id).received == 20_000
+
+    assert uploads.write_chunk(db_app, s, 20_000, io.BytesIO(data[20_000:])) == (True, "OK")
+    assert uploads.finalize_session(db_app, s) == (True, "OK")
+    assert s.digest == hashlib.sha256(data).hexdigest()
+    assert uploads.part_path(db_app, s.id).read_bytes() == data
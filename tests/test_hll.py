@@ -0,0 +1,66 @@
+# tests/test_hll.py
+"""
+HyperLogLog: bilinen kardinalitede tahmin belgelenen hatanın (±2 standart hata, ~%95)
+içinde kalır; birleşim tekil sayıyı verir; saklama biçimi kayıpsızdır. Saatlik kova
+eskizleri (rollups) birleştirilince aynı sonucu verir.
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import AuditEvent
+from app.services.hll import HyperLogLog
+from app.services.rollups import check_rollups, distinct_users, hour_of
+
+
+def _sketch(values) -> HyperLogLog:
+    hll = HyperLogLog()
+    for v in values:
+        hll.add(v)
+    return hll
+
+
+@pytest.mark.parametrize("n", [50, 1_000, 20_000, 100_000])
+def test_estimate_within_documented_error(n):
+    hll = _sketch(range(n))
+    assert abs(hll.count() - n) <= 2 * hll.std_error * n
+
+
+def test_merge_counts_union_not_sum():
+    a, b = _sketch(range(0, 30_000)), _sketch(range(20_000, 50_000))
+    union = HyperLogLog.from_bytes(a.to_bytes()).merge_bytes(b.to_bytes())
+    assert abs(union.count() - 50_000) <= 2 * union.std_error * 50_000
+    assert union.registers == HyperLogLog().merge(a).merge(b).registers
+
+
+@pytest.mark.parametrize("n, kind", [(10, b"S"), (50_000, b"D")])
+def test_storage_roundtrip(n, kind):
+    hll = _sketch(range(n))
+    data = hll.to_bytes()
+    assert data[:1] == kind
+    assert HyperLogLog.from_bytes(data).registers == hll.registers
+    assert HyperLogLog.from_bytes(data).to_bytes() == data     # kanonik
+
+
+def test_hourly_sketches_merge_to_distinct_users(db_app):
+    # 3 gün x 4 saat; her saat 400 kullanıcılık kayan bir pencere => toplam 950, gün başına 550 tekil kullanıcı
+    start = datetime(2026, 3, 10, 8)
+    events = []
+    for hour in range(12):
+        at = start + timedelta(days=hour // 4, hours=hour % 4)
+        first = hour * 50
+        events += [AuditEvent(user_id=uid, event="login", created_at=at, meta=json.dumps({}))
+                   for uid in range(first, first + 400)]
+    db.session.add_all(events)
+    db.session.commit()
+    assert check_rollups() == []
+
+    h0, h1 = hour_of(start), hour_of(start + timedelta(days=3))
+    total = distinct_users("login", h0, h1, "total")["total"]
+    assert abs(total.count() - 950) <= 2 * total.std_error * 950
+    days = distinct_users("login", h0, h1, "day")
+    assert len(days) == 3
+    for sketch in days.values():
+        assert abs(sketch.count() - 550) <= 2 * sketch.std_error * 550
@@ -0,0 +1,78 @@
+# tests/test_ledger.py
+"""
+user_ledger, AuditEvent yazımıyla aynı flush'ta (before_flush) güncellenir; check_ledger
+audit_event'ten yeniden hesaplananla karşılaştırır. Kancadan geçmeyen (ham SQL) yazımlar
+rebuild_ledger ile düzelir.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import db
+from app.models import AuditEvent, User
+from app.services.ledger import check_ledger, get_ledger, rebuild_ledger, tiers_of
+
+
+def _user(email: str) -> User:
+    user = User(email=email, tokens=0)
+    user.set_password("x")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _event(user, name: str, **meta) -> AuditEvent:
+    return AuditEvent(user_id=user.id, event=name, meta=json.dumps(meta) if meta else None)
+
+
+def test_hook_keeps_ledger_in_sync(db_app):
+    a, b = _user("a@b.com"), _user("b@b.com")
+    db.session.add_all([
+        _event(a, "token_purchase", tokens=50, order_id="o1"),
+        _event(a, "token_spent", tokens=3, reason="upload", files=3),
+        _event(a, "token_spent", tokens=2, reason="upload", files=2),   # aynı flush'ta aynı kullanıcı
+        _event(a, "daily_claim", tokens=1),
+        _event(b, "reward_claim", tokens=5),
+        _event(b, "tier_claim", tier=2),
+        _event(a, "login"),                                              # token hareketi yok
+    ])
+    db.session.commit()
+    db.session.add_all([_event(b, "tier_claim", tier=2), _event(b, "tier_claim", tier=5),
+                        _event(a, "daily_claim", tokens=1)])
+    db.session.commit()
+
+    assert check_ledger() == []
+    la, lb = get_ledger(a.id), get_ledger(b.id)
+    assert (la.purchased, la.spent, la.daily_claims, la.reward) == (50, 5, 2, 0)
+    assert (lb.reward, tiers_of(lb)) == (5, {2, 5})
+
+
+def test_rollback_discards_ledger_delta(db_app):
+    a = _user("a@b.com")
+    db.session.add(_event(a, "token_spent", tokens=4))
+    db.session.commit()
+    db.session.add(_event(a, "token_spent", tokens=100))
+    db.session.flush()
+    db.session.rollback()
+
+    assert check_ledger() == []
+    assert get_ledger(a.id).spent == 4
+
+
+def test_rebuild_repairs_raw_writes(db_app):
+    a = _user("a@b.com")
+    db.session.add(_event(a, "token_purchase", tokens=10))
+    db.session.commit()
+    # ham SQL kancadan geçmez: ledger geride kalır
+    db.session.execute(text(
+        "INSERT INTO audit_event (user_id, event, meta, tokens, created_at) VALUES (:u, 'token_spent', :m, 7, :t)"),
+        {"u": a.id, "m": json.dumps({"tokens": 7}), "t": datetime.utcnow()})
+    db.session.commit()
+    assert check_ledger() == [{"user_id": a.id, "field": "spent", "ledger": 0, "expected": 7}]
+
+    assert rebuild_ledger() == 1
+    assert check_ledger() == []
+    assert rebuild_ledger([a.id]) == 1
+    assert check_ledger() == []
+    assert (get_ledger(a.id).purchased, get_ledger(a.id).spent) == (10, 7)
@@ -0,0 +1,36 @@
+# tests/test_memory_estimate.py
+"""
+Bellek kabulünün piksel maliyeti Pillow'un gerçek ayırımıyla uyuşmalı: RGB bellekte
+piksel başına 4 bayt tutulur; tahmin düşük kalırsa bütçe taşıdığından fazla iş kabul eder.
+"""
+import pytest
+from PIL import Image
+
+from app.services.imaging import estimate_peak_bytes
+
+SIDE = 4096     # satırlar blok sınırına tam oturur (16 MiB blok / satır boyu)
+
+
+def _footprint(mode: str) -> int:
+    """Image.new'in Pillow arenasından aldığı bayt (blok sayısı x blok boyu)."""
+    before = Image.core.get_stats()
+    im = Image.new(mode, (SIDE, SIDE))
+    after = Image.core.get_stats()
+    blocks = (after["allocated_blocks"] - before["allocated_blocks"]
+              + after["reused_blocks"] - before["reused_blocks"])
+    del im
+    return blocks * Image.core.get_block_size()
+
+
+@pytest.mark.parametrize("mode", ["L", "P", "1", "LA", "RGB", "RGBA", "CMYK", "I;16", "I", "F"])
+def test_source_estimate_matches_pillow_allocation(mode):
+    # ölçü planı boş: tahmin yalnız decode edilmiş kaynaktır
+    assert estimate_peak_bytes([(SIDE, SIDE, mode)], [], 1) == _footprint(mode)
+
+
+def test_rgb_output_frames_counted_at_four_bytes():
+    src, size = (SIDE, SIDE), (SIDE // 2, SIDE // 2)
+    base = estimate_peak_bytes([(*src, "RGB")], [], 1)
+    full = estimate_peak_bytes([(*src, "RGB")], [size], 1, workers=1, band_rows=None)
+    # çıktı çerçevesi + yatay geçiş ara görüntüsü (hedef genişlik x kaynak yükseklik)
+    assert full - base == (size[0] * size[1] + size[0] * src[1]) * 4
@@ -0,0 +1,55 @@
+# tests/test_quality.py
+"""
+Decode-zamanı küçültme (draft + reducing_gap) ve kademeli plan (türetilen ölçüler) için
+belgelenen toleranslar: tam decode + düz LANCZOS referansına göre PSNR/SSIM tabanları.
+"""
+import math
+
+import pytest
+
+from app.bench import _photo
+from app.services.imaging import (
+    BOYUTLAR_8LI_PORTRAIT, CASCADE_MIN_PSNR, CASCADE_MIN_SSIM, DRAFT_MIN_PSNR, DRAFT_MIN_SSIM,
+    cascade_quality_report, draft_quality_report, draft_size, plan_renders, psnr, ssim, RenderSettings,
+)
+
+# 5x7, 8x10, 9x12 @ scale 1: en büyük kök 648x864; 3000x4000 kaynak 1/2 ölçekte decode edilir
+DRAFT_SIZES = BOYUTLAR_8LI_PORTRAIT[:3]
+# 16x20 kök, 8x10 ondan 2x reduce ile türetilir
+CASCADE_SIZES = [BOYUTLAR_8LI_PORTRAIT[4], BOYUTLAR_8LI_PORTRAIT[1]]
+
+
+@pytest.fixture(scope="module")
+def photo(tmp_path_factory):
+    path = tmp_path_factory.mktemp("quality") / "photo.jpg"
+    _photo((3000, 4000)).save(path, "JPEG", quality=92)
+    return path
+
+
+def test_draft_applies_to_fixture():
+    # tolerans testi anlamlı olsun: bu kaynak/ölçülerde draft gerçekten devrede
+    assert draft_size(plan_renders(DRAFT_SIZES, 1), RenderSettings()) is not None
+
+
+@pytest.mark.parametrize("metric, floor", [(psnr, DRAFT_MIN_PSNR), (ssim, DRAFT_MIN_SSIM)])
+def test_draft_decode_within_tolerance(photo, metric, floor):
+    report = draft_quality_report(photo, DRAFT_SIZES, 1, metric=metric)
+    assert len(report) == len(plan_renders(DRAFT_SIZES, 1))
+    for label, value in report.items():
+        if metric is psnr:
+            assert math.isfinite(value), f"{label}: draft uygulanmadı (çıktılar özdeş)"
+        assert value >= floor, f"{label}: {metric.__name__}={value:.4f} < {floor}"
+
+
+@pytest.mark.parametrize("metric, floor", [(psnr, CASCADE_MIN_PSNR), (ssim, CASCADE_MIN_SSIM)])
+def test_cascade_within_tolerance(photo, metric, floor):
+    report = cascade_quality_report(photo, CASCADE_SIZES, 1, labels=["16x20", "8x10"], metric=metric)
+    assert list(report) == ["8x10"]        # yalnız türetilen ölçüler raporlanır
+    for label, value in report.items():
+        assert value >= floor, f"{label}: {metric.__name__}={value:.4f} < {floor}"
+
+
+def test_metrics_identity():
+    im = _photo((64, 48))
+    assert psnr(im, im) == math.inf
+    assert ssim(im, im) == pytest.approx(1.0)
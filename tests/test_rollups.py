@@ -0,0 +1,76 @@
+# tests/test_rollups.py
+"""
+metrics_hourly kovaları AuditEvent yazımıyla aynı flush'ta güncellenir; check_rollups
+audit_event'ten yeniden hesaplananla (eskizler dahil) karşılaştırır. Kancadan geçmeyen
+yazımlar rebuild_rollups ile (tümü ya da bir saatten itibaren) düzelir.
+"""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from app.models import AuditEvent, MetricsHourly, User
+from app.services.rollups import check_rollups, hour_of, rebuild_rollups
+
+T0 = datetime(2026, 3, 14, 9, 15)
+
+
+def _users(n: int) -> list[User]:
+    users = [User(email=f"u{i}@b.com", tokens=0) for i in range(n)]
+    for user in users:
+        user.set_password("x")
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def _event(user, name: str, at: datetime, **meta) -> AuditEvent:
+    return AuditEvent(user_id=user.id if user else None, event=name, created_at=at,
+                      meta=json.dumps(meta) if meta else None)
+
+
+def _bucket(at: datetime, name: str) -> MetricsHourly:
+    return db.session.get(MetricsHourly, (hour_of(at), name))
+
+
+def test_hook_keeps_buckets_in_sync(db_app):
+    a, b = _users(2)
+    db.session.add_all([
+        _event(a, "upload", T0, files=3),
+        _event(b, "upload", T0 + timedelta(minutes=30), files=2),
+        _event(a, "token_spent", T0, tokens=3, files=3),
+        _event(a, "upload", T0 + timedelta(hours=1), files=1),      # sonraki kova
+        _event(None, "register", T0),                               # kullanıcısız olay: eskiz yok
+    ])
+    db.session.commit()
+    db.session.add(_event(b, "upload", T0 + timedelta(minutes=40), files=4))
+    db.session.commit()
+
+    assert check_rollups() == []
+    first = _bucket(T0, "upload")
+    assert (first.count, first.files) == (3, 9)
+    assert _bucket(T0, "token_spent").tokens == 3
+    assert _bucket(T0 + timedelta(hours=1), "upload").count == 1
+    assert _bucket(T0, "register").user_sketch is None
+
+
+def test_rebuild_repairs_raw_writes(db_app):
+    (a,) = _users(1)
+    db.session.add(_event(a, "upload", T0, files=1))
+    db.session.commit()
+    later = T0 + timedelta(hours=5)
+    for at in (T0, later):
+        db.session.execute(text(
+            "INSERT INTO audit_event (user_id, event, meta, files, created_at) VALUES (:u, 'upload', :m, 2, :t)"),
+            {"u": a.id, "m": json.dumps({"files": 2}), "t": at})
+    db.session.commit()
+    assert len(check_rollups()) == 2
+
+    # yalnız son kovadan itibaren: öncekiler bozuk kalır
+    rebuild_rollups(since=later)
+    assert [d["hour"] for d in check_rollups()] == [datetime(2026, 3, 14, 9).isoformat()]
+
+    rebuild_rollups()
+    assert check_rollups() == []
+    assert (_bucket(T0, "upload").count, _bucket(T0, "upload").files) == (2, 3)
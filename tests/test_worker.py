@@ -0,0 +1,175 @@
+# tests/test_worker.py
+"""
+Kuyruk/kira: aynı SQLite DB'ye bağlı birden çok işçi (thread ve ayrı `app.worker` süreci)
+sıradaki RenderJob'ları boşaltır; her iş tek kez üstlenilir, tek kez ücretlendirilir ve
+done olur. Kirası dolmuş (çöken işçiden kalan) running iş yeniden üstlenilir.
+"""
+import json
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import config
+from app import create_app, db
+from app.models import AuditEvent, RenderJob, User
+from app.services.jobs import job_dirs, new_job_id
+from app.worker import run_worker
+
+ROOT = Path(__file__).resolve().parents[1]
+# Ayrı süreç: aynı config yamalarıyla `python -m app.worker` (config'ten önce uygulanır)
+WORKER_BOOT = (
+    "import json, sys, config\n"
+    "for k, v in json.loads(sys.argv[1]).items(): setattr(config, k, v)\n"
+    "from app.worker import main\n"
+    "sys.exit(main(sys.argv[2:]))"
+)
+SIZES = [["4x6", 40, 60], ["5x7", 50, 70]]
+
+
+@pytest.fixture
+def overrides(tmp_path):
+    # Render önbelleği kapalı: her çalıştırmada decode/resize/encode gerçekten yapılır ve
+    # depoya (instance/render_cache) bir şey yazılmaz
+    return {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+        "RENDER_STORAGE_DIR": str(tmp_path / "storage"),
+        "RENDER_JOB_MODE": "queue",
+        "RENDER_CACHE_ENABLED": False,
+    }
+
+
+@pytest.fixture
+def app(overrides, monkeypatch):
+    for key, value in overrides.items():
+        monkeypatch.setattr(config, key, value, raising=False)
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        user = User(email="w@b.com", tokens=100)
+        user.set_password("x")
+        db.session.add(user)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _queue_job(app, files: int = 2, **fields) -> str:
+    job_id = new_job_id()
+    job_in, _, _ = job_dirs(app, job_id)
+    job_in.mkdir(parents=True)
+    for i in range(files):
+        Image.new("RGB", (120, 160), (40 * i, 90, 160)).save(job_in / f"img{i}.jpg", "JPEG")
+    with app.app_context():
+        user = User.query.filter_by(email="w@b.com").one()
+        db.session.add(RenderJob(id=job_id, user_id=user.id, scale=1, files=files,
+                                 sizes=json.dumps(SIZES), result_name="pack.zip", **fields))
+        db.session.commit()
+    return job_id
+
+
+def _run_workers(app, n: int) -> list[int]:
+    stop = threading.Event()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(run_worker(app, stop, poll=0.05, exit_when_idle=True)),
+                         name=f"test-worker-{i}")
+        for i in range(n)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(60)
+    assert not any(t.is_alive() for t in threads)
+    return results
+
+
+def _start_process_worker(overrides) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-c", WORKER_BOOT, json.dumps(overrides), "--exit-when-idle", "--poll", "0.05"],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+
+
+def _wait_for_claim(app, owner_part: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with app.app_context():
+            owners = [o for (o,) in db.session.query(RenderJob.lease_owner) if o]
+            db.session.remove()
+        if any(owner_part in o for o in owners):
+            return
+        time.sleep(0.05)
+    raise AssertionError("ayrı işçi süreci iş üstlenmedi")
+
+
+def _charges(app) -> list[AuditEvent]:
+    with app.app_context():
+        return AuditEvent.query.filter_by(event="token_spent").all()
+
+
+def test_workers_claim_each_job_once(app):
+    job_ids = [_queue_job(app) for _ in range(6)]
+
+    handled = _run_workers(app, 4)
+
+    assert sum(handled) == len(job_ids)
+    with app.app_context():
+        jobs = RenderJob.query.filter(RenderJob.id.in_(job_ids)).all()
+        assert {j.status for j in jobs} == {"done"}
+        assert [j.attempts for j in jobs] == [1] * len(job_ids)
+        assert all(job_dirs(app, j.id)[2].is_file() for j in jobs)
+        assert User.query.filter_by(email="w@b.com").one().tokens == 100 - 2 * len(job_ids)
+    assert len(_charges(app)) == len(job_ids)
+
+
+def test_process_and_thread_workers_share_queue(app, overrides):
+    job_ids = [_queue_job(app) for _ in range(8)]
+
+    proc = _start_process_worker(overrides)
+    try:
+        # süreç ilk işi alana kadar bekle; kalan işler için thread'lerle yarışır
+        _wait_for_claim(app, f":{proc.pid}:")
+        handled = _run_workers(app, 2)
+        out, err = proc.communicate(timeout=120)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    assert proc.returncode == 0, err
+    by_process = int(out.split()[0])
+
+    assert by_process >= 1 and by_process + sum(handled) == len(job_ids)
+    with app.app_context():
+        jobs = RenderJob.query.filter(RenderJob.id.in_(job_ids)).all()
+        assert {j.status for j in jobs} == {"done"}
+        assert [j.attempts for j in jobs] == [1] * len(job_ids)
+        assert sum(f":{proc.pid}:" in j.lease_owner for j in jobs) == by_process
+        assert User.query.filter_by(email="w@b.com").one().tokens == 100 - 2 * len(job_ids)
+    assert len(_charges(app)) == len(job_ids)
+
+
+def test_expired_lease_is_reclaimed(app):
+    past = datetime.utcnow() - timedelta(minutes=5)
+    stale = _queue_job(app, status="running", lease_owner="worker:dead:1:MainThread",
+                       lease_expires_at=past, attempts=1, started_at=past)
+    live = _queue_job(app, status="running", lease_owner="worker:alive:1:MainThread",
+                      lease_expires_at=datetime.utcnow() + timedelta(minutes=5), attempts=1)
+
+    handled = _run_workers(app, 2)
+
+    assert sum(handled) == 1
+    with app.app_context():
+        job = db.session.get(RenderJob, stale)
+        assert (job.status, job.attempts, job.lease_expires_at) == ("done", 2, None)
+        assert job.lease_owner.startswith("worker:") and job.lease_owner != "worker:dead:1:MainThread"
+        # kirası geçerli iş başka işçiye verilmez
+        assert db.session.get(RenderJob, live).status == "running"
+        assert User.query.filter_by(email="w@b.com").one().tokens == 98
+    assert len(_charges(app)) == 1